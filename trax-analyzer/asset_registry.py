@@ -0,0 +1,262 @@
+"""
+Persistent asset identity registry for TRAX reports
+extract_substation_name gives unstable keys ("Substation_2" for several
+transformers, "Transformer_<timestamp>" fallbacks), so outputs of different
+transformers overwrote each other. Each report is resolved here to a
+persistent asset ID from its nameplate data: an exact index on normalized
+serial numbers and names (dict lookups), then fuzzy matching for OCR/typing
+variants of the same serial or name. The registry is a small JSON file kept
+next to the extraction cache, so IDs stay stable across runs.
+"""
+
+import json
+import os
+import re
+from difflib import get_close_matches
+from trax_segments import normalize_serial, page_serials
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.expanduser('~'), '.trax_cache', 'asset_registry.json')
+
+# Fuzzy name matching threshold (difflib ratio)
+NAME_MATCH_RATIO = 0.9
+
+# Characters OCR and manual typing confuse in serial numbers. Serials are not
+# matched by edit distance: sibling units differ by one character
+# (L247439A / L247439B)
+SERIAL_CONFUSABLES = str.maketrans('OQDIL|SZBG', '0001115286')
+
+# Nameplate labels, matched against the cells of a line ("Manufacturer | ABB")
+NAMEPLATE_LABELS = {
+    'manufacturer': re.compile(r'^(?:manufacturer|make|mfr\.?|mfg\.?)\b', re.IGNORECASE),
+    'location': re.compile(r'^(?:location|site|substation)\b', re.IGNORECASE),
+    'mva': re.compile(r'^(?:mva|kva|rating|rated\s+power|power\s+rating)\b', re.IGNORECASE),
+    'kv': re.compile(r'^(?:kv|rated\s+voltage|voltage\s+rating|voltage)\b', re.IGNORECASE),
+}
+LABEL_VALUE = re.compile(r'^(?P<label>[A-Za-z][A-Za-z .]*?)\s*[:=]\s*(?P<value>.+)$')
+# "20/26.7/33.3 MVA", "25 MVA", "5000 kVA"
+POWER_RATING = re.compile(r'(?P<value>\d+(?:[.,]\d+)?(?:\s*/\s*\d+(?:[.,]\d+)?)*)\s*(?P<unit>MVA|kVA)\b', re.IGNORECASE)
+# "69/12.47 kV": a voltage ratio; single kV values are usually test voltages
+VOLTAGE_RATIO = re.compile(r'(?P<value>\d+(?:[.,]\d+)?(?:\s*/\s*\d+(?:[.,]\d+)?)+)\s*kV\b', re.IGNORECASE)
+NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+
+# Names produced by the fallbacks of extract_substation_name
+GENERIC_NAME = re.compile(r'^(?:transformer_\d{8}_\d{6}|unknown_equipment)$', re.IGNORECASE)
+NAME_PREFIX = re.compile(r'^(?:substation|equipment|asset|transformer)[_\s]*', re.IGNORECASE)
+
+def _number_list(value, scale=1.0):
+    numbers = [float(number.replace(',', '.')) * scale for number in NUMBER.findall(value)]
+    return '/'.join(f"{number:g}" for number in numbers)
+
+def normalize_rating(value):
+    """'20/26.7/33.3 MVA' -> '20/26.7/33.3'; kVA ratings are converted to MVA"""
+    match = POWER_RATING.search(value)
+    if match:
+        scale = 0.001 if match.group('unit').lower() == 'kva' else 1.0
+        return _number_list(match.group('value'), scale)
+    return _number_list(value)
+
+def extract_nameplate(text):
+    """Nameplate fields of a report: serial, mva, kv, manufacturer, location
+
+    ``text`` is the header and nameplate text of one asset; fields that are
+    not found are left out.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    nameplate = {}
+    serials = page_serials(text)
+    if len(serials) == 1:
+        nameplate['serial'] = normalize_serial(serials[0])
+
+    for i, line in enumerate(lines):
+        cells = [cell.strip() for cell in line.split(' | ')]
+        pairs = []
+        for j, cell in enumerate(cells):
+            match = LABEL_VALUE.match(cell)
+            if match:
+                pairs.append((match.group('label'), match.group('value')))
+            elif j + 1 < len(cells):
+                pairs.append((cell, cells[j + 1]))
+            elif len(cells) == 1 and i + 1 < len(lines):
+                # Label and value on separate lines ("Manufacturer" / "ABB")
+                pairs.append((cell, lines[i + 1].split(' | ')[0]))
+        for label, value in pairs:
+            for field, pattern in NAMEPLATE_LABELS.items():
+                if field in nameplate or not pattern.match(label):
+                    continue
+                # "MVA 25" / "kV 69/12.47": the value follows the unit label
+                if pattern.match(label).end() < len(label):
+                    value = label[pattern.match(label).end():].strip(' :') or value
+                if field == 'mva':
+                    # "kVA | 5000": the unit is in the label
+                    value = normalize_rating(value if POWER_RATING.search(value) else f"{value} {label}")
+                elif field == 'kv':
+                    value = _number_list(value)
+                if value and not LABEL_VALUE.match(value):
+                    nameplate[field] = value.strip()
+
+    if 'mva' not in nameplate:
+        match = POWER_RATING.search(text)
+        if match:
+            nameplate['mva'] = normalize_rating(match.group(0))
+    if 'kv' not in nameplate:
+        match = VOLTAGE_RATIO.search(text)
+        if match:
+            nameplate['kv'] = _number_list(match.group('value'))
+    return nameplate
+
+def serial_match_key(serial):
+    """Serial with OCR-confusable characters folded, so "L2474398" matches "L247439B"""
+    return serial.translate(SERIAL_CONFUSABLES)
+
+def normalize_name(name):
+    """Comparable form of an equipment name, or None for fallback names"""
+    if not name or GENERIC_NAME.match(name):
+        return None
+    return re.sub(r'[^a-z0-9]', '', name.lower()) or None
+
+def name_is_weak(name):
+    """True for names too short to identify a transformer alone ("Substation_2")"""
+    core = re.sub(r'[^A-Za-z0-9]', '', NAME_PREFIX.sub('', name or ''))
+    return len(core) <= 2 or not any(char.isdigit() for char in core) and len(core) <= 4
+
+class AssetRegistry:
+    """Index of known assets, persisted as JSON
+
+    Each asset record holds its ID, serial numbers (the first one plus
+    variants seen), names, nameplate fields and the reports resolved to it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('TRAX_ASSET_REGISTRY') or DEFAULT_REGISTRY_PATH
+        self.assets = {}
+        self.next_id = 1
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.assets = {asset['asset_id']: asset for asset in data.get('assets', [])}
+            self.next_id = data.get('next_id', len(self.assets) + 1)
+        self.by_serial = {}
+        self.by_serial_key = {}
+        self.by_name = {}
+        for asset in self.assets.values():
+            self._index(asset)
+
+    def _index(self, asset):
+        for serial in asset['serials']:
+            self.by_serial[serial] = asset['asset_id']
+            self.by_serial_key.setdefault(serial_match_key(serial), set()).add(asset['asset_id'])
+        for name in asset['names']:
+            key = normalize_name(name)
+            if key:
+                ids = self.by_name.setdefault(key, [])
+                if asset['asset_id'] not in ids:
+                    ids.append(asset['asset_id'])
+
+    def _compatible(self, asset, nameplate):
+        """Number of agreeing nameplate fields, or None if any field conflicts"""
+        agreeing = 0
+        for field in ('serial', 'mva', 'kv', 'manufacturer'):
+            value = nameplate.get(field)
+            known = asset['serials'] if field == 'serial' else [asset['nameplate'].get(field)]
+            known = [item.lower() for item in known if item]
+            if not value or not known:
+                continue
+            if value.lower() not in known:
+                return None
+            agreeing += 1
+        return agreeing
+
+    def _match_serial(self, serial):
+        asset_id = self.by_serial.get(serial)
+        if asset_id:
+            return asset_id, 'serial'
+        candidates = self.by_serial_key.get(serial_match_key(serial), set())
+        if len(candidates) == 1:
+            return next(iter(candidates)), 'serial~'
+        return None, None
+
+    def _match_name(self, name, nameplate):
+        key = normalize_name(name)
+        if not key:
+            return None, None
+        match = 'name'
+        candidates = self.by_name.get(key)
+        if not candidates:
+            # Spelling variants only: "Substation_22" is not "Substation_23"
+            digits = re.sub(r'\D', '', key)
+            close = [known for known in get_close_matches(key, list(self.by_name), n=3, cutoff=NAME_MATCH_RATIO)
+                     if re.sub(r'\D', '', known) == digits]
+            if len(close) != 1:
+                return None, None
+            candidates = self.by_name[close[0]]
+            match = 'name~'
+        # A name identifies an asset only if its nameplate does not disagree;
+        # weak names ("Substation_2") also need an agreeing nameplate field
+        weak = name_is_weak(name)
+        compatible = []
+        for asset_id in candidates:
+            agreeing = self._compatible(self.assets[asset_id], nameplate)
+            if agreeing is not None and (agreeing or not weak):
+                compatible.append(asset_id)
+        if len(compatible) == 1:
+            return compatible[0], match
+        return None, None
+
+    def resolve(self, serial=None, name=None, nameplate=None, source=None, document_date=None):
+        """Asset record of a report, registering a new asset when none matches
+
+        Serial numbers are matched first (exact, then fuzzy); without a
+        serial match, the equipment name is matched when the nameplate
+        agrees. Returns (asset, match) where match is "serial", "name",
+        "serial~"/"name~" for fuzzy matches or "new".
+        """
+        nameplate = dict(nameplate or {})
+        serial = normalize_serial(serial) if serial else nameplate.get('serial')
+        if serial:
+            nameplate['serial'] = serial
+
+        asset_id, match = self._match_serial(serial) if serial else (None, None)
+        if not asset_id:
+            # A name match is rejected when the serials differ (see _compatible)
+            asset_id, match = self._match_name(name, nameplate)
+
+        if asset_id:
+            asset = self.assets[asset_id]
+        else:
+            asset_id = f"TX-{self.next_id:05d}"
+            self.next_id += 1
+            asset = {'asset_id': asset_id, 'serials': [], 'names': [], 'nameplate': {}, 'reports': []}
+            self.assets[asset_id] = asset
+            match = 'new'
+
+        if serial and serial not in asset['serials']:
+            asset['serials'].append(serial)
+        if normalize_name(name) and name not in asset['names']:
+            asset['names'].append(name)
+        for field, value in nameplate.items():
+            if field != 'serial':
+                asset['nameplate'].setdefault(field, value)
+        if source and source not in asset['reports']:
+            asset['reports'].append(source)
+        if document_date:
+            asset['last_test_date'] = max(document_date, asset.get('last_test_date', document_date))
+        self._index(asset)
+        return asset, match
+
+    def display_name(self, asset, name=None):
+        """Equipment name for outputs: the report's own name unless it is a fallback"""
+        if normalize_name(name):
+            return name
+        for known in asset['names']:
+            return known
+        if asset['serials']:
+            return f"Transformer_{asset['serials'][0]}"
+        return name or asset['asset_id']
+
+    def save(self):
+        """Write the registry atomically"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'next_id': self.next_id, 'assets': list(self.assets.values())}, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
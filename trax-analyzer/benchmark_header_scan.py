@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for header metadata extraction (substation name + document date)
+
+Compares the precompiled single-pass scanner in trax_parser with the legacy
+per-pattern implementation over a corpus of header samples. Pass a folder of
+TRAX PDFs to add their full text to the corpus, which is what the legacy
+functions were given in the pipeline.
+"""
+
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from trax_parser import (PdfDocument, HEADER_LINE_COUNT, extract_substation_name,
+                         iter_text_lines, scan_header_date)
+
+# Representative TRAX header layouts (one value per line, as PyMuPDF extracts them)
+HEADER_SAMPLES = [
+    "TRAX - Test report\nTest Asset\nSubstation\n22\nPosition\nDate: 06/08/2022\nSerial No: L247439A\n",
+    "Customer\nDPU\nSubstation: Sub 16 Location North\nTest Date 2023-04-11\nManufacturer ABB\n",
+    "Diesel Plant StepUp #2\nEquipment: GSU 2\nReport Date: January 15, 2024\nMVA 25\nkV 69/12.47\n",
+    "WRM and TTR Results\nS/N: L247439B\nTested 3/14/21 by Crew 4\nWeather\nCloudy\nTemperature 18 C\n",
+    "Job # 1187\nTest Report for Sub 9 at North Yard Substation\nJan 5, 2023\nAsset ID\nT-0092\n",
+    "LTC Series Winding Tests\nUnit 3\n13/05/2021\nConditions\nDry\n",
+    "15\nTRAX\nTransformer: Sub 15 25kV\nDate 2022/6/8\n",
+    "Winding Resistance\nX1-X0 10.52 mOhm\nX2-X0 10.61 mOhm\nX3-X0 10.49 mOhm\n",
+]
+
+def legacy_document_date(text):
+    """Legacy content-date search: 7 patterns x 20 lines, strptime trial and error"""
+    date_patterns = [
+        r'(?:Date|Test Date|Report Date)[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'(?:Date|Test Date|Report Date)[:\s]*(\d{2,4}[/-]\d{1,2}[/-]\d{1,2})',
+        r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
+        r'(\d{2,4}[/-]\d{1,2}[/-]\d{1,2})',
+        r'(?:Date|Test Date|Report Date)[:\s]*([A-Za-z]+ \d{1,2}, \d{4})',
+        r'([A-Za-z]+ \d{1,2}, \d{4})',
+        r'(\d{4}-\d{2}-\d{2})',
+    ]
+    date_formats = [
+        '%m/%d/%Y', '%m-%d-%Y', '%m/%d/%y', '%m-%d-%y',
+        '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y',
+        '%Y/%m/%d', '%Y-%m-%d',
+        '%B %d, %Y', '%b %d, %Y',
+    ]
+    lines = text.split('\n')[:20]
+    for pattern in date_patterns:
+        for line in lines:
+            match = re.search(pattern, line, re.IGNORECASE)
+            if match:
+                for fmt in date_formats:
+                    try:
+                        return datetime.strptime(match.group(1).strip(), fmt)
+                    except ValueError:
+                        continue
+    return None
+
+def legacy_substation_name(text):
+    """Legacy name search: nested line loops plus 12 uncompiled regexes over the text"""
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    for i, line in enumerate(lines[:20]):
+        if line.lower() == 'substation' and i + 1 < len(lines):
+            for j in range(1, min(4, len(lines) - i)):
+                next_line = lines[i + j].strip()
+                if next_line and len(next_line) < 30 and not next_line.lower() in ['position', 'location', 'test', 'conditions', 'weather', 'temperature']:
+                    return f"Substation_{next_line}"
+    for i, line in enumerate(lines[:15]):
+        if 'test asset' in line.lower() and i + 1 < len(lines):
+            for j in range(1, min(5, len(lines) - i)):
+                if 'substation' in lines[i + j].lower() and j + 1 < len(lines) - i:
+                    substation_id = lines[i + j + 1].strip()
+                    if substation_id and len(substation_id) < 20:
+                        return f"Substation_{substation_id}"
+    patterns = [
+        r'Substation[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test|Position|Job)',
+        r'Station[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+        r'Equipment[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+        r'Transformer[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+        r'Unit[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+        r'Site[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+        r'Location[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Substation|Date|Test)',
+        r'Asset[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+        r'at\s+([A-Za-z0-9\s\-_]+?)\s+(?:Substation|Station)',
+        r'Test\s+Report\s+for\s+([A-Za-z0-9\s\-_]+?)(?:\n|at|Substation)',
+        r'Serial\s*[#No.]*\s*[:\s]*([A-Za-z0-9\-_]+)',
+        r'S/N[:\s]*([A-Za-z0-9\-_]+)',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        if match:
+            name = re.sub(r'\s+', ' ', match.group(1)).strip()
+            if len(name) > 1 and len(name) < 50:
+                return name
+    for i, line in enumerate(lines[:25]):
+        if 'asset id' in line.lower() and i + 1 < len(lines):
+            return f"Asset_{lines[i + 1]}"
+    for line in lines[:10]:
+        if line.isdigit() and 1 <= int(line) <= 9999:
+            return f"Substation_{line}"
+        if re.match(r'^[A-Z0-9\-_]{2,15}$', line):
+            return f"Equipment_{line}"
+    return None
+
+def scanner_metadata(text):
+    """Current path: precompiled single-pass scanners over the header only"""
+    lines = list(islice(iter_text_lines(text), HEADER_LINE_COUNT))
+    return extract_substation_name(text), scan_header_date(lines)
+
+def load_pdf_texts(folder_path):
+    """Full text of every PDF in a folder"""
+    texts = []
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.lower().endswith('.pdf'):
+            with PdfDocument(os.path.join(folder_path, filename)) as doc:
+                texts.append(doc.text)
+    return texts
+
+def time_per_sample(func, corpus, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in corpus:
+            func(text)
+    return (time.perf_counter() - start) / (rounds * len(corpus))
+
+def benchmark(corpus, rounds=200):
+    print("⏱️ HEADER METADATA MICRO-BENCHMARK")
+    print("=" * 50)
+    print(f"📋 Corpus: {len(corpus)} samples x {rounds} rounds")
+
+    legacy = time_per_sample(lambda text: (legacy_substation_name(text), legacy_document_date(text)), corpus, rounds)
+    scanner = time_per_sample(scanner_metadata, corpus, rounds)
+
+    print(f"   Legacy patterns:   {legacy * 1e6:8.1f} µs / header")
+    print(f"   Compiled scanner:  {scanner * 1e6:8.1f} µs / header  ({legacy / scanner:.1f}x)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Usage: python benchmark_header_scan.py [pdf_folder]")
+        sys.exit(1)
+
+    corpus = list(HEADER_SAMPLES)
+    if len(sys.argv) == 2:
+        corpus.extend(load_pdf_texts(sys.argv[1]))
+    benchmark(corpus)
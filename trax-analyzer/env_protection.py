@@ -7,7 +7,7 @@ Prevents corrupted system environment variables from overriding .env files
 import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv, find_dotenv
+from dotenv import load_dotenv, find_dotenv, dotenv_values
 import warnings
 
 class EnvironmentProtector:
@@ -75,20 +75,18 @@ class EnvironmentProtector:
         # Load .env file
         load_dotenv(self.env_file_path, override=True)  # Force override system vars
         
-        # Read directly from file to get the true value
+        # Read directly from file to get the true value (the file may also
+        # hold additional pool keys and TRAX_* settings)
         try:
-            with open(self.env_file_path, 'r') as f:
-                content = f.read().strip()
-                if content.startswith("OPENAI_API_KEY="):
-                    self.env_file_key = content.replace("OPENAI_API_KEY=", "").strip()
-                    
-                    valid, reason = self.validate_api_key(self.env_file_key)
-                    if valid:
-                        self.issues.append(f"✅ Valid .env file key found: {self.env_file_key[:20]}...")
-                        return True
-                    else:
-                        self.issues.append(f"❌ Invalid .env file key: {reason}")
-                        return False
+            self.env_file_key = (dotenv_values(self.env_file_path).get("OPENAI_API_KEY") or "").strip()
+            if self.env_file_key:
+                valid, reason = self.validate_api_key(self.env_file_key)
+                if valid:
+                    self.issues.append(f"✅ Valid .env file key found: {self.env_file_key[:20]}...")
+                    return True
+                else:
+                    self.issues.append(f"❌ Invalid .env file key: {reason}")
+                    return False
         except Exception as e:
             self.issues.append(f"❌ Error reading .env file: {e}")
             return False
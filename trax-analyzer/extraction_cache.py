@@ -0,0 +1,182 @@
+"""
+Content-addressed extraction cache for parsed TRAX PDFs
+Extraction results (page text, metadata, layout, section index and table
+measurements) are stored on disk keyed by the SHA-256 of the PDF bytes plus
+the parser version, so unchanged reports never go through PyMuPDF again.
+Pages are also cached individually by content fingerprint: a reissued report
+with one corrected page only extracts that page, and a scanned page is OCR'd
+only once. The cache is capped in size
+and evicts the least recently used entries.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from trax_parser import PARSER_VERSION, PdfDocument, read_pdf_bytes, split_zip_member
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.trax_cache', 'extraction')
+DEFAULT_MAX_MB = 512
+HASH_CHUNK_BYTES = 1024 * 1024
+
+def buffer_sha256(data):
+    """SHA-256 hex digest of PDF bytes already in memory"""
+    return hashlib.sha256(data).hexdigest()
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """On-disk cache of PdfDocument extraction results with LRU eviction
+
+    Entries live in ``cache_dir`` as gzip-compressed JSON files named after
+    their key. A hit refreshes the entry's modification time, which is what
+    eviction orders by once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv('TRAX_CACHE_DIR') or DEFAULT_CACHE_DIR
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('TRAX_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.pages_reused = 0
+        self.pages_extracted = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, digest):
+        """Cache key for a PDF content digest under the current parser version"""
+        return f"{digest}-v{PARSER_VERSION}"
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def page_key_for(self, fingerprint):
+        """Cache key for a single page fingerprint under the current parser version"""
+        return f"page-{fingerprint}-v{PARSER_VERSION}"
+
+    def _read(self, key):
+        """Cached record for ``key`` or None, refreshing its recency on a hit"""
+        entry_path = self._entry_path(key)
+        try:
+            with gzip.open(entry_path, 'rt', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Refresh recency for LRU eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return record
+
+    def _write(self, key, record):
+        """Store a record atomically"""
+        entry_path = self._entry_path(key)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, entry_path)
+
+    def get(self, key):
+        """Cached record for ``key`` or None; counts the hit or miss"""
+        record = self._read(key)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return record
+
+    def put(self, key, record):
+        """Store a record atomically, then evict old entries if over the size cap"""
+        self._write(key, record)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json.gz'):
+                continue
+            entry_path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total += stat.st_size
+
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+                total -= size
+            except OSError:
+                pass
+
+    def load_document(self, path, workers=None, data=None):
+        """PdfDocument for ``path``, rebuilt from the cache when its content is known
+
+        With ``data`` (the PDF bytes) the key is hashed from memory and a miss
+        is parsed from the same buffer, so the file is read only once. On a
+        miss the returned document is a normal, lazily opened PdfDocument;
+        call ``store`` once it has been processed.
+        """
+        if data is None and split_zip_member(path):
+            data = read_pdf_bytes(path)
+        digest = buffer_sha256(data) if data is not None else file_sha256(path)
+        key = self.key_for(digest)
+        record = self.get(key)
+        if record is not None:
+            doc = PdfDocument.from_cache_record(path, record)
+        else:
+            doc = PdfDocument(path, workers=workers, data=data)
+            self._seed_pages(doc)
+        doc.cache_key = key
+        return doc
+
+    def _seed_pages(self, doc):
+        """Fill a new document with the cached extraction of its unchanged pages
+
+        Sets ``doc.changed_pages`` to the pages that still need extracting.
+        """
+        doc.changed_pages = []
+        for page_no, fingerprint in enumerate(doc.page_fingerprints):
+            record = self._read(self.page_key_for(fingerprint))
+            if record is None:
+                doc.changed_pages.append(page_no)
+            else:
+                doc.seed_page(page_no, record)
+        self.pages_reused += doc.page_count - len(doc.changed_pages)
+        self.pages_extracted += len(doc.changed_pages)
+
+    def store(self, doc):
+        """Cache a freshly extracted document and its new pages (no-op for documents loaded from cache)"""
+        if doc.from_cache:
+            return
+        # Unread scans are left out so they are retried on the next run,
+        # e.g. once Tesseract is installed
+        for page_no in doc.changed_pages or []:
+            if doc.page_sources[page_no] != 'image':
+                self._write(self.page_key_for(doc.page_fingerprints[page_no]), doc.to_page_record(page_no))
+        if 'image' in doc.page_sources:
+            self.evict()
+        else:
+            self.put(doc.cache_key, doc.to_cache_record())
+
+    def print_report(self):
+        total = self.hits + self.misses
+        print(f"   💾 Extraction cache: {self.hits} hits, {self.misses} misses"
+              + (f" ({self.hits / total:.0%} hit rate)" if total else ""))
+        if self.pages_reused:
+            print(f"   ♻️ Pages reused from earlier extractions: {self.pages_reused}"
+                  f" ({self.pages_extracted} extracted)")
@@ -0,0 +1,71 @@
+"""
+Incremental parsing of the top-level sections of a streamed JSON response
+A v3.0 analysis takes tens of seconds to generate, but its JSON is written
+section by section (winding_resistance, ..., bushing_pf_c1, ...,
+predictive_maintenance_plan). JsonSectionParser is fed the streamed text and
+returns each top-level member as soon as its value is complete, so findings
+can be acted on while the model is still writing the rest.
+"""
+
+import json
+
+class JsonSectionParser:
+    """Feed streamed text; ``feed`` returns the (name, value) members completed by it
+
+    Text before the first "{" (e.g. a ```json fence) and everything after
+    the closing "}" (the narrative report) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member_start = None
+        self.done = False
+
+    def feed(self, text):
+        self.buffer += text
+        sections = []
+        while self.pos < len(self.buffer) and not self.done:
+            char = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif self.member_start is None:
+                if char == '{':
+                    self.depth = 1
+                    self.member_start = self.pos + 1
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    sections.extend(self._member(self.pos))
+                    self.done = True
+            elif char == ',' and self.depth == 1:
+                sections.extend(self._member(self.pos))
+                self.member_start = self.pos + 1
+            self.pos += 1
+        return sections
+
+    def _member(self, end):
+        text = self.buffer[self.member_start:end].strip()
+        if not text:
+            return []
+        try:
+            return list(json.loads('{' + text + '}').items())
+        except ValueError as e:
+            print(f"   ⚠️ Skipping unparsable JSON section {text[:40]!r}: {e}")
+            return []
+
+def iter_json_sections(text):
+    """(name, value) of each top-level member of the JSON object at the start of ``text``"""
+    return JsonSectionParser().feed(text or '')
@@ -1,10 +1,11 @@
-from trax_parser import extract_text_from_pdf
+from trax_parser import extract_relevant_text
 from trax_analyzer import analyze_trax_report
 import os
 import csv
 
 def process_file(pdf_path):
-    text = extract_text_from_pdf(pdf_path)
+    # Relevant pages only, so the analyzer's truncation window covers the test tables
+    text = extract_relevant_text(pdf_path)
     report = analyze_trax_report(text)
     return report
 
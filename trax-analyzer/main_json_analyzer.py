@@ -17,33 +17,330 @@ PREDICTIVE MAINTENANCE v3.0:
 
 import sys
 import os
+import asyncio
+import time
 import json
 import csv
+import zipfile
 import pandas as pd
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from trax_parser import extract_text_from_pdf, extract_substation_name, extract_document_date
-from trax_analyzer_json import analyze_trax_report_json
+from trax_parser import (PdfDocument, read_pdf_bytes, prefetch_pdf_bytes, changed_sections,
+                         page_source_summary, clean_filename, zip_pdf_paths)
+from trax_segments import filename_serials, normalize_serial
+from trax_exports import EXPORT_EXTENSIONS, is_trax_export, load_trax_export
+from trax_tables import apply_measurements
+from extraction_cache import ExtractionCache
+from asset_registry import AssetRegistry, extract_nameplate
+from trax_analyzer_json import analyze_trax_report_json, request_analysis_async
+from response_cache import SOURCE_CACHE, get_response_cache
+from openai_client import aclose_async_client, print_rate_limiter_report
 
-def process_file_json(file_path, equipment_name=None):
-    """Process a single PDF file and return JSON analysis with document date"""
+# Transformers of one multi-asset report analyzed at the same time
+ASSET_ANALYSIS_WORKERS = 4
+
+# Analysis requests kept in flight by the batch driver (keep within the
+# OpenAI connection pool, TRAX_OPENAI_POOL_SIZE)
+ANALYSIS_CONCURRENCY = int(os.getenv('TRAX_ANALYSIS_CONCURRENCY', 8))
+
+# Input files: rendered PDF reports and native TRAX instrument exports
+INPUT_EXTENSIONS = ('.pdf',) + EXPORT_EXTENSIONS
+
+# Reports of one asset dated at most this many days apart belong to the same
+# test campaign (WRM/TTR and insulation tests are often done on different days)
+CAMPAIGN_WINDOW_DAYS = 7
+
+def report_skipped_pages(section_index):
+    """Print the sections found and the pages left out of the analysis prompt"""
+    if section_index['sections']:
+        print(f"   🗂️ Sections: {', '.join(dict.fromkeys(entry['section'] for entry in section_index['sections']))}")
+    else:
+        print("   ⚠️ No test section headings found - sending the full document")
+        return
+    skipped = [f"{page_no + 1} ({kind})" for page_no, kind in enumerate(section_index['page_kinds'])
+               if page_no not in section_index['relevant_pages']]
+    if skipped:
+        print(f"   ✂️ Skipped pages: {', '.join(skipped)}")
+
+def format_page_ranges(page_numbers):
+    """Compact 1-based listing of 0-based page numbers, e.g. 2, 4-403"""
+    ranges = []
+    for page_no in sorted(page_numbers):
+        if ranges and page_no == ranges[-1][1] + 1:
+            ranges[-1][1] = page_no
+        else:
+            ranges.append([page_no, page_no])
+    return ', '.join(f"{first + 1}" if first == last else f"{first + 1}-{last + 1}" for first, last in ranges)
+
+def report_changed_pages(doc):
+    """Print which pages and sections of a partially cached (reissued) report changed"""
+    if not doc.changed_pages or len(doc.changed_pages) == doc.page_count:
+        return
+    pages = format_page_ranges(doc.changed_pages)
+    sections = changed_sections(doc.section_index, doc.changed_pages)
+    print(f"   ♻️ Re-extracted page(s) {pages}"
+          + (f" ({', '.join(sections)})" if sections else "") + ", other pages reused from cache")
+
+def extract_file_units(file_path, equipment_name=None, workers=None, cache=None, data=None):
+    """Extract a PDF into per-transformer work units, without calling the analyzer
+
+    Returns a list of work unit dicts: "source" (file name, plus the asset
+    label for multi-asset reports), "files", "text" (prompt text of the
+    unit's pages), "equipment_name", "document_date", "serial", "nameplate"
+    (see asset_registry.extract_nameplate), "sections", "measurements"
+    (table values read deterministically by trax_tables) and
+    "text_sources" (pages read by OCR or left unread, see
+    trax_parser.page_source_summary). Multi-asset reports are split into
+    one unit per transformer (see trax_segments), named after its serial.
+    With an ExtractionCache, unchanged PDFs are not parsed again. ``data``
+    is the already-read PDF bytes (see prefetch_pdf_bytes).
+    """
+    if is_trax_export(file_path):
+        return extract_export_units(file_path, equipment_name, data)
+    
+    filename = os.path.basename(file_path)
     try:
-        # Extract text from PDF
-        text = extract_text_from_pdf(file_path)
-        
-        # Extract document date
-        document_date = extract_document_date(file_path, text)
-        
-        # If equipment name not provided, extract it from the text
-        if not equipment_name:
-            equipment_name = extract_substation_name(text)
-        
-        # Get AI analysis with document date
-        analysis = analyze_trax_report_json(text, document_date, os.path.basename(file_path))
-        return analysis, equipment_name, document_date
+        # Read the file once; the buffer is hashed for the cache key and
+        # parsed in memory (or the document is restored from the cache)
+        if data is None:
+            data = read_pdf_bytes(file_path)
+        doc = cache.load_document(file_path, workers, data) if cache else PdfDocument(file_path, workers=workers, data=data)
+        with doc:
+            # Only test-relevant pages are analyzed; boilerplate pages are
+            # reported instead of silently dropped
+            report_skipped_pages(doc.section_index)
+            report_changed_pages(doc)
+            document_date = doc.document_date
+            
+            # If equipment name not provided, extract it from the text
+            if not equipment_name:
+                equipment_name = doc.substation_name
+            
+            # Scanned pages: OCR'd text is less reliable than a text layer
+            text_sources = page_source_summary(doc.page_sources)
+            if text_sources.get('ocr_pages'):
+                print(f"   🔎 OCR pages: {', '.join(map(str, text_sources['ocr_pages']))}")
+            if text_sources.get('unread_scanned_pages'):
+                print(f"   ⚠️ Scanned pages without text (Tesseract not available): {', '.join(map(str, text_sources['unread_scanned_pages']))}")
+            
+            # One work unit per transformer, with the core test tables read
+            # locally instead of relying on the LLM
+            asset_units = doc.asset_units
+            if len(asset_units) > 1:
+                print(f"   🔀 Assets in file: {', '.join(unit['label'] for unit in asset_units)}")
+            
+            # Single-asset reports are often named after the unit's serial
+            named = filename_serials(filename)
+            units = []
+            for unit in asset_units:
+                single = unit['label'] is None
+                serial = unit['serial'] or (named[0] if single and len(named) == 1 else None)
+                units.append({
+                    'source': filename if single else f"{filename} [{unit['label']}]",
+                    'files': [filename],
+                    'text': doc.unit_text(unit),
+                    'equipment_name': equipment_name if single else clean_filename(f"{equipment_name}_{unit['label']}"),
+                    'document_date': document_date,
+                    'serial': normalize_serial(serial) if serial else None,
+                    'nameplate': extract_nameplate(doc.unit_nameplate_text(unit)),
+                    'sections': unit['sections'],
+                    'measurements': unit['measurements'],
+                    'text_sources': text_sources,
+                })
+            
+            if cache:
+                cache.store(doc)
+        return units
         
     except Exception as e:
         print(f"❌ Error processing {file_path}: {str(e)}")
-        return None, None, None
+        return []
+
+def extract_export_units(file_path, equipment_name=None, data=None):
+    """Work unit of a native TRAX XML/CSV export (see trax_exports)
+
+    The measurements come straight from the instrument data, so neither PDF
+    parsing nor LLM extraction of numbers is involved.
+    """
+    filename = os.path.basename(file_path)
+    try:
+        export = load_trax_export(file_path, data)
+    except Exception as e:
+        print(f"❌ Error reading export {file_path}: {str(e)}")
+        return []
+    
+    print(f"   ⚡ Instrument export: {', '.join(export['sections']) or 'no test sections found'}")
+    named = filename_serials(filename)
+    serial = export['serial'] or (named[0] if len(named) == 1 else None)
+    return [{
+        'source': filename,
+        'files': [filename],
+        'text': export['text'],
+        'equipment_name': equipment_name or export['substation_name'],
+        'document_date': export['document_date'],
+        'serial': normalize_serial(serial) if serial else None,
+        'nameplate': extract_nameplate(export['text']),
+        'sections': export['sections'],
+        'measurements': export['measurements'],
+        'text_sources': {},
+    }]
+
+def _parse_iso_date(date_string):
+    try:
+        return datetime.strptime(date_string, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def _same_campaign(group, unit):
+    """True if a work unit complements a group of the same asset's units"""
+    covered = {section for member in group for section in member['sections']}
+    if covered.intersection(unit['sections']):
+        # Overlapping tests are a retest or a reissue, not another part of the campaign
+        return False
+    date = _parse_iso_date(unit['document_date'])
+    for member in group:
+        member_date = _parse_iso_date(member['document_date'])
+        if date is None or member_date is None or abs((date - member_date).days) > CAMPAIGN_WINDOW_DAYS:
+            return False
+    return True
+
+def group_work_units(units):
+    """Group work units that belong to one asset and test campaign
+
+    Units with the same serial, dated within CAMPAIGN_WINDOW_DAYS of each
+    other and covering different test sections (e.g. a WRM/TTR report and
+    the insulation report of the same transformer) are analyzed together.
+    Units without a serial are never merged: a substation name alone does
+    not identify a transformer. Returns lists of units in input order.
+    """
+    groups = []
+    by_serial = {}
+    for unit in units:
+        if not unit['serial']:
+            groups.append([unit])
+            continue
+        for group in by_serial.get(unit['serial'], []):
+            if _same_campaign(group, unit):
+                group.append(unit)
+                break
+        else:
+            group = [unit]
+            groups.append(group)
+            by_serial.setdefault(unit['serial'], []).append(group)
+    return groups
+
+def combine_work_units(group):
+    """Single work unit for a group: the reports' texts under source-file headers,
+    their measurements merged by section
+    """
+    if len(group) == 1:
+        return group[0]
+    
+    measurements = {}
+    text_sources = {}
+    nameplate = {}
+    for member in group:
+        for field, value in member['nameplate'].items():
+            nameplate.setdefault(field, value)
+        for section, values in member['measurements'].items():
+            measurements.setdefault(section, values)
+        for key, pages in (member['text_sources'] or {}).items():
+            text_sources.setdefault(key, []).extend(f"{member['source']} p{page_no}" for page_no in pages)
+    
+    sections = []
+    for member in group:
+        sections.extend(section for section in member['sections'] if section not in sections)
+    
+    # Prefer a name read from a report over the timestamp fallback name
+    named = [member for member in group if not member['equipment_name'].startswith('Transformer_')]
+    return {
+        'source': ' + '.join(member['source'] for member in group),
+        'files': [filename for member in group for filename in member['files']],
+        'text': '\n'.join(f"=== SOURCE FILE: {member['source']} ===\n{member['text']}" for member in group),
+        'equipment_name': (named or group)[0]['equipment_name'],
+        'document_date': min(member['document_date'] for member in group),
+        'serial': group[0]['serial'],
+        'nameplate': nameplate,
+        'sections': sections,
+        'measurements': measurements,
+        'text_sources': text_sources,
+    }
+
+def resolve_assets(units, registry):
+    """Resolve each analysis unit to a persistent asset ID (see asset_registry)
+
+    Sets "asset_id" on every unit and replaces fallback equipment names
+    ("Transformer_<timestamp>") with the name on record for the asset.
+    """
+    for unit in units:
+        asset, match = registry.resolve(unit['serial'], unit['equipment_name'], unit['nameplate'],
+                                        unit['source'], unit['document_date'])
+        unit['asset_id'] = asset['asset_id']
+        unit['equipment_name'] = registry.display_name(asset, unit['equipment_name'])
+        print(f"   🏷️ {asset['asset_id']} ({match}): {unit['source']}")
+    registry.save()
+
+def work_unit_test_types(unit):
+    """Tests found by the parser (headings and table values); they select the prompt schema"""
+    return list(dict.fromkeys(unit['sections'] + list(unit['measurements'] or {})))
+
+def analyze_work_unit(unit):
+    """(analysis, equipment_name, document_date, measurements, text_sources) for one work unit"""
+    analysis = analyze_trax_report_json(unit['text'], unit['document_date'], unit['source'],
+                                        unit['measurements'], unit['text_sources'], work_unit_test_types(unit))
+    return analysis, unit['equipment_name'], unit['document_date'], unit['measurements'], unit['text_sources']
+
+async def analyze_work_unit_async(unit, cache=None, on_section=None):
+    """(analysis, source) for one work unit; source is "api", "cache" or "shared" (see response_cache)
+
+    ``on_section(name, value)`` receives each top-level JSON section while
+    the response streams in (see trax_analyzer_json).
+    """
+    return await request_analysis_async(unit['text'], unit['document_date'], unit['source'], unit['measurements'],
+                                        unit['text_sources'], work_unit_test_types(unit), cache, on_section)
+
+def critical_findings(value, path):
+    """Labels of the entries of a JSON section whose status is CRITICAL"""
+    found = []
+    if isinstance(value, dict):
+        status = value.get('status')
+        if isinstance(status, str) and 'CRITICAL' in status.upper():
+            found.append(value.get('designation') or value.get('phase') or value.get('tap_position') or path)
+        for key, item in value.items():
+            if isinstance(item, (dict, list)):
+                found.extend(critical_findings(item, f"{path}.{key}"))
+    elif isinstance(value, list):
+        for position, item in enumerate(value):
+            found.extend(critical_findings(item, f"{path}[{position}]"))
+    return found
+
+def analyze_work_units(units):
+    """Analyze work units side by side, results in input order"""
+    if not units:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(units), ASSET_ANALYSIS_WORKERS)) as pool:
+        return list(pool.map(analyze_work_unit, units))
+
+def process_file_units(file_path, equipment_name=None, workers=None, cache=None, data=None):
+    """Process a PDF and return one JSON analysis per transformer it covers
+
+    Returns a list of (analysis, equipment_name, document_date,
+    measurements, text_sources) tuples (see extract_file_units).
+    """
+    return analyze_work_units(extract_file_units(file_path, equipment_name, workers, cache, data))
+
+def process_file_json(file_path, equipment_name=None, workers=None, cache=None, data=None):
+    """Process a single PDF file and return JSON analysis with document date
+
+    Returns the first (analysis, equipment_name, document_date,
+    measurements, text_sources) of process_file_units; use that function
+    for files that may cover more than one transformer.
+    """
+    results = process_file_units(file_path, equipment_name, workers, cache, data)
+    if not results:
+        return None, None, None, None, None
+    return results[0]
 
 def extract_json_from_response(response_text):
     """Extract JSON and human-readable parts from AI response"""
@@ -54,6 +351,14 @@ def extract_json_from_response(response_text):
             print("❌ No JSON found in response")
             return None, response_text
         
+        # Structured responses start with a complete JSON object; the brace
+        # scan below is the fallback for malformed free-form responses
+        try:
+            json_data, end_idx = json.JSONDecoder().raw_decode(response_text, start_idx)
+            return json_data, response_text[end_idx:].strip()
+        except json.JSONDecodeError:
+            pass
+        
         # Find the matching closing brace
         brace_count = 0
         end_idx = start_idx
@@ -81,6 +386,34 @@ def extract_json_from_response(response_text):
         print(f"❌ Error extracting JSON: {e}")
         return None, response_text
 
+def find_pdf_inputs(folder_path):
+    """Files to analyze: PDFs and TRAX exports in a folder plus those inside
+    its ZIP archives, or those inside a single ZIP archive
+
+    Archive members get paths such as "campaign.zip!/r1.pdf" and are read
+    straight from the archive (see trax_parser.read_pdf_bytes).
+    """
+    if os.path.isfile(folder_path):
+        return zip_pdf_paths(folder_path, INPUT_EXTENSIONS) if folder_path.lower().endswith('.zip') else []
+    
+    pdf_paths = []
+    for filename in os.listdir(folder_path):
+        path = os.path.join(folder_path, filename)
+        if filename.lower().endswith(INPUT_EXTENSIONS):
+            pdf_paths.append(path)
+        elif filename.lower().endswith('.zip'):
+            try:
+                pdf_paths.extend(zip_pdf_paths(path, INPUT_EXTENSIONS))
+            except zipfile.BadZipFile:
+                print(f"⚠️ Skipping unreadable archive: {filename}")
+    return pdf_paths
+
+def output_folder(folder_path):
+    """Folder receiving the outputs; a ZIP archive gets a folder next to it named after it"""
+    if os.path.isfile(folder_path):
+        return os.path.splitext(folder_path)[0]
+    return folder_path
+
 def create_organized_folders(base_path):
     """Create organized folder structure for outputs"""
     folders = {
@@ -249,8 +582,174 @@ def export_to_csv_for_dashboard(all_json_data, output_folder):
     
     return csv_files
 
-def main_json_analyzer(folder_path):
-    """Main function to process TRAX reports and generate organized outputs"""
+def output_base_name(equipment_name, asset_id, document_date):
+    """Output file name of an analysis: "<equipment_name>_<asset_id>_<document_date>" with an asset ID"""
+    return f"{equipment_name}_{asset_id}_{document_date}" if asset_id else equipment_name
+
+def output_names(units):
+    """Output file name of every work unit (see save_analysis)
+
+    Reports of one asset and date that group_work_units keeps apart
+    (retests, reissues) would share a name and overwrite each other's
+    files; those get the stem of their first source file appended, and the
+    unit's position if even that is shared.
+    """
+    names = [output_base_name(unit['equipment_name'], unit.get('asset_id'), unit['document_date']) for unit in units]
+    counts = Counter(names)
+    names = [f"{name}_{clean_filename(os.path.splitext(unit['files'][0])[0])}" if counts[name] > 1 else name
+             for name, unit in zip(names, units)]
+    counts = Counter(names)
+    return [f"{name}_{index + 1}" if counts[name] > 1 else name for index, name in enumerate(names)]
+
+def save_analysis(pdf_file, analysis, equipment_name, document_date, measurements, text_sources, folders, all_json_data,
+                  asset_id=None, nameplate=None, output_name=None):
+    """Write the JSON and text report of one analysis; returns its processing summary row
+
+    With an ``asset_id`` (see resolve_assets) output files are named
+    "<equipment_name>_<asset_id>_<document_date>", so transformers that share
+    a substation name no longer overwrite each other. ``output_name``
+    overrides the name (see output_names).
+    """
+    print(f"   📍 Equipment identified: {equipment_name}" + (f" [{asset_id}]" if asset_id else ""))
+    print(f"   📅 Document date: {document_date}")
+    if measurements:
+        print(f"   📐 Tables read locally: {', '.join(sorted(measurements))}")
+    
+    # Extract JSON and human-readable parts
+    json_data, human_readable = extract_json_from_response(analysis)
+    
+    if json_data:
+        # Measured table values take precedence over LLM-read ones
+        apply_measurements(json_data, measurements)
+        if isinstance(json_data.get('report_metadata'), dict):
+            if text_sources:
+                json_data['report_metadata']['text_sources'] = text_sources
+            if asset_id:
+                json_data['report_metadata']['asset_id'] = asset_id
+                json_data['report_metadata']['nameplate'] = nameplate or {}
+        
+        # Store for dashboard aggregation
+        # One entry per asset and test date keeps each asset's history
+        output_name = output_name or output_base_name(equipment_name, asset_id, document_date)
+        all_json_data[output_name] = json_data
+        
+        # Save individual JSON file
+        json_filename = f"{output_name}_analysis.json"
+        json_path = os.path.join(folders['json_data'], json_filename)
+        
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(json_data, f, indent=2, ensure_ascii=False)
+        
+        # Save human-readable report
+        report_filename = f"{output_name}_diagnostic_report.txt"
+        report_path = os.path.join(folders['reports'], report_filename)
+        
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(f"TRANSFORMER DIAGNOSTIC REPORT\n")
+            f.write(f"Equipment: {equipment_name}\n")
+            if asset_id:
+                f.write(f"Asset ID: {asset_id}\n")
+            f.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"Source File: {pdf_file}\n")
+            f.write("=" * 60 + "\n\n")
+            f.write(human_readable)
+        
+        print(f"   ✅ JSON: {json_filename}")
+        print(f"   ✅ Report: {report_filename}")
+        
+        return {
+            'equipment_name': equipment_name,
+            'asset_id': asset_id or '',
+            'source_file': pdf_file,
+            'json_file': json_filename,
+            'report_file': report_filename,
+            'status': 'Success'
+        }
+    else:
+        print(f"   ❌ Failed to extract JSON from {pdf_file}")
+        return {
+            'equipment_name': equipment_name or 'Unknown',
+            'asset_id': asset_id or '',
+            'source_file': pdf_file,
+            'json_file': 'N/A',
+            'report_file': 'N/A',
+            'status': 'Failed'
+        }
+
+def first_section_seconds(timing):
+    """Time to the first streamed JSON section for the summary CSV, '' if none arrived"""
+    return round(timing['first_section'], 2) if 'first_section' in timing else ''
+
+async def analyze_and_save_units(units, folders, all_json_data, concurrency=ANALYSIS_CONCURRENCY, cache=None):
+    """Analyze work units with up to ``concurrency`` requests in flight
+
+    Each result is written (save_analysis) as soon as its request
+    completes. With a ResponseCache, previously answered and duplicate
+    requests are not sent again; the summary rows note where each response
+    came from. Responses are streamed: CRITICAL findings are reported as
+    soon as their JSON section is complete, and the rows record the time to
+    the first section. Returns the processing summary rows in input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    rows = [None] * len(units)
+    names = output_names(units)
+    
+    async def run(index, unit):
+        source_file = '; '.join(unit['files'])
+        timing = {}
+        source = ''
+        
+        def on_section(name, value):
+            if 'first_section' not in timing:
+                timing['first_section'] = time.monotonic() - timing['start']
+            for finding in critical_findings(value, name):
+                print(f"   🚨 {unit['source']}: CRITICAL {name} finding ({finding})")
+        
+        try:
+            async with semaphore:
+                timing['start'] = time.monotonic()
+                analysis, source = await analyze_work_unit_async(unit, cache, on_section)
+            print(f"\n📄 Results: {unit['source']}" + (" (cached response)" if source == SOURCE_CACHE else ""))
+            if 'first_section' in timing:
+                print(f"   ⏱️ First JSON section after {timing['first_section']:.1f}s")
+            if not analysis:
+                print(f"   ❌ Failed to analyze {unit['source']}")
+                return
+            rows[index] = save_analysis(source_file, analysis, unit['equipment_name'], unit['document_date'],
+                                        unit['measurements'], unit['text_sources'], folders, all_json_data,
+                                        unit.get('asset_id'), unit['nameplate'], names[index])
+            rows[index].update(response_source=source, first_section_seconds=first_section_seconds(timing))
+        except Exception as e:
+            print(f"   ❌ Error processing {unit['source']}: {str(e)}")
+            rows[index] = {
+                'equipment_name': 'Error',
+                'asset_id': unit.get('asset_id') or '',
+                'source_file': source_file,
+                'json_file': 'N/A',
+                'report_file': 'N/A',
+                'status': f'Error: {str(e)}',
+                'response_source': source,
+                'first_section_seconds': first_section_seconds(timing),
+            }
+    
+    try:
+        await asyncio.gather(*(run(index, unit) for index, unit in enumerate(units)))
+    finally:
+        await aclose_async_client()
+    return [row for row in rows if row]
+
+def main_json_analyzer(folder_path, workers=None, use_cache=True, concurrency=ANALYSIS_CONCURRENCY):
+    """Main function to process TRAX reports and generate organized outputs
+
+    ``folder_path`` is a folder of PDFs and/or ZIP archives of PDFs, or a
+    single ZIP archive processed as one batch.
+    ``workers`` > 1 extracts long PDFs page-parallel in a process pool.
+    ``use_cache`` reuses extraction results of unchanged PDFs and LLM
+    responses to unchanged requests across runs.
+    ``concurrency`` is the number of analysis requests kept in flight.
+    Every analysis is resolved to a persistent asset ID through the asset
+    registry (see asset_registry.AssetRegistry).
+    """
     
     print("🔍 TRANSFORMER DIAGNOSTIC AGENT v3.0 - PREDICTIVE MAINTENANCE ENHANCED")
     print("=" * 70)
@@ -261,89 +760,63 @@ def main_json_analyzer(folder_path):
         print(f"❌ Folder not found: {folder_path}")
         return
     
-    # Create organized folder structure
-    folders = create_organized_folders(folder_path)
-    
-    # Get all PDF files
-    pdf_files = [f for f in os.listdir(folder_path) if f.lower().endswith('.pdf')]
+    # Get all PDF files, including those inside ZIP archives
+    try:
+        file_paths = find_pdf_inputs(folder_path)
+    except zipfile.BadZipFile:
+        print(f"❌ Not a readable ZIP archive: {folder_path}")
+        return
+    pdf_files = [os.path.basename(file_path) for file_path in file_paths]
     
     if not pdf_files:
-        print(f"❌ No PDF files found in {folder_path}")
+        print(f"❌ No PDF files or TRAX exports found in {folder_path}")
         return
     
-    results = []
+    # Create organized folder structure
+    folders = create_organized_folders(output_folder(folder_path))
+    
+    cache = None
+    if use_cache:
+        try:
+            cache = ExtractionCache()
+        except OSError as e:
+            print(f"⚠️ Extraction cache disabled: {e}")
+    
+    registry = None
+    try:
+        registry = AssetRegistry()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Asset registry disabled: {e}")
+    
     all_json_data = {}
     
-    for pdf_file in pdf_files:
-        print(f"\n📄 Processing: {pdf_file}")
-        file_path = os.path.join(folder_path, pdf_file)
-        
+    # Extract every file first so reports of the same asset can be combined.
+    # Upcoming PDFs are read in the background while the current one is parsed
+    work_units = []
+    for pdf_file, (file_path, data) in zip(pdf_files, prefetch_pdf_bytes(file_paths)):
+        print(f"\n📄 Extracting: {pdf_file}")
+        units = extract_file_units(file_path, workers=workers, cache=cache, data=data)
+        if not units:
+            print(f"   ❌ Failed to extract {pdf_file}")
+        work_units.extend(units)
+    
+    # One analysis call per asset and test campaign
+    analysis_units = [combine_work_units(group) for group in group_work_units(work_units)]
+    print(f"\n🧩 {len(work_units)} work units -> {len(analysis_units)} analysis calls")
+    for unit in analysis_units:
+        if len(unit['files']) > 1:
+            print(f"   🧩 {unit['serial']} ({unit['document_date']}): {unit['source']}")
+    
+    if registry:
+        print(f"\n🏷️ Resolving asset identities...")
         try:
-            # Get analysis from JSON analyzer
-            analysis, equipment_name, document_date = process_file_json(file_path)
-            
-            if not analysis:
-                print(f"   ❌ Failed to analyze {pdf_file}")
-                continue
-            
-            print(f"   📍 Equipment identified: {equipment_name}")
-            print(f"   📅 Document date: {document_date}")
-            
-            # Extract JSON and human-readable parts
-            json_data, human_readable = extract_json_from_response(analysis)
-            
-            if json_data:
-                # Store for dashboard aggregation
-                all_json_data[equipment_name] = json_data
-                
-                # Save individual JSON file
-                json_filename = f"{equipment_name}_analysis.json"
-                json_path = os.path.join(folders['json_data'], json_filename)
-                
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(json_data, f, indent=2, ensure_ascii=False)
-                
-                # Save human-readable report
-                report_filename = f"{equipment_name}_diagnostic_report.txt"
-                report_path = os.path.join(folders['reports'], report_filename)
-                
-                with open(report_path, 'w', encoding='utf-8') as f:
-                    f.write(f"TRANSFORMER DIAGNOSTIC REPORT\n")
-                    f.write(f"Equipment: {equipment_name}\n")
-                    f.write(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"Source File: {pdf_file}\n")
-                    f.write("=" * 60 + "\n\n")
-                    f.write(human_readable)
-                
-                print(f"   ✅ JSON: {json_filename}")
-                print(f"   ✅ Report: {report_filename}")
-                
-                results.append({
-                    'equipment_name': equipment_name,
-                    'source_file': pdf_file,
-                    'json_file': json_filename,
-                    'report_file': report_filename,
-                    'status': 'Success'
-                })
-            else:
-                print(f"   ❌ Failed to extract JSON from {pdf_file}")
-                results.append({
-                    'equipment_name': equipment_name or 'Unknown',
-                    'source_file': pdf_file,
-                    'json_file': 'N/A',
-                    'report_file': 'N/A',
-                    'status': 'Failed'
-                })
-                
-        except Exception as e:
-            print(f"   ❌ Error processing {pdf_file}: {str(e)}")
-            results.append({
-                'equipment_name': 'Error',
-                'source_file': pdf_file,
-                'json_file': 'N/A',
-                'report_file': 'N/A',
-                'status': f'Error: {str(e)}'
-            })
+            resolve_assets(analysis_units, registry)
+        except OSError as e:
+            print(f"⚠️ Asset registry not saved: {e}")
+    
+    print(f"\n🤖 Analyzing {len(analysis_units)} assets ({min(concurrency, len(analysis_units))} at a time)...")
+    response_cache = get_response_cache() if use_cache else None
+    results = asyncio.run(analyze_and_save_units(analysis_units, folders, all_json_data, concurrency, response_cache))
     
     # Generate dashboard CSV files
     if all_json_data:
@@ -354,7 +827,8 @@ def main_json_analyzer(folder_path):
     # Create summary report
     summary_path = os.path.join(folders['reports'], 'processing_summary.csv')
     with open(summary_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['equipment_name', 'source_file', 'json_file', 'report_file', 'status'])
+        writer = csv.DictWriter(f, fieldnames=['equipment_name', 'asset_id', 'source_file', 'json_file', 'report_file', 'status',
+                                               'response_source', 'first_section_seconds'])
         writer.writeheader()
         writer.writerows(results)
     
@@ -363,6 +837,11 @@ def main_json_analyzer(folder_path):
     print(f"📊 Processed: {len(pdf_files)} PDF files")
     print(f"✅ Successful: {len([r for r in results if r['status'] == 'Success'])}")
     print(f"❌ Failed: {len([r for r in results if r['status'] != 'Success'])}")
+    if cache:
+        cache.print_report()
+    if response_cache:
+        response_cache.print_report()
+    print_rate_limiter_report()
     print(f"\n📁 Output Folders:")
     print(f"   📄 Reports: {folders['reports']}")
     print(f"   🔧 JSON Data: {folders['json_data']}")
@@ -375,9 +854,10 @@ def main_json_analyzer(folder_path):
     print(f"   • Set up alerts for CRITICAL status values")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python main_json_analyzer.py <folder_path>")
+    if len(sys.argv) not in (2, 3, 4):
+        print("Usage: python main_json_analyzer.py <folder_or_zip_path> [extraction_workers] [analysis_concurrency]")
         print("Example: python main_json_analyzer.py \"C:\\Users\\craig\\OneDrive\\Documents\\DPU\\Projects\\TRAX_Reports\"")
         sys.exit(1)
     
-    main_json_analyzer(sys.argv[1]) 
\ No newline at end of file
+    main_json_analyzer(sys.argv[1], int(sys.argv[2]) if len(sys.argv) >= 3 else None,
+                       concurrency=int(sys.argv[3]) if len(sys.argv) == 4 else ANALYSIS_CONCURRENCY)
@@ -1,4 +1,4 @@
-from trax_parser import extract_text_from_pdf
+from trax_parser import extract_relevant_text
 from trax_analyzer_enhanced import analyze_trax_report_enhanced
 import os
 import csv
@@ -9,7 +9,8 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
 
 def process_file_with_word_report(pdf_path):
-    text = extract_text_from_pdf(pdf_path)
+    # Relevant pages only, so the analyzer's truncation window covers the test tables
+    text = extract_relevant_text(pdf_path)
     report = analyze_trax_report_enhanced(text)
     return report
 
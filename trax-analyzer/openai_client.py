@@ -0,0 +1,435 @@
+"""
+Process-wide OpenAI client for the TRAX analyzers
+Configuration (.env / environment protection) is loaded and validated once
+per process, and every analysis call shares one client, so a batch reuses
+one HTTP connection pool with keep-alive instead of paying for config I/O
+and a fresh TCP/TLS handshake per report. Requests go through
+create_chat_completion, which paces them with an adaptive rate limiter
+(see rate_limiter) and retries 429s and transient errors, optionally
+streaming the completion text as it is generated.
+
+Several API keys (projects with their own quota) can be pooled: each key
+gets its own clients, rate limit budget and health record, and every
+request goes to the usable key with the most remaining headroom. Keys that
+fail authentication or run out of billing quota are taken out of rotation;
+keys with repeated connection/server errors cool down for a while.
+
+All OpenAI settings live here, overridable through the environment or .env:
+  TRAX_OPENAI_MODEL            model name (default gpt-4o)
+  TRAX_OPENAI_TIMEOUT          read timeout per request in seconds (default 180)
+  TRAX_OPENAI_CONNECT_TIMEOUT  connect timeout in seconds (default 10)
+  TRAX_OPENAI_POOL_SIZE        pooled connections (default 8)
+  TRAX_OPENAI_MAX_RETRIES      retries of a throttled or failed request (default 5)
+  TRAX_OPENAI_TPM / _RPM       starting token/request quota per minute of each
+                               key, until the API's x-ratelimit-* headers report
+                               the real one
+  OPENAI_API_KEYS              additional pooled keys, comma-separated; also
+                               OPENAI_API_KEY_1, OPENAI_API_KEY_2, ...
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+import openai
+from dotenv import load_dotenv
+from openai.types.chat import ChatCompletion
+from rate_limiter import (DEFAULT_RPM, DEFAULT_TPM, SLOT_POLL_SECONDS, RateLimiter, estimate_tokens,
+                          retry_after_seconds)
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_TIMEOUT = 180.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_POOL_SIZE = 8
+DEFAULT_MAX_RETRIES = 5
+
+# Exponential backoff of retried requests without a retry-after header
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Consecutive connection/server errors after which a pooled key cools down
+KEY_FAILURE_LIMIT = 3
+KEY_COOLDOWN_SECONDS = 60.0
+
+_LOCK = threading.Lock()
+_SETTINGS = None
+_CREDENTIALS = None
+
+def _load_api_key():
+    # Use protected environment loading to prevent API key conflicts
+    try:
+        from env_protection import setup_protected_environment
+        api_key = setup_protected_environment()
+        if not api_key:
+            raise ValueError("No valid API key found. Please check your .env file and ensure no corrupted system environment variables exist.")
+    except ImportError:
+        # Fallback to regular loading if protection module not available
+        load_dotenv()
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OpenAI API key not found. Please check your .env file.")
+    return api_key
+
+def _validate_key(api_key):
+    try:
+        from env_protection import EnvironmentProtector
+        return EnvironmentProtector().validate_api_key(api_key)
+    except ImportError:
+        return True, "Not checked"
+
+def _pool_keys(api_key):
+    """API keys of the credential pool: the protected key first, then OPENAI_API_KEYS
+    and OPENAI_API_KEY_<n>; invalid and duplicate keys are skipped
+    """
+    candidates = [api_key] + os.getenv('OPENAI_API_KEYS', '').split(',')
+    numbered = sorted((name for name in os.environ if re.fullmatch(r'OPENAI_API_KEY_\d+', name)),
+                      key=lambda name: int(name.rsplit('_', 1)[1]))
+    candidates += [os.environ[name] for name in numbered]
+    keys = []
+    for key in candidates:
+        key = key.strip()
+        if not key or key in keys:
+            continue
+        valid, reason = _validate_key(key)
+        if not valid:
+            print(f"⚠️ Skipping pooled API key ...{key[-4:]}: {reason}")
+            continue
+        keys.append(key)
+    return keys
+
+def load_settings():
+    """OpenAI settings: api_key, api_keys, model, timeout, connect_timeout, pool_size, max_retries, tpm, rpm
+
+    Loaded once per process; raises ValueError when no API key is configured
+    (and tries again on the next call).
+    """
+    global _SETTINGS
+    with _LOCK:
+        if _SETTINGS is None:
+            api_key = _load_api_key()
+            _SETTINGS = {
+                'api_key': api_key,
+                'api_keys': _pool_keys(api_key),
+                'model': os.getenv('TRAX_OPENAI_MODEL', DEFAULT_MODEL),
+                'timeout': float(os.getenv('TRAX_OPENAI_TIMEOUT', DEFAULT_TIMEOUT)),
+                'connect_timeout': float(os.getenv('TRAX_OPENAI_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+                'pool_size': int(os.getenv('TRAX_OPENAI_POOL_SIZE', DEFAULT_POOL_SIZE)),
+                'max_retries': int(os.getenv('TRAX_OPENAI_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+                'tpm': int(os.getenv('TRAX_OPENAI_TPM', DEFAULT_TPM)),
+                'rpm': int(os.getenv('TRAX_OPENAI_RPM', DEFAULT_RPM)),
+            }
+        return _SETTINGS
+
+def get_model():
+    """Model name used by all analyzers"""
+    return load_settings()['model']
+
+def _connection_limits(pool_size):
+    # httpx.Limits, taken from the openai package rather than importing httpx
+    limits_class = type(openai.DEFAULT_CONNECTION_LIMITS)
+    return limits_class(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+def _client_options(settings, api_key):
+    timeout = openai.Timeout(settings['timeout'], connect=settings['connect_timeout'])
+    # Retries are made by create_chat_completion, where the limiter sees them
+    return {
+        'api_key': api_key,
+        'timeout': timeout,
+        'max_retries': 0,
+    }, {'limits': _connection_limits(settings['pool_size']), 'timeout': timeout}
+
+class Credential:
+    """One pooled API key with its own clients, rate limit budget and health"""
+
+    def __init__(self, index, api_key, settings):
+        self.api_key = api_key
+        self.name = f"key {index} (...{api_key[-4:]})"
+        self.settings = settings
+        self.limiter = RateLimiter(settings['tpm'], settings['rpm'], settings['pool_size'], name=self.name)
+        self.client = None
+        self.async_clients = {}
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.disabled = None
+        self._lock = threading.Lock()
+
+    def sync_client(self):
+        """This key's openai.OpenAI client (created on first use)"""
+        with self._lock:
+            if self.client is None:
+                options, http_options = _client_options(self.settings, self.api_key)
+                self.client = openai.OpenAI(http_client=openai.DefaultHttpxClient(**http_options), **options)
+            return self.client
+
+    def async_client(self):
+        """This key's openai.AsyncOpenAI client for the running event loop
+
+        Async connection pools belong to one event loop, so each loop (e.g.
+        each asyncio.run batch) gets its own client; close them with
+        aclose_async_client() before the loop ends.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self.async_clients.get(loop)
+            if client is None:
+                options, http_options = _client_options(self.settings, self.api_key)
+                client = openai.AsyncOpenAI(http_client=openai.DefaultAsyncHttpxClient(**http_options), **options)
+                self.async_clients[loop] = client
+            return client
+
+    def usable(self, now):
+        return self.disabled is None and now >= self.cooldown_until
+
+    def record_success(self):
+        with self._lock:
+            self.requests += 1
+            self.failures = 0
+
+    def record_failure(self, error):
+        """Update health after a failed request; True if the key left the rotation"""
+        with self._lock:
+            self.errors += 1
+            quota_exhausted = isinstance(error, openai.RateLimitError) and getattr(error, 'code', None) == 'insufficient_quota'
+            if quota_exhausted or isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+                if self.disabled is None:
+                    self.disabled = 'billing quota exhausted' if quota_exhausted else type(error).__name__
+                    print(f"   🔑 {self.name} disabled: {self.disabled}")
+                return True
+            if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+                self.failures += 1
+                if self.failures >= KEY_FAILURE_LIMIT:
+                    self.failures = 0
+                    self.cooldown_until = time.monotonic() + KEY_COOLDOWN_SECONDS
+                    print(f"   🔑 {self.name} cooling down for {KEY_COOLDOWN_SECONDS:.0f}s after repeated errors")
+                    return True
+            return False
+
+    def print_report(self):
+        self.limiter.print_report()
+        if self.disabled or self.errors:
+            print(f"   🔑 {self.requests} succeeded, {self.errors} errors" + (f", disabled: {self.disabled}" if self.disabled else ""))
+
+def get_credentials():
+    """Pooled credentials, one per configured API key (the protected key first)"""
+    global _CREDENTIALS
+    settings = load_settings()
+    with _LOCK:
+        if _CREDENTIALS is None:
+            keys = settings.get('api_keys') or [settings['api_key']]
+            _CREDENTIALS = [Credential(index + 1, key, settings) for index, key in enumerate(keys)]
+            if len(_CREDENTIALS) > 1:
+                print(f"🔑 OpenAI credential pool: {len(_CREDENTIALS)} keys")
+        return _CREDENTIALS
+
+def get_client():
+    """Shared openai.OpenAI client of the primary key (thread-safe; created on first use)"""
+    return get_credentials()[0].sync_client()
+
+async def aclose_async_client():
+    """Close the running event loop's async clients, if any"""
+    loop = asyncio.get_running_loop()
+    for credential in _CREDENTIALS or []:
+        with credential._lock:
+            client = credential.async_clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+
+def print_rate_limiter_report():
+    """Print each key's rate limiter state and health, if any request was sent"""
+    for credential in _CREDENTIALS or []:
+        if credential.requests or credential.errors:
+            credential.print_report()
+
+def _try_acquire_credential(estimate):
+    """(credential, 0) with a slot taken on the key with the most headroom, or (None, seconds to wait)"""
+    credentials = get_credentials()
+    now = time.monotonic()
+    usable = [credential for credential in credentials if credential.usable(now)]
+    if not usable:
+        cooling = [credential.cooldown_until for credential in credentials if credential.disabled is None]
+        if not cooling:
+            raise RuntimeError("No usable OpenAI API key: " + ', '.join(
+                f"{credential.name} {credential.disabled}" for credential in credentials))
+        return None, max(0.0, min(cooling) - now) or SLOT_POLL_SECONDS
+    usable.sort(key=lambda credential: credential.limiter.available_fraction(), reverse=True)
+    waits = []
+    for credential in usable:
+        wait = credential.limiter.try_acquire(estimate)
+        if not wait:
+            return credential, 0
+        waits.append(wait)
+    return None, min(waits)
+
+def acquire_credential(estimate):
+    """Block until some key can take a request of ``estimate`` tokens; returns that key"""
+    credential, wait = _try_acquire_credential(estimate)
+    while credential is None:
+        time.sleep(wait)
+        credential, wait = _try_acquire_credential(estimate)
+    return credential
+
+async def acquire_credential_async(estimate):
+    """asyncio version of acquire_credential"""
+    credential, wait = _try_acquire_credential(estimate)
+    while credential is None:
+        await asyncio.sleep(wait)
+        credential, wait = _try_acquire_credential(estimate)
+    return credential
+
+def _backoff_seconds(attempt):
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def _failure(error, attempt, max_retries):
+    """(retry, throttled, wait seconds) for a failed request"""
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted billing quota does not recover by waiting
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            return False, False, 0
+        wait = retry_after_seconds(error.response.headers) or _backoff_seconds(attempt)
+        return attempt < max_retries, True, wait
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return attempt < max_retries, False, _backoff_seconds(attempt)
+    return False, False, 0
+
+def _handle_failure(credential, error, estimate, attempt, settings, retryable=True):
+    """(retry, seconds to sleep) after a failed request on ``credential``"""
+    retry, throttled, wait = _failure(error, attempt, settings['max_retries'])
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    credential.limiter.release(estimate, headers=headers, throttled=throttled, retry_after=wait)
+    if not retryable:
+        credential.record_failure(error)
+        return False, 0
+    now = time.monotonic()
+    if credential.record_failure(error) and any(other.usable(now) for other in get_credentials()):
+        # The same request goes to another key right away
+        return True, 0
+    if not retry:
+        return False, 0
+    print(f"   ⏳ {type(error).__name__} on {credential.name}, retry {attempt + 1}/{settings['max_retries']} in {wait:.1f}s")
+    # A throttled key pauses through its limiter; other keys keep going
+    return True, 0 if throttled else wait
+
+def _usage_tokens(completion):
+    usage = getattr(completion, 'usage', None)
+    return getattr(usage, 'total_tokens', None)
+
+def _request_params(settings, messages, max_tokens, temperature, options, stream=False):
+    params = dict(options, model=settings['model'], messages=messages, temperature=temperature)
+    if max_tokens is not None:
+        params['max_tokens'] = max_tokens
+    if stream:
+        params.update(stream=True, stream_options={'include_usage': True})
+    return params
+
+class StreamedCompletion:
+    """Collects the chunks of a streamed completion, passing new text to ``on_delta``"""
+
+    def __init__(self, on_delta):
+        self.on_delta = on_delta
+        self.parts = []
+        self.refusal = []
+        self.finish_reason = None
+        self.usage = None
+        self.id = None
+        self.model = None
+        self.created = 0
+
+    def add(self, chunk):
+        self.id = self.id or chunk.id
+        self.model = self.model or chunk.model
+        self.created = self.created or chunk.created
+        if chunk.usage:
+            self.usage = chunk.usage
+        for choice in chunk.choices:
+            if choice.delta.content:
+                self.parts.append(choice.delta.content)
+                self.on_delta(choice.delta.content)
+            if getattr(choice.delta, 'refusal', None):
+                self.refusal.append(choice.delta.refusal)
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+
+    def completion(self):
+        """The collected stream as a ChatCompletion"""
+        message = {
+            'role': 'assistant',
+            'content': ''.join(self.parts),
+            'refusal': ''.join(self.refusal) or None,
+        }
+        # A stream that ends without a finish reason was cut off
+        choice = {'index': 0, 'finish_reason': self.finish_reason or 'length', 'message': message}
+        return ChatCompletion(id=self.id or 'stream', object='chat.completion', created=self.created,
+                              model=self.model or '', choices=[choice], usage=self.usage)
+
+def create_chat_completion(messages, max_tokens, temperature, on_delta=None, **options):
+    """Chat completion through the credential pool, rate limited and retried
+
+    Each attempt goes to the usable key with the most headroom. 429s are
+    retried after retry-after and connection/server errors with backoff;
+    the last error is raised when retries are exhausted. With ``on_delta``
+    the completion is streamed and each new piece of text is passed to
+    ``on_delta(text)`` as it arrives; a stream that fails after text was
+    delivered is not retried. Extra ``options`` go to the API call. Returns
+    a ChatCompletion either way.
+    """
+    settings = load_settings()
+    params = _request_params(settings, messages, max_tokens, temperature, options, stream=on_delta is not None)
+    estimate = estimate_tokens(messages, max_tokens)
+    attempt = 0
+    while True:
+        credential = acquire_credential(estimate)
+        streamed = StreamedCompletion(on_delta) if on_delta else None
+        try:
+            raw = credential.sync_client().chat.completions.with_raw_response.create(**params)
+            if streamed:
+                for chunk in raw.parse():
+                    streamed.add(chunk)
+                completion = streamed.completion()
+            else:
+                completion = raw.parse()
+        except Exception as e:
+            retry, wait = _handle_failure(credential, e, estimate, attempt, settings,
+                                          retryable=not (streamed and streamed.parts))
+            if not retry:
+                raise
+            attempt += 1
+            if wait:
+                time.sleep(wait)
+            continue
+        credential.limiter.release(estimate, used=_usage_tokens(completion), headers=raw.headers)
+        credential.record_success()
+        return completion
+
+async def create_chat_completion_async(messages, max_tokens, temperature, on_delta=None, **options):
+    """asyncio version of create_chat_completion"""
+    settings = load_settings()
+    params = _request_params(settings, messages, max_tokens, temperature, options, stream=on_delta is not None)
+    estimate = estimate_tokens(messages, max_tokens)
+    attempt = 0
+    while True:
+        credential = await acquire_credential_async(estimate)
+        streamed = StreamedCompletion(on_delta) if on_delta else None
+        try:
+            raw = await credential.async_client().chat.completions.with_raw_response.create(**params)
+            if streamed:
+                async for chunk in raw.parse():
+                    streamed.add(chunk)
+                completion = streamed.completion()
+            else:
+                completion = raw.parse()
+        except Exception as e:
+            retry, wait = _handle_failure(credential, e, estimate, attempt, settings,
+                                          retryable=not (streamed and streamed.parts))
+            if not retry:
+                raise
+            attempt += 1
+            if wait:
+                await asyncio.sleep(wait)
+            continue
+        credential.limiter.release(estimate, used=_usage_tokens(completion), headers=raw.headers)
+        credential.record_success()
+        return completion
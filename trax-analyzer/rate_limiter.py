@@ -0,0 +1,175 @@
+"""
+Adaptive client-side rate limiting for OpenAI requests
+Parallel analyses quickly hit the TPM/RPM quota of gpt-4o, and every 429
+used to end up as a failed analysis. RateLimiter keeps token buckets for
+tokens and requests per minute, charges each request its estimated token
+cost before it is sent, and follows the x-ratelimit-* response headers so
+the buckets track the server's view of the quota. Concurrency adapts AIMD
+style: it grows by about one request per round trip while the quota has
+headroom and halves on a 429, when all requests also pause for the
+retry-after interval. Batches then run just under the quota instead of
+alternating between idle time and bursts of 429s.
+"""
+
+import re
+import threading
+import time
+
+DEFAULT_TPM = 30000
+DEFAULT_RPM = 500
+INITIAL_CONCURRENCY = 2
+
+# Additive increase only while more than this share of the token quota remains
+HEADROOM_FRACTION = 0.1
+
+# Wait between checks while all concurrency slots are taken
+SLOT_POLL_SECONDS = 0.05
+
+# Rough size of a token in characters, used without tiktoken
+CHARS_PER_TOKEN = 4
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding('o200k_base')
+except (ImportError, ValueError):
+    _ENCODING = None
+
+def estimate_tokens(messages, max_tokens=0):
+    """Token cost of a chat request: prompt tokens plus the completion budget"""
+    prompt_tokens = 0
+    for message in messages:
+        content = message.get('content') or ''
+        prompt_tokens += 4 + (len(_ENCODING.encode(content)) if _ENCODING else len(content) // CHARS_PER_TOKEN)
+    return prompt_tokens + (max_tokens or 0)
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_SECONDS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+def parse_duration(value):
+    """Seconds of a rate limit reset value such as "6m0s", "1.5s" or "250ms", or None"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+def _header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def retry_after_seconds(headers):
+    """Wait requested by retry-after-ms / retry-after headers, or None"""
+    if not headers:
+        return None
+    milliseconds = _header_number(headers, 'retry-after-ms')
+    if milliseconds is not None:
+        return milliseconds / 1000.0
+    # HTTP-date values are not used by the OpenAI API
+    return _header_number(headers, 'retry-after')
+
+class RateLimiter:
+    """Token buckets for TPM/RPM plus an AIMD concurrency limit
+
+    Thread-safe; ``try_acquire`` takes a slot when a request fits (callers
+    wait and retry otherwise, see openai_client.acquire_credential), and
+    every successful try_acquire is paired with a ``release``.
+    """
+
+    def __init__(self, tpm=None, rpm=None, max_concurrency=8, name='default'):
+        self.name = name
+        self.token_capacity = float(tpm or DEFAULT_TPM)
+        self.request_capacity = float(rpm or DEFAULT_RPM)
+        self.tokens = self.token_capacity
+        self.requests = self.request_capacity
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(min(INITIAL_CONCURRENCY, self.max_concurrency))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.headroom = 1.0
+        self.throttled = 0
+        self.completed = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_capacity / 60.0)
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / 60.0)
+
+    def try_acquire(self, tokens):
+        """Take a slot and budget for a request: 0 on success, else seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return SLOT_POLL_SECONDS
+            # A request larger than the bucket waits for a full bucket only
+            needed = min(tokens, self.token_capacity)
+            if self.tokens < needed:
+                return (needed - self.tokens) * 60.0 / self.token_capacity
+            if self.requests < 1:
+                return (1 - self.requests) * 60.0 / self.request_capacity
+            self.tokens -= needed
+            self.requests -= 1
+            self.in_flight += 1
+            return 0
+
+    def available_fraction(self):
+        """Share of the token and request budgets currently available (0-1)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if time.monotonic() < self.blocked_until:
+                return 0.0
+            return min(self.tokens / self.token_capacity, self.requests / self.request_capacity)
+
+    def release(self, estimated, used=None, headers=None, throttled=False, retry_after=None):
+        """Return a request's slot and adapt to its outcome
+
+        ``used`` (tokens the response reports) refunds an over-estimate,
+        ``headers`` update the buckets from x-ratelimit-* values and
+        ``throttled`` (a 429) halves the concurrency limit and pauses all
+        requests for ``retry_after`` seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.in_flight = max(0, self.in_flight - 1)
+            if used is not None:
+                self.tokens = min(self.token_capacity, self.tokens + max(0, estimated - used))
+            if headers:
+                self._apply_headers(headers)
+            if throttled:
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+                self.blocked_until = max(self.blocked_until, now + (retry_after or 1.0))
+            elif used is not None:
+                self.completed += 1
+                if self.headroom > HEADROOM_FRACTION:
+                    # About +1 per round trip of the current window
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+
+    def _apply_headers(self, headers):
+        limit_tokens = _header_number(headers, 'x-ratelimit-limit-tokens')
+        remaining_tokens = _header_number(headers, 'x-ratelimit-remaining-tokens')
+        limit_requests = _header_number(headers, 'x-ratelimit-limit-requests')
+        remaining_requests = _header_number(headers, 'x-ratelimit-remaining-requests')
+        if limit_tokens:
+            self.token_capacity = limit_tokens
+        if remaining_tokens is not None:
+            self.tokens = min(self.tokens, remaining_tokens)
+            self.headroom = remaining_tokens / self.token_capacity
+        if limit_requests:
+            self.request_capacity = limit_requests
+        if remaining_requests is not None:
+            self.requests = min(self.requests, remaining_requests)
+
+    def print_report(self):
+        """Print the limiter's state after a batch"""
+        print(f"🚦 Rate limiter {self.name}: {self.completed} requests, {self.throttled} throttled (429), "
+              f"concurrency limit {self.limit:.1f}, quota {self.token_capacity:.0f} TPM / {self.request_capacity:.0f} RPM")
@@ -0,0 +1,194 @@
+"""
+Content-addressed cache of LLM responses
+The same report text sent with the same prompt template and model always
+produced a full gpt-4o call, including reruns after a crash and reruns to
+regenerate Word output. Responses are stored in SQLite (WAL mode, safe for
+several processes) keyed by a hash of the model, sampling settings, prompt
+template version and the request inputs, capped in size with least recently
+used eviction. Identical requests made at the same time collapse into one
+in-flight call.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.trax_cache', 'llm_responses.sqlite3')
+DEFAULT_MAX_MB = 256
+
+# Where a response came from (see ResponseCache.call)
+SOURCE_API = 'api'
+SOURCE_CACHE = 'cache'
+SOURCE_SHARED = 'shared'
+
+def response_key(model, temperature, prompt_version, *inputs):
+    """Cache key of an LLM request: SHA-256 over the model settings and inputs"""
+    payload = json.dumps([model, temperature, prompt_version, inputs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """SQLite cache of LLM responses with single-flight request deduplication
+
+    ``call`` / ``call_async`` return (response, source) where source is
+    "cache" (stored response), "shared" (joined an identical in-flight
+    request) or "api" (this call made the request).
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or os.getenv('TRAX_RESPONSE_CACHE') or DEFAULT_CACHE_PATH
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('TRAX_RESPONSE_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # One connection shared by the threads of this process; other
+        # processes coordinate through SQLite's WAL locking
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._db_lock, self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL)''')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._inflight_async = {}
+
+    def get(self, key):
+        """Stored response for ``key`` or None, refreshing its recency on a hit"""
+        with self._db_lock, self._db:
+            row = self._db.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+            if row:
+                self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+        return row[0] if row else None
+
+    def put(self, key, model, response):
+        """Store a response, then evict old entries past the size cap"""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._db_lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                             (key, model, response, size, now, now))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used responses until the cache fits in max_bytes"""
+        with self._db_lock, self._db:
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            stale = []
+            for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY accessed'):
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._db.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+    def _lookup(self, key):
+        response = self.get(key)
+        if response is not None:
+            self.hits += 1
+        return response
+
+    def call(self, key, model, request, cacheable=None):
+        """Response for ``key``, calling ``request()`` only if it is neither stored nor in flight
+
+        ``cacheable(response)`` decides whether a new response is stored
+        (e.g. not error messages); by default every response is.
+        """
+        response = self._lookup(key)
+        if response is not None:
+            return response, SOURCE_CACHE
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            self.shared += 1
+            return future.result(), SOURCE_SHARED
+
+        try:
+            # Another thread or process may have stored it in the meantime
+            response = self._lookup(key)
+            if response is not None:
+                future.set_result(response)
+                return response, SOURCE_CACHE
+            self.misses += 1
+            response = request()
+            if cacheable is None or cacheable(response):
+                self.put(key, model, response)
+            future.set_result(response)
+            return response, SOURCE_API
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    async def call_async(self, key, model, request, cacheable=None):
+        """asyncio version of call; ``request()`` returns an awaitable"""
+        response = self._lookup(key)
+        if response is not None:
+            return response, SOURCE_CACHE
+        future = self._inflight_async.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future), SOURCE_SHARED
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        try:
+            self.misses += 1
+            response = await request()
+            if cacheable is None or cacheable(response):
+                self.put(key, model, response)
+            future.set_result(response)
+            return response, SOURCE_API
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so an exception nobody else awaited is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight_async.pop(key, None)
+
+    def print_report(self):
+        """Print the response cache statistics of this run"""
+        print(f"💬 LLM responses: {self.hits} from cache, {self.shared} shared, {self.misses} API calls ({self.path})")
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_response_cache():
+    """Process-wide ResponseCache, or None if disabled (TRAX_RESPONSE_CACHE=off) or unavailable"""
+    global _CACHE
+    if os.getenv('TRAX_RESPONSE_CACHE', '').lower() == 'off':
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                _CACHE = ResponseCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ LLM response cache disabled: {e}")
+                _CACHE = False
+        return _CACHE or None
@@ -0,0 +1,32 @@
+"""
+Tests for OCR-tolerant serial matching (asset_registry.serial_match_key)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asset_registry import SERIAL_CONFUSABLES, serial_match_key
+
+class SerialMatchKeyTest(unittest.TestCase):
+
+    def test_confusables_fold_to_digits(self):
+        self.assertEqual('OQDIL|SZBG'.translate(SERIAL_CONFUSABLES), '0001115286')
+
+    def test_ocr_variants_share_a_key(self):
+        self.assertEqual(serial_match_key('L2474398'), serial_match_key('L247439B'))
+        self.assertEqual(serial_match_key('SN-1O5Z'), serial_match_key('SN-1052'))
+        self.assertEqual(serial_match_key('D0I5'), serial_match_key('0015'))
+
+    def test_other_characters_kept(self):
+        self.assertEqual(serial_match_key('AC-7x'), 'AC-7x')
+        self.assertNotEqual(serial_match_key('A123'), serial_match_key('C123'))
+
+    def test_digits_unchanged(self):
+        self.assertEqual(serial_match_key('0123456789'), '0123456789')
+
+if __name__ == '__main__':
+    unittest.main()
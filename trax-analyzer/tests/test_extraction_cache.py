@@ -0,0 +1,76 @@
+"""
+Tests for the extraction cache and page fingerprints (extraction_cache.py, trax_parser.page_fingerprint)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction_cache import ExtractionCache
+from trax_parser import PdfDocument
+
+def make_pdf(page_lines, to_unicode=None):
+    """PDF bytes with one page per text line; ``to_unicode`` attaches that CMap stream to the font of the last page"""
+    doc = fitz.open()
+    for line in page_lines:
+        page = doc.new_page()
+        page.insert_text((50, 60), line, fontsize=10)
+    if to_unicode is not None:
+        font = doc[-1].get_fonts(full=True)[0][0]
+        xref = doc.get_new_xref()
+        doc.update_object(xref, "<<>>")
+        doc.update_stream(xref, to_unicode)
+        doc.xref_set_key(font, 'ToUnicode', f'{xref} 0 R')
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+PAGES = ["Serial No: L247439A", "Winding Resistance H1-H2 0.412", "Turns Ratio tap 1 8.66"]
+
+class ExtractionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ExtractionCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def extract(self, data):
+        with self.cache.load_document('report.pdf', data=data) as doc:
+            texts = doc.page_texts
+            self.cache.store(doc)
+        return doc, texts
+
+    def test_unchanged_report_restored_from_cache(self):
+        data = make_pdf(PAGES)
+        _, texts = self.extract(data)
+        doc, cached_texts = self.extract(data)
+        self.assertTrue(doc.from_cache)
+        self.assertEqual(cached_texts, texts)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_reissued_report_extracts_changed_page_only(self):
+        self.extract(make_pdf(PAGES))
+        reissued = PAGES[:1] + ["Winding Resistance H1-H2 0.415"] + PAGES[2:]
+        doc, texts = self.extract(make_pdf(reissued))
+        self.assertFalse(doc.from_cache)
+        self.assertEqual(doc.changed_pages, [1])
+        self.assertIn("0.415", texts[1])
+        self.assertEqual(texts[2].strip(), PAGES[2])
+
+    def test_font_mapping_change_changes_fingerprint(self):
+        first = PdfDocument('a.pdf', data=make_pdf(PAGES, b'cmap A')).page_fingerprints
+        same = PdfDocument('b.pdf', data=make_pdf(PAGES, b'cmap A')).page_fingerprints
+        remapped = PdfDocument('c.pdf', data=make_pdf(PAGES, b'cmap B')).page_fingerprints
+        self.assertEqual(first, same)
+        self.assertNotEqual(first[2], remapped[2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Tests for the incremental JSON section parser (json_sections.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_sections import JsonSectionParser, iter_json_sections
+
+ANALYSIS = {
+    "transformer_metadata": {"equipment_name": "Sub \"North\" T1", "serial": "L247439B"},
+    "bushing_pf_c1": {
+        "H1": {"designation": "H1", "pf_corrected_20c_percent": 0.52, "status": "CRITICAL 🚨"},
+        "note": "braces { and } and [brackets] inside a string, plus a \\ backslash",
+    },
+    "turns_ratio": [{"tap_position": 1, "ratio_error_percent": -0.12}, {"tap_position": 2, "ratio_error_percent": None}],
+    "escaped": "quote \\\" then brace } then \"quoted\"",
+    "empty": {},
+    "flag": True,
+}
+
+def feed_in_chunks(text, size):
+    parser = JsonSectionParser()
+    sections = []
+    for start in range(0, len(text), size):
+        sections.extend(parser.feed(text[start:start + size]))
+    return sections
+
+class JsonSectionParserTest(unittest.TestCase):
+
+    def test_chunked_matches_json_loads(self):
+        for text in (json.dumps(ANALYSIS), json.dumps(ANALYSIS, indent=2, ensure_ascii=False)):
+            expected = list(json.loads(text).items())
+            for size in (1, 2, 3, 7, 64, len(text)):
+                with self.subTest(size=size):
+                    self.assertEqual(feed_in_chunks(text, size), expected)
+
+    def test_chunk_boundary_inside_escaped_quote(self):
+        text = '{"a": "x\\\\\\"}", "b": 1}'
+        self.assertEqual(json.loads(text), {"a": 'x\\"}', "b": 1})
+        for split in range(1, len(text)):
+            with self.subTest(split=split):
+                parser = JsonSectionParser()
+                sections = parser.feed(text[:split]) + parser.feed(text[split:])
+                self.assertEqual(sections, [("a", 'x\\"}'), ("b", 1)])
+
+    def test_sections_returned_as_soon_as_complete(self):
+        parser = JsonSectionParser()
+        self.assertEqual(parser.feed('{"first": {"a": [1, 2]}'), [])
+        self.assertEqual(parser.feed(', "sec'), [("first", {"a": [1, 2]})])
+        self.assertEqual(parser.feed('ond": "}"}'), [("second", "}")])
+
+    def test_ignores_fence_and_trailing_report(self):
+        text = '```json\n{"a": 1, "b": [2]}\n```\n\n# REPORT\n{"not": "a section"}'
+        self.assertEqual(iter_json_sections(text), [("a", 1), ("b", [2])])
+
+    def test_unparsable_member_is_skipped(self):
+        self.assertEqual(iter_json_sections('{"a": tru, "b": 2}'), [("b", 2)])
+
+    def test_empty_text(self):
+        self.assertEqual(iter_json_sections(None), [])
+        self.assertEqual(iter_json_sections('{}'), [])
+
+if __name__ == '__main__':
+    unittest.main()
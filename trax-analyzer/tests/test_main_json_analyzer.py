@@ -0,0 +1,34 @@
+"""
+Tests for output naming in main_json_analyzer.py
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main_json_analyzer import output_names
+
+def unit(filename, asset_id='TX-00001', equipment_name='Substation_22', document_date='2022-06-08'):
+    return {'files': [filename], 'asset_id': asset_id, 'equipment_name': equipment_name, 'document_date': document_date}
+
+class OutputNamesTest(unittest.TestCase):
+
+    def test_distinct_assets_keep_plain_names(self):
+        names = output_names([unit('a.pdf'), unit('b.pdf', asset_id='TX-00002'), unit('c.pdf', asset_id=None, equipment_name='North')])
+        self.assertEqual(names, ['Substation_22_TX-00001_2022-06-08', 'Substation_22_TX-00002_2022-06-08', 'North'])
+
+    def test_same_asset_and_date_get_source_stems(self):
+        names = output_names([unit('a.pdf'), unit('b.pdf'), unit('b2.pdf'), unit('big.pdf')])
+        self.assertEqual(names, ['Substation_22_TX-00001_2022-06-08_a', 'Substation_22_TX-00001_2022-06-08_b',
+                                 'Substation_22_TX-00001_2022-06-08_b2', 'Substation_22_TX-00001_2022-06-08_big'])
+
+    def test_same_source_stem_gets_position(self):
+        names = output_names([unit('a.pdf'), unit('a.pdf'), unit('c.pdf', asset_id='TX-00002')])
+        self.assertEqual(names, ['Substation_22_TX-00001_2022-06-08_a_1', 'Substation_22_TX-00001_2022-06-08_a_2',
+                                 'Substation_22_TX-00002_2022-06-08'])
+
+if __name__ == '__main__':
+    unittest.main()
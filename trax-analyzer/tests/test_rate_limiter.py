@@ -0,0 +1,59 @@
+"""
+Tests for the adaptive rate limiter (rate_limiter.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RateLimiter, parse_duration, retry_after_seconds
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_token_budget_and_refund(self):
+        limiter = RateLimiter(tpm=6000, rpm=100, max_concurrency=4)
+        self.assertEqual(limiter.try_acquire(5000), 0)
+        # 1000 tokens left: a 2000-token request waits about 10 s for the refill
+        self.assertAlmostEqual(limiter.try_acquire(2000), 10.0, delta=0.1)
+        limiter.release(5000, used=2000)
+        self.assertEqual(limiter.try_acquire(2000), 0)
+
+    def test_concurrency_slots(self):
+        limiter = RateLimiter(tpm=100000, rpm=100, max_concurrency=4)
+        self.assertEqual(limiter.try_acquire(10), 0)
+        self.assertEqual(limiter.try_acquire(10), 0)
+        self.assertGreater(limiter.try_acquire(10), 0)
+        limiter.release(10, used=10)
+        self.assertEqual(limiter.try_acquire(10), 0)
+
+    def test_throttled_response_halves_limit_and_pauses(self):
+        limiter = RateLimiter(tpm=100000, rpm=100, max_concurrency=8)
+        limiter.try_acquire(10)
+        limiter.release(10, throttled=True, retry_after=2.0)
+        self.assertEqual(limiter.limit, 1.0)
+        self.assertAlmostEqual(limiter.try_acquire(10), 2.0, delta=0.1)
+        self.assertEqual(limiter.available_fraction(), 0.0)
+
+    def test_headers_update_buckets(self):
+        limiter = RateLimiter(tpm=30000, rpm=500)
+        limiter.try_acquire(100)
+        limiter.release(100, used=100, headers={'x-ratelimit-limit-tokens': '800000',
+                                                 'x-ratelimit-remaining-tokens': '400000',
+                                                 'x-ratelimit-limit-requests': '5000',
+                                                 'x-ratelimit-remaining-requests': '4999'})
+        self.assertEqual(limiter.token_capacity, 800000)
+        self.assertEqual(limiter.request_capacity, 5000)
+        self.assertLessEqual(limiter.available_fraction(), 0.5)
+
+    def test_durations(self):
+        self.assertEqual(parse_duration("6m0s"), 360.0)
+        self.assertEqual(parse_duration("250ms"), 0.25)
+        self.assertIsNone(parse_duration(""))
+        self.assertEqual(retry_after_seconds({'retry-after-ms': '1500', 'retry-after': '9'}), 1.5)
+        self.assertEqual(retry_after_seconds({'retry-after': '9'}), 9.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for the LLM response cache (response_cache.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import SOURCE_API, SOURCE_CACHE, SOURCE_SHARED, ResponseCache, response_key
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.tmp.name, 'responses.sqlite3'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_stored_response_reused(self):
+        key = response_key('gpt-4o', 0.1, 'json-3.0.2', 'report text')
+        self.assertEqual(self.cache.call(key, 'gpt-4o', lambda: 'analysis'), ('analysis', SOURCE_API))
+        self.assertEqual(self.cache.call(key, 'gpt-4o', lambda: 'other'), ('analysis', SOURCE_CACHE))
+        self.assertNotEqual(key, response_key('gpt-4o', 0.1, 'json-3.0.2', 'other text'))
+
+    def test_uncacheable_response_not_stored(self):
+        def error():
+            return 'Error analyzing report: timeout'
+        cacheable = lambda response: not response.startswith('Error')
+        self.assertEqual(self.cache.call('k', 'm', error, cacheable), (error(), SOURCE_API))
+        self.assertEqual(self.cache.call('k', 'm', lambda: 'analysis', cacheable), ('analysis', SOURCE_API))
+
+    def test_concurrent_identical_requests_share_one_call(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def request():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'analysis'
+
+        results = []
+        owner = threading.Thread(target=lambda: results.append(self.cache.call('k', 'm', request)))
+        owner.start()
+        started.wait(5)
+        waiter = threading.Thread(target=lambda: results.append(self.cache.call('k', 'm', request)))
+        waiter.start()
+        # Let the second caller reach the in-flight request before it completes
+        while self.cache.shared == 0 and waiter.is_alive():
+            waiter.join(0.01)
+        release.set()
+        owner.join(5)
+        waiter.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(source for _, source in results), [SOURCE_API, SOURCE_SHARED])
+
+    def test_concurrent_identical_async_requests_share_one_call(self):
+        calls = []
+
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'analysis'
+
+        async def run():
+            return await asyncio.gather(*(self.cache.call_async('k', 'm', request) for _ in range(3)))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([source for _, source in results], [SOURCE_API, SOURCE_SHARED, SOURCE_SHARED])
+        self.assertEqual(self.cache.call('k', 'm', request), ('analysis', SOURCE_CACHE))
+
+if __name__ == '__main__':
+    unittest.main()
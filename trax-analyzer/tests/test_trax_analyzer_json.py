@@ -0,0 +1,56 @@
+"""
+Tests for stitching continued responses (trax_analyzer_json.stitch_continuation)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trax_analyzer_json import MAX_OVERLAP_CHARS, MIN_OVERLAP_CHARS, has_complete_json, stitch_continuation
+
+class StitchContinuationTest(unittest.TestCase):
+
+    def test_repeated_overlap_removed(self):
+        partial = '{"winding_resistance": {"H1-H2": {"resistance_ohm": 0.41'
+        continuation = '{"resistance_ohm": 0.412, "status": "OK"}}}'
+        text = partial + stitch_continuation(partial, continuation)
+        self.assertEqual(json.loads(text)["winding_resistance"]["H1-H2"],
+                         {"resistance_ohm": 0.412, "status": "OK"})
+
+    def test_clean_resume_kept_whole(self):
+        partial = '{"a": [1, 2'
+        self.assertEqual(stitch_continuation(partial, ', 3]}'), ', 3]}')
+
+    def test_short_overlap_not_removed(self):
+        # Fewer than MIN_OVERLAP_CHARS matching characters are a coincidence, not a repeat
+        partial = '{"a": "x' + '"' * (MIN_OVERLAP_CHARS - 1)
+        continuation = '"' * (MIN_OVERLAP_CHARS - 1) + '}'
+        self.assertEqual(stitch_continuation(partial, continuation), continuation)
+
+    def test_longest_overlap_wins(self):
+        partial = '{"status": "OK", "status": "OK'
+        continuation = '"status": "OK", "status": "OK"}'
+        self.assertEqual(stitch_continuation(partial, continuation), '"}')
+
+    def test_overlap_limited_to_max(self):
+        repeated = 'x' * (MAX_OVERLAP_CHARS + 50)
+        partial = '{"a": "' + repeated
+        continuation = repeated + '"}'
+        self.assertEqual(stitch_continuation(partial, continuation), continuation[MAX_OVERLAP_CHARS:])
+
+    def test_structured_fence_stripped(self):
+        partial = '{"a": 1, "b": '
+        self.assertEqual(stitch_continuation(partial, '```json\n2}', structured=True), '2}')
+        self.assertEqual(stitch_continuation(partial, '```json\n2}'), '```json\n2}')
+
+    def test_stitched_response_complete(self):
+        partial = '```json\n{"a": {"b": "text with } brace'
+        text = partial + stitch_continuation(partial, 'text with } brace"}}\n```\n\n# REPORT')
+        self.assertTrue(has_complete_json(text))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for reading TRAX instrument exports (trax_exports.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trax_exports import load_trax_export
+
+CSV_EXPORT = """Substation;North
+Serial No;L247439A
+Test Date;2022-06-08
+Bushing C1 Power Factor
+Bushing;%PF Meas;%PF Corr 20C;Cap pF
+H1;0,31;0,25;410,2
+X1;0,60;0,55;388,0
+Turns Ratio
+Tap;Nominal;Measured;Error %
+1;8,660;8,655;-0,06
+""".encode('cp1252')
+
+XML_EXPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<TraxExport>
+  <SerialNumber>L247439B</SerialNumber>
+  <TestDate>2022-06-09</TestDate>
+  <WindingResistance>
+    <Measurement phase="X1-X0" tap="1" resistance="10.52" unit="mOhm"/>
+    <Measurement phase="X2-X0" tap="1" resistance="10.49" unit="mOhm"/>
+  </WindingResistance>
+  <Test name="Demagnetization">
+    <Record><Step>Initial</Step><Remanence unit="%">35.0</Remanence></Record>
+    <Record><Step>Final</Step><Remanence unit="%">1.2</Remanence></Record>
+  </Test>
+</TraxExport>
+""".encode('utf-8')
+
+class ExportTest(unittest.TestCase):
+
+    def test_csv_export(self):
+        export = load_trax_export('L247439A.csv', data=CSV_EXPORT)
+        bushings = export['measurements']['bushing_pf_c1']
+        self.assertEqual(bushings['H1']['pf_corrected_20c_percent'], 0.25)
+        self.assertEqual(bushings['H1']['pf_test_temp_percent'], 0.31)
+        self.assertEqual(bushings['X1']['status'], 'CRITICAL 🚨')
+        ratio = export['measurements']['turns_ratio'][0]
+        self.assertEqual((ratio['tap_position'], ratio['measured_ttr'], ratio['error_percent']), ('1', 8.655, -0.06))
+        self.assertEqual(export['serial'], 'L247439A')
+        self.assertEqual(export['document_date'], '2022-06-08')
+
+    def test_xml_export(self):
+        export = load_trax_export('L247439B.xml', data=XML_EXPORT)
+        windings = export['measurements']['winding_resistance']['lv_windings']
+        self.assertEqual([(winding['phase'], winding['resistance_mohm']) for winding in windings],
+                         [('X1-X0', 10.52), ('X2-X0', 10.49)])
+        self.assertEqual(export['measurements']['demagnetization'],
+                         {'initial_remanence_percent': 35.0, 'final_remanence_percent': 1.2})
+        self.assertEqual(export['document_date'], '2022-06-09')
+
+if __name__ == '__main__':
+    unittest.main()
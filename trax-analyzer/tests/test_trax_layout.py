@@ -0,0 +1,45 @@
+"""
+Tests for the row/column layout reconstruction (trax_layout.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trax_layout import layout_row_cells, layout_rows, page_layout, render_layout
+
+def word(x0, y0, text, width=None):
+    """fitz-style word tuple (x0, y0, x1, y1, text, block, line, word_no), 10 points high"""
+    return (x0, y0, x0 + (width or 6 * len(text)), y0 + 10, text, 0, 0, 0)
+
+# Words deliberately out of reading order, as get_text("words") may return them
+WORDS = [
+    word(200, 81, '0.25'), word(50, 80, 'H1'), word(120, 80, '0.31'),
+    word(50, 40, 'Bushing'), word(95, 40, 'C1'),
+    word(50, 60, 'Bushing'), word(120, 60, '%PF'), word(144, 60, 'Meas'), word(200, 60, 'Corr'),
+    word(50, 100, 'X1'), word(200, 100, '0.55'),
+    word(50, 160, 'Tested'), word(90, 160, 'by'), word(106, 160, 'JS'),
+]
+
+class LayoutTest(unittest.TestCase):
+
+    def test_rows_in_reading_order(self):
+        rows = [[text for _, text in row] for row in layout_rows(WORDS)]
+        self.assertEqual(rows, [['Bushing', 'C1'], ['Bushing', '%PF', 'Meas', 'Corr'], ['H1', '0.31', '0.25'],
+                                ['X1', '0.55'], ['Tested', 'by', 'JS']])
+
+    def test_cell_counts_merge_close_words(self):
+        self.assertEqual([count for _, count in layout_row_cells(WORDS)], [1, 3, 3, 2, 1])
+
+    def test_table_columns_line_up(self):
+        blocks = page_layout(WORDS)
+        self.assertEqual([block['type'] for block in blocks], ['text', 'table', 'text'])
+        self.assertEqual(blocks[1]['rows'], [['Bushing', '%PF Meas', 'Corr'], ['H1', '0.31', '0.25'], ['X1', '', '0.55']])
+        self.assertEqual(render_layout(blocks),
+                         "Bushing C1\nBushing | %PF Meas | Corr\nH1 | 0.31 | 0.25\nX1 |  | 0.55\nTested by JS")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Tests for the section index and page handling of trax_parser.py
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trax_parser import build_section_index, section_heading
+
+ROWS = "\n" + "\n".join(f"H{i} | 0.3{i} | 0.2{i} | 410.{i}" for i in range(1, 4))
+
+class SectionIndexTest(unittest.TestCase):
+
+    def test_only_title_lines_are_headings(self):
+        self.assertEqual(section_heading("Bushing C1 Power Factor"), 'bushing_pf_c1')
+        self.assertEqual(section_heading("Test: Winding Resistance"), 'winding_resistance')
+        self.assertIsNone(section_heading("Bushing | %PF Meas | %PF Corr 20C"))
+        self.assertIsNone(section_heading("Winding Resistance: acceptable"))
+        self.assertIsNone(section_heading("Turns Ratio Tap 5"))
+
+    def test_repeated_title_continues_section(self):
+        pages = [
+            "Bushing C1 Power Factor\nBushing | %PF Meas | %PF Corr 20C | Cap pF" + ROWS,
+            "Bushing C1 Power Factor (continued)" + ROWS,
+            "Winding Resistance\nPhase | Tap | Resistance" + ROWS,
+        ]
+        sections = build_section_index(pages)['sections']
+        self.assertEqual([(entry['section'], entry['page'], entry['end_page']) for entry in sections],
+                         [('bushing_pf_c1', 0, 1), ('winding_resistance', 2, 2)])
+
+    def test_summary_lines_are_not_sections(self):
+        pages = [
+            "Winding Resistance\nPhase | Tap | Resistance" + ROWS,
+            "Summary of Results\nWinding Resistance: acceptable\nTurns Ratio: acceptable\nPower Factor: acceptable",
+        ]
+        index = build_section_index(pages)
+        self.assertEqual([entry['section'] for entry in index['sections']], ['winding_resistance'])
+        self.assertEqual(index['sections'][0]['end_page'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
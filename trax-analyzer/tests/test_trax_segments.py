@@ -0,0 +1,84 @@
+"""
+Tests for per-asset segmentation of multi-transformer reports (trax_segments.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction_cache import ExtractionCache
+from trax_parser import build_section_index
+from trax_segments import segment_assets
+
+NAMEPLATE = "Transformer Nameplate\nManufacturer | ABB\nMVA | 20\nkV | 115"
+
+def transformer_pages(serial=None):
+    """Rendered test pages of one transformer: winding resistance, turns ratio, power factor, bushings"""
+    serial_line = f"Serial No | {serial}\n" if serial else ""
+    return [
+        serial_line + "Winding Resistance\nPhase | Tap | Resistance mOhm\nX1-X0 | 1 | 10.52\nX2-X0 | 1 | 10.49",
+        "Turns Ratio\nTap | Nominal | Measured | Error %\n1 | 8.660 | 8.655 | -0.06\n2 | 8.455 | 8.451 | -0.05",
+        "Power Factor\nTest | %PF Meas | %PF Corr 20C\nCHL | 0.21 | 0.19\nCHG | 0.25 | 0.23",
+        "Bushing C1 Power Factor\nBushing | %PF Meas | %PF Corr 20C\nH1 | 0.31 | 0.25\nX1 | 0.29 | 0.24",
+    ]
+
+SUMMARY = ("Summary of Results\nWinding Resistance\nAll phases within 2% of each other\nTurns Ratio\n"
+           "Ratio errors within limits\nPower Factor\nInsulation in good condition")
+
+def segment(pages, filename):
+    return segment_assets(build_section_index(pages), pages, filename)
+
+def make_pdf(pages):
+    """PDF bytes drawing rendered page texts, each " | " cell in its own column"""
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        for row, line in enumerate(text.split('\n')):
+            for column, cell in enumerate(line.split(' | ')):
+                page.insert_text((50 + 130 * column, 60 + 20 * row), cell, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+class SegmentAssetsTest(unittest.TestCase):
+
+    def test_summary_page_stays_with_its_transformer(self):
+        pages = [NAMEPLATE] + transformer_pages() + [SUMMARY]
+        units = segment(pages, "North_T1.pdf")
+        self.assertEqual(len(units), 1)
+        self.assertIsNone(units[0]['label'])
+        self.assertEqual(units[0]['pages'], list(range(6)))
+
+    def test_restarted_test_sequence_splits(self):
+        pages = [NAMEPLATE] + transformer_pages() + transformer_pages() + [SUMMARY]
+        units = segment(pages, "LTC Series Winding Tests L247439A and L247439B.pdf")
+        self.assertEqual([unit['label'] for unit in units], ['L247439A', 'L247439B'])
+        self.assertEqual(units[0]['pages'], [0, 1, 2, 3, 4])
+        self.assertEqual(units[1]['pages'], [0, 5, 6, 7, 8, 9])
+
+    def test_serial_change_splits(self):
+        pages = transformer_pages('L247439A') + transformer_pages('L247439B')
+        units = segment(pages, "report.pdf")
+        self.assertEqual([unit['serial'] for unit in units], ['L247439A', 'L247439B'])
+        self.assertEqual(units[1]['pages'], [4, 5, 6, 7])
+
+    def test_file_name_serials_applied_after_cache_load(self):
+        data = make_pdf([NAMEPLATE] + transformer_pages() + transformer_pages())
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ExtractionCache(cache_dir)
+            for path, labels in (("Tests L247439A and L247439B.pdf", ['L247439A', 'L247439B']),
+                                 ("Tests T100234 and T100235.pdf", ['T100234', 'T100235']),
+                                 ("report.pdf", ['Unit_1', 'Unit_2'])):
+                with cache.load_document(path, data=data) as doc:
+                    self.assertEqual([unit['label'] for unit in doc.asset_units], labels)
+                    cache.store(doc)
+            self.assertEqual(cache.hits, 2)
+
+if __name__ == '__main__':
+    unittest.main()
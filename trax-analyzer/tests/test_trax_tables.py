@@ -0,0 +1,66 @@
+"""
+Tests for the deterministic table extractors (trax_tables.py)
+Run from trax-analyzer/: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+import fitz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trax_parser import PdfDocument
+from trax_tables import apply_measurements, collect_section_rows, measure_sections
+
+def make_pdf(rows):
+    """PDF bytes of one page with ``rows`` = [[(x, text), ...], ...] written 20 points apart"""
+    doc = fitz.open()
+    page = doc.new_page()
+    for index, cells in enumerate(rows):
+        for x, text in cells:
+            page.insert_text((x, 60 + 20 * index), text, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+# Corrected %PF is not the last column, so guessing columns by position would read the capacitance
+BUSHING_TABLE = [
+    [(50, 'Bushing C1 Power Factor')],
+    [(50, 'Bushing'), (150, '%PF Meas'), (280, '%PF Corr 20C'), (400, 'Cap pF')],
+    [(50, 'H1'), (150, '0.31'), (280, '0.25'), (400, '410.2')],
+    [(50, 'X1'), (150, '0.60'), (280, '0.55'), (400, '388.0')],
+]
+
+class TableExtractionTest(unittest.TestCase):
+
+    def test_bushing_columns_from_pdf_header(self):
+        doc = PdfDocument('bushings.pdf', data=make_pdf(BUSHING_TABLE))
+        with doc:
+            bushings = doc.measurements['bushing_pf_c1']
+        self.assertEqual(bushings['H1']['pf_corrected_20c_percent'], 0.25)
+        self.assertEqual(bushings['H1']['pf_test_temp_percent'], 0.31)
+        self.assertEqual(bushings['X1']['pf_corrected_20c_percent'], 0.55)
+        self.assertEqual(bushings['X1']['status'], 'CRITICAL 🚨')
+
+    def test_header_naming_test_stays_in_section(self):
+        rows = [
+            ([(0, 'Power'), (1, 'Factor')], 1),
+            ([(0, 'Test'), (1, 'Power Factor Meas'), (2, 'Power Factor Corr')], 3),
+            ([(0, 'CHL'), (1, '0.21'), (2, '0.19')], 3),
+        ]
+        sections = collect_section_rows(rows)
+        self.assertEqual(list(sections), ['tan_delta_main_insulation'])
+        self.assertEqual(measure_sections(sections)['tan_delta_main_insulation']['CHL']['pf_corrected_20c_percent'], 0.19)
+
+    def test_apply_measurements_replaces_non_dict_sections(self):
+        measurements = {'bushing_pf_c1': {'H1': {'designation': 'H1', 'pf_corrected_20c_percent': 0.25}},
+                        'tan_delta_main_insulation': {'CHL': {'pf_corrected_20c_percent': 0.19}}}
+        json_data = {'bushing_pf_c1': 'not measured', 'tan_delta_main_insulation': None}
+        apply_measurements(json_data, measurements)
+        self.assertEqual(json_data['bushing_pf_c1']['H1']['pf_corrected_20c_percent'], 0.25)
+        self.assertEqual(json_data['tan_delta_main_insulation']['CHL']['pf_corrected_20c_percent'], 0.19)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,10 @@
-import openai
-import os
-from dotenv import load_dotenv
+from openai_client import create_chat_completion, get_model
+from response_cache import get_response_cache, response_key
+
+# Version of the prompt template, part of the response cache key
+PROMPT_VERSION = "1"
 
 def analyze_trax_report(text):
-    # Load environment variables from .env file
-    load_dotenv()
-    
-    # Get API key from environment
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OpenAI API key not found. Please check your .env file.")
-    
-    # Initialize OpenAI client
-    client = openai.OpenAI(api_key=api_key)
-    
     prompt = f"""You are a transformer diagnostic expert. Given the TRAX report text below, extract all critical data,
 analyze the windings, bushing tan delta, and turns ratio, and return a diagnostic report with:
 - Key findings
@@ -26,10 +17,13 @@ TRAX REPORT:
 {text[:10000]}
 """
     
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3
-    )
+    def request():
+        completion = create_chat_completion([{"role": "user", "content": prompt}], max_tokens=None, temperature=0.3)
+        return completion.choices[0].message.content
     
-    return response.choices[0].message.content
+    # Unchanged report text is answered from the LLM response cache
+    cache = get_response_cache()
+    if cache is None:
+        return request()
+    key = response_key(get_model(), 0.3, f"basic-{PROMPT_VERSION}", text)
+    return cache.call(key, get_model(), request)[0]
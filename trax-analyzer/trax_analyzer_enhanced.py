@@ -1,20 +1,11 @@
-import openai
-import os
-from dotenv import load_dotenv
+from openai_client import create_chat_completion, get_model
+from response_cache import get_response_cache, response_key
 from datetime import datetime
 
+# Version of the prompt template, part of the response cache key
+PROMPT_VERSION = "1"
+
 def analyze_trax_report_enhanced(text):
-    # Load environment variables from .env file
-    load_dotenv()
-    
-    # Get API key from environment
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OpenAI API key not found. Please check your .env file.")
-    
-    # Initialize OpenAI client
-    client = openai.OpenAI(api_key=api_key)
-    
     prompt = f"""You are a transformer diagnostics expert. You must find and extract the EXACT values from this TRAX report.
 
 ## CRITICAL TASK: FIND ACTUAL VALUES FOR BOTH TAN DELTA AND BUSHING POWER FACTOR
@@ -162,11 +153,13 @@ TRAX REPORT TEXT TO SEARCH:
 {text[:15000]}
 """
     
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.01,
-        max_tokens=4000
-    )
+    def request():
+        completion = create_chat_completion([{"role": "user", "content": prompt}], max_tokens=4000, temperature=0.01)
+        return completion.choices[0].message.content
     
-    return response.choices[0].message.content 
\ No newline at end of file
+    # Unchanged report text is answered from the LLM response cache
+    cache = get_response_cache()
+    if cache is None:
+        return request()
+    key = response_key(get_model(), 0.01, f"enhanced-{PROMPT_VERSION}", text)
+    return cache.call(key, get_model(), request)[0]
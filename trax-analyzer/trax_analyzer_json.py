@@ -1,38 +1,105 @@
-import openai
-import os
 import json
-from dotenv import load_dotenv
+import os
+import re
 from datetime import datetime
+import openai
+from json_sections import JsonSectionParser, iter_json_sections
+from openai_client import create_chat_completion, create_chat_completion_async, get_client, get_model
+from response_cache import SOURCE_API, get_response_cache, response_key
+from trax_schema import (REPORT_FIELD, build_json_schema, build_report_sections, build_response_schema,
+                         detect_test_types, partial_report_note, resolve_test_types, threshold_rules)
 
-def analyze_trax_report_json(text, document_date=None, filename=None):
-    """
-    Advanced TRAX report analyzer with PREDICTIVE MAINTENANCE ENHANCEMENTS v3.0
-    Based on Master Improvement Prompt with Predictive Maintenance (July 28, 2025)
-    
-    Predictive Maintenance v3.0:
-    - Asset Health Score calculation (0-100%) with weighting breakdown
-    - Predictive maintenance planning with component-specific timelines
-    - Anomaly scoring (0-10) and replacement cycle recommendations
-    - Template-based variable substitution for comprehensive reporting
-    - Enhanced condition assessment with degradation trend analysis
-    - All v2.4 technical completeness features retained + critical fixes applied
+SYSTEM_MESSAGE = "You are an expert transformer diagnostics engineer. Generate valid JSON with asset health scores, predictive maintenance plans, and detailed technical analysis. Apply strict thresholds: PF (OK <0.3%, WARNING 0.3-0.5%, CRITICAL >0.5%), TTR (OK ≤0.5%, WARNING 0.5-1%, CRITICAL >1%), Demagnetization (INEFFECTIVE if Initial <20%)."
+MAX_TOKENS = 4000
+TEMPERATURE = 0.1
+
+# Version of the prompt template, part of the response cache key: bump it
+# whenever the prompt text or the schema fragments (trax_schema) change
+PROMPT_VERSION = "3.0.2"
+
+# Schema-constrained JSON (response_format json_schema) unless TRAX_STRUCTURED_OUTPUTS=off
+STRUCTURED_OUTPUTS = os.getenv('TRAX_STRUCTURED_OUTPUTS', '').lower() != 'off'
+STRUCTURED_INSTRUCTION = (f" Return one JSON object matching the response schema, and write the complete diagnostic"
+                          f" report (markdown, following the report template) into its \"{REPORT_FIELD}\" field."
+                          " Use null for any value that is not in the test report; never estimate one.")
+
+# Responses cut off at MAX_TOKENS are resumed with up to MAX_CONTINUATIONS
+# short follow-up requests instead of being rerun
+MAX_CONTINUATIONS = 2
+CONTINUATION_MAX_TOKENS = 1500
+CONTINUATION_PROMPT = ("Your previous response was cut off by the output limit. Continue it exactly where it stopped,"
+                       " starting with the next character. Do not repeat earlier text, restart the JSON or add"
+                       " any commentary.")
+
+# Longest repeated text removed from the start of a continuation, and the
+# shortest overlap treated as a repeat rather than a coincidence
+MAX_OVERLAP_CHARS = 300
+MIN_OVERLAP_CHARS = 8
+
+def format_measurements_block(measurements):
+    """Prompt block carrying the deterministically extracted table values"""
+    if not measurements:
+        return ""
+    return f"""MEASURED VALUES (read directly from the report tables by the local parser).
+Use these exact numbers in the JSON - do not re-read or re-derive them from the report text:
+{json.dumps(measurements, indent=1, ensure_ascii=False)}
+
+"""
+
+def format_text_sources_block(text_sources):
+    """Prompt block naming the pages whose text came from OCR or is missing"""
+    if not text_sources:
+        return ""
+    lines = ["TEXT SOURCES:"]
+    if text_sources.get('ocr_pages'):
+        lines.append(f"- Pages {', '.join(map(str, text_sources['ocr_pages']))} were read by OCR from scanned images; "
+                     "OCR can misread digits and decimal points, so report lower confidence for values from these pages.")
+    if text_sources.get('unread_scanned_pages'):
+        lines.append(f"- Pages {', '.join(map(str, text_sources['unread_scanned_pages']))} are scanned images without text; "
+                     "do not invent values for tests that would appear on them - mark them as missing.")
+    return '\n'.join(lines) + "\n\n"
+
+def analysis_test_types(text, measurements=None, test_types=None):
+    """Test sections an analysis asks for: ``test_types``, or those detected in the text and measurements"""
+    if test_types is None:
+        test_types = detect_test_types(text) + list(measurements or {})
+    return resolve_test_types(test_types)
+
+def build_response_format(test_types, bushings=None):
+    """response_format of a schema-constrained v3.0 analysis request"""
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': 'trax_analysis_v3',
+            'strict': True,
+            'schema': build_response_schema(test_types, bushings),
+        },
+    }
+
+def structured_messages(messages):
+    """``messages`` with the system message asking for the narrative inside the JSON"""
+    return [{"role": "system", "content": SYSTEM_MESSAGE + STRUCTURED_INSTRUCTION}] + messages[1:]
+
+def structured_response_text(content, refusal=None):
+    """Response text of a structured output in the free-form layout: the JSON, then the narrative report
+
+    A response that does not parse (e.g. still incomplete after
+    continuation) is returned as it is and left to extract_json_from_response.
     """
-    # Use protected environment loading to prevent API key conflicts
+    if refusal:
+        return f"Error analyzing report: request refused: {refusal}"
     try:
-        from env_protection import setup_protected_environment
-        api_key = setup_protected_environment()
-        if not api_key:
-            raise ValueError("No valid API key found. Please check your .env file and ensure no corrupted system environment variables exist.")
-    except ImportError:
-        # Fallback to regular loading if protection module not available
-        load_dotenv()
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OpenAI API key not found. Please check your .env file.")
-    
-    # Initialize OpenAI client
-    client = openai.OpenAI(api_key=api_key)
-    
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return content
+    if not isinstance(data, dict):
+        return content
+    report = data.pop(REPORT_FIELD, None) or ''
+    return json.dumps(data, indent=2, ensure_ascii=False) + "\n\n" + report
+
+def build_analysis_messages(text, document_date=None, filename=None, measurements=None, text_sources=None,
+                            test_types=None):
+    """Chat messages of a v3.0 analysis request (arguments as for analyze_trax_report_json)"""
     # Use provided date or current date
     if not document_date:
         document_date = datetime.now().strftime('%Y-%m-%d')
@@ -40,270 +107,19 @@ def analyze_trax_report_json(text, document_date=None, filename=None):
     if not filename:
         filename = "TRAX - Test report"
     
+    # Only the schema fragments of the tests in this report are sent
+    test_types = analysis_test_types(text, measurements, test_types)
+    json_schema = build_json_schema(test_types, filename, document_date, datetime.now().strftime('%Y-%m-%d'))
+    
     prompt = f"""You are a transformer diagnostics expert. Generate comprehensive JSON analysis with:
 - Asset health scoring (0-100%) 
 - Predictive maintenance planning
-- Enhanced TTR logic: OK ≤0.5%, WARNING 0.5-1%, CRITICAL >1%
-- PF thresholds: OK <0.3%, WARNING 0.3-0.5%, CRITICAL >0.5%
-- Demagnetization: INEFFECTIVE if Initial <20%
+{threshold_rules(test_types)}
 
-REQUIRED JSON OUTPUT:
+{partial_report_note(test_types)}REQUIRED JSON OUTPUT:
 
 ```json
-{{
-  "report_metadata": {{
-    "file_name": "{filename}",
-    "document_date": "{document_date}",
-    "analysis_date": "{datetime.now().strftime('%Y-%m-%d')}",
-    "analysis_type": "Predictive Maintenance Enhanced v3.0 - Asset Health & Lifecycle Analysis",
-    "generated_by": "TRAX AI Analyzer v3.0",
-    "predictive_features": "Asset health scoring, maintenance planning, anomaly detection, replacement forecasting",
-    "template_variables_included": "Comprehensive variable set for advanced reporting"
-  }},
-  "winding_resistance": {{
-    "lv_windings": [
-      {{
-        "phase": "[PHASE]",
-        "tap_position": "[TAP]",
-        "resistance_mohm": "[VALUE]",
-        "range_mohm": "[MIN-MAX]",
-        "status": "[OK ✅/WARNING ⚠️/CRITICAL 🚨]",
-        "confidence_score": "[85-100]"
-      }}
-    ],
-    "hv_windings": [
-      {{
-        "phase": "[PHASE]",
-        "tap_position": "[TAP]",
-        "resistance_ohm": "[VALUE]",
-        "range_ohm": "[MIN-MAX]",
-        "status": "[OK ✅/WARNING ⚠️/CRITICAL 🚨]",
-        "confidence_score": "[85-100]"
-      }}
-    ]
-  }},
-  "turns_ratio": [
-    {{
-      "tap_position": "[TAP]",
-      "nominal_ttr": "[VALUE]",
-      "measured_ttr": "[VALUE]",
-      "error_percent": "[VALUE]",
-      "status": "[OK ✅ if ≤0.5%, WARNING ⚠️ if 0.5-1%, CRITICAL 🚨 if >1%]",
-      "excitation_current_ma": "[CONVERTED_4_DECIMALS]",
-      "phase_displacement_deg": "[VALUE]",
-      "confidence_score": "[85-100]"
-    }}
-  ],
-  "tan_delta_main_insulation": {{
-    "extraction_method": "Corrected %PF to 20°C - STRICT THRESHOLDS v2.3 (RETAINED)",
-    "CHL": {{
-      "pf_corrected_20c_percent": "[EXACT_VALUE]",
-      "status": "[OK ✅ if <0.3%, WARNING ⚠️ if 0.3-0.5%, CRITICAL 🚨 if >0.5%]",
-      "temperature_correction": "[Available/Missing]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨]",
-      "monitoring_recommendation": "[Quarterly/Next cycle/Immediate based on value]"
-    }},
-    "CLG": {{
-      "pf_corrected_20c_percent": "[EXACT_VALUE]",
-      "status": "[STRICTLY: CRITICAL 🚨 if >0.5%, WARNING ⚠️ if 0.3-0.5%, OK ✅ if <0.3%]",
-      "temperature_correction": "[Available/Missing]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨]",
-      "moisture_risk_flag": "[TRUE if >0.5% + other insulation >0.4%]",
-      "monitoring_recommendation": "[Based on STRICT thresholds]"
-    }},
-    "CLH": {{
-      "pf_corrected_20c_percent": "[EXACT_VALUE]",
-      "status": "[STRICTLY: CRITICAL 🚨 if >0.5%, WARNING ⚠️ if 0.3-0.5%, OK ✅ if <0.3%]",
-      "temperature_correction": "[Available/Missing]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨]",
-      "monitoring_recommendation": "[Based on STRICT thresholds]"
-    }},
-    "CHG": {{
-      "pf_corrected_20c_percent": "[EXACT_VALUE]",
-      "status": "[STRICTLY: CRITICAL 🚨 if >0.5%, WARNING ⚠️ if 0.3-0.5%, OK ✅ if <0.3%]",
-      "temperature_correction": "[Available/Missing]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨]",
-      "moisture_combination_flag": "[TRUE if CLG >0.5% AND CHG >0.25%]",
-      "monitoring_recommendation": "[Based on STRICT thresholds]"
-    }},
-    "pattern_detection": {{
-      "moisture_risk_detected": "[TRUE if any 2 of CLG/CLH/CHG >0.4% AND one >0.5%]",
-      "confidence_inheritance": "[HIGH if all components HIGH confidence]"
-    }}
-  }},
-  "bushing_pf_c1": {{
-    "extraction_method": "Corrected %PF - ZERO TOLERANCE v2.3 (RETAINED)",
-    "H1": {{
-      "designation": "H1",
-      "pf_test_temp_percent": "[RAW_VALUE]",
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[STRICTLY: OK ✅ <0.3%, WARNING ⚠️ 0.3-0.5%, CRITICAL 🚨 >0.5%]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]",
-      "phase_stress_pattern": "[TRUE if WARNING insulation + CRITICAL bushing same phase]"
-    }},
-    "H2": {{
-      "designation": "H2",
-      "pf_test_temp_percent": "[RAW_VALUE]",
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[EXAMPLE: 0.52% = CRITICAL 🚨 NOT OK]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]",
-      "monitoring_recommendation": "[IMMEDIATE if >0.5%]"
-    }},
-    "H3": {{
-      "designation": "H3",
-      "pf_test_temp_percent": "[RAW_VALUE]",
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[STRICTLY ENFORCED THRESHOLDS]",
-      "confidence_score": "[NUMERIC_85-100]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]"
-    }},
-    "X0": {{
-      "designation": "X0",
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[STRICTLY ENFORCED THRESHOLDS]",
-      "confidence_score": "[NUMERIC]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]"
-    }},
-    "X1": {{
-      "designation": "X1", 
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[STRICTLY ENFORCED THRESHOLDS]",
-      "confidence_score": "[NUMERIC]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]"
-    }},
-    "X2": {{
-      "designation": "X2",
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[STRICTLY ENFORCED THRESHOLDS]",
-      "confidence_score": "[NUMERIC]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]"
-    }},
-    "X3": {{
-      "designation": "X3",
-      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
-      "status": "[STRICTLY ENFORCED THRESHOLDS]",
-      "confidence_score": "[NUMERIC]",
-      "visual_indicator": "[✅/⚠️/🚨/❓]"
-    }},
-    "cluster_analysis": {{
-      "hv_cluster_degradation": "[TRUE if 2+ H bushings >0.5%]",
-      "lv_cluster_degradation": "[TRUE if 2+ X bushings >0.5%]",
-      "critical_bushings_count": "[COUNT_OF_BUSHINGS_>0.5%]",
-      "immediate_action_required": "[AUTO-FLAG: TRUE if 2+ bushings >0.5%]",
-      "cluster_pattern": "[HV Cluster Critical/LV Cluster Critical/Mixed Pattern]",
-      "overall_bushing_health": "[POOR if 2+ bushings >0.5%, else GOOD/FAIR]"
-    }}
-  }},
-  "demagnetization": {{
-    "initial_remanence_percent": "[EXACT_VALUE]",
-    "final_remanence_percent": "[EXACT_VALUE]",
-    "effectiveness": "[CRITICAL FIX: INEFFECTIVE if Initial <20%, EFFECTIVE only if Initial >20% AND Final <1%]",
-    "validation_logic": "[If Initial <20% then INEFFECTIVE regardless of final, else check both criteria]",
-    "effectiveness_criteria": "EFFECTIVE only if Initial >20% AND Final <1%, otherwise INEFFECTIVE",
-    "confidence_score": "[95-100 if both values clear]"
-  }},
-  "health_assessment_technical_complete": {{
-    "overall_status": "[AUTO-CRITICAL if 2+ bushings OR any insulation >0.5%]",
-    "critical_findings_count": "[COUNT: All PF >0.5% + TTR >1% components]",
-    "warning_findings_count": "[COUNT: All PF 0.3-0.5% + TTR 0.5-1% components]",
-    "immediate_action_auto_flag": "[TRUE if 2+ bushings CRITICAL OR any insulation CRITICAL OR TTR >1%]",
-    "pattern_alerts": [
-      "[Moisture Risk if CLG >0.5% + others >0.4%]",
-      "[HV Cluster Critical if all H bushings >0.5% - Immediate Replacement Recommended]",
-      "[LV Cluster Critical if all X bushings >0.5% - Immediate Replacement Recommended]",
-      "[Phase Stress if WARNING insulation + CRITICAL bushing same phase]",
-      "[TTR Critical if any tap error >1%]"
-    ],
-    "cluster_auto_flagging": {{
-      "hv_cluster_critical": "[TRUE if ALL H bushings >0.5%]",
-      "lv_cluster_critical": "[TRUE if ALL X bushings >0.5%]",
-      "immediate_replacement_recommended": "[TRUE if cluster degradation detected]"
-    }},
-    "confidence_score_overall": "[WEIGHTED average of all subsystem confidences]",
-    "visual_status": "[🚨 CRITICAL / ⚠️ WARNING / ✅ OK]",
-    "risk_level": "[CRITICAL/HIGH/MODERATE/LOW with visual indicators]",
-    "technical_completeness_validation": {{
-      "completeness_score_percent": "[0-100% based on sections included]",
-      "winding_resistance_complete": "[TRUE if HV and LV phases with taps included]",
-      "turns_ratio_complete": "[TRUE if all taps with TTR, excitation current included]",
-      "excitation_current_validated": "[TRUE if properly converted to mA with 4 decimals]",
-      "tan_delta_complete": "[TRUE if CHL, CLG, CLH, CHG all included]",
-      "bushing_analysis_complete": "[TRUE if H1-H3, X0-X3 analyzed]",
-      "demagnetization_complete": "[TRUE if effectiveness determined]",
-      "tap_coverage_validated": "[Coverage range and any warnings]",
-      "zero_tolerance_reinforced": "[TRUE if all PF >0.5% = CRITICAL enforced]",
-      "technical_completeness_verified": "[✅ if all components found, ⚠️ if partial, ❌ if incomplete]"
-    }},
-    "unit_consistency_validation": {{
-      "resistance_units_correct": "[mΩ for LV, Ω for HV verified]",
-      "excitation_current_units": "[µA to mA conversion with 4 decimals verified]",
-      "pf_units_consistent": "[% values with proper thresholds verified]"
-    }}
-  }},
-  "asset_health_score": {{
-    "calculated_score": "[0-100 overall health score]",
-    "condition_category": "[Excellent 90-100, Good 75-89, Moderate 60-74, Degraded 40-59, Critical <40]",
-    "component_scores": {{
-      "winding_resistance": "[0-20 points based on balance and acceptability]",
-      "turns_ratio": "[0-20 points based on TTR errors and excitation current]",
-      "main_insulation": "[0-25 points based on PF values and trends]",
-      "bushing_pf": "[0-25 points based on bushing conditions and clusters]",
-      "demagnetization": "[0-10 points based on effectiveness and remanence levels]"
-    }},
-    "weighting_rationale": "Critical components (insulation, bushings) weighted higher due to failure impact",
-    "degradation_trend": "[Stable/Improving/Slow decline/Accelerating decline based on component analysis]",
-    "estimated_remaining_life": "[Years based on current condition and degradation rate]"
-  }},
-  "predictive_maintenance_plan": {{
-    "immediate_actions": [
-      "[List components requiring immediate attention with specific actions]"
-    ],
-    "next_maintenance_interval": {{
-      "recommended_timeframe": "[3 months/6 months/12 months based on findings]",
-      "components_to_monitor": "[Specific components requiring attention]",
-      "tests_required": "[Specific tests needed at next interval]"
-    }},
-    "quarterly_monitoring": [
-      "[Components requiring quarterly monitoring with specific parameters]"
-    ],
-    "replacement_forecast": {{
-      "high_priority": "[Components needing replacement within 12 months]",
-      "medium_priority": "[Components needing replacement within 24 months]",
-      "long_term": "[Components for long-term replacement planning 3-5 years]",
-      "estimated_costs": "[Relative cost categories: Low/Medium/High for planning]"
-    }},
-    "anomaly_score": "[0-10 risk score: 0-2 Normal, 3-5 Elevated, 6-8 High, 9-10 Critical]",
-    "risk_factors": [
-      "[Specific risk factors identified: moisture, cluster degradation, aging, etc.]"
-    ]
-  }},
-  "template_variables": {{
-    "transformer_name": "[Equipment name for template]",
-    "transformer_age": "[Estimated age in years if determinable]",
-    "overall_status": "[Overall technical status summary]",
-    "critical_findings": "[Count and description of critical findings]",
-    "warning_findings": "[Count and description of warning findings]",
-    "moisture_flags": "[Moisture risk indicators]",
-    "pattern_flags": "[Cluster or pattern risk flags]",
-    "health_score": "[Asset health score 0-100]",
-    "anomaly_score": "[Anomaly risk score 0-10]",
-    "replacement_window": "[Months until recommended replacement for critical components]",
-    "ahs_condition": "[Excellent/Good/Moderate/Degraded/Critical based on score]",
-    "predictive_plan_table": "[Formatted table of component statuses and timelines]",
-    "overall_summary_text": "[Comprehensive summary for executive reporting]",
-    "winding_resistance_summary": "[Formatted WR analysis for template]",
-    "turns_ratio_summary": "[Formatted TTR analysis for template]",
-    "tan_delta_summary": "[Formatted tan delta analysis for template]",
-    "bushing_summary": "[Formatted bushing analysis for template]",
-    "demagnetization_summary": "[Formatted demagnetization analysis for template]"
-  }}
-}}
+{json_schema}
 ```
 
 CRITICAL REQUIREMENTS:
@@ -321,20 +137,7 @@ Equipment: {{transformer_name}}
 Analysis Date: {{analysis_date}}  
 Source File: {{source_file}}
 
-## WINDING RESISTANCE ANALYSIS
-{{winding_resistance_summary}}
-
-## TURNS RATIO ANALYSIS
-{{turns_ratio_summary}}
-
-## TAN DELTA / MAIN INSULATION
-{{tan_delta_summary}}
-
-## BUSHING POWER FACTOR ANALYSIS
-{{bushing_summary}}
-
-## DEMAGNETIZATION ANALYSIS
-{{demagnetization_summary}}
+{build_report_sections(test_types)}
 
 ## TECHNICAL COMPLETENESS VALIDATION
 - **Completeness Score**: {{completeness_score}}%
@@ -374,21 +177,277 @@ Source File: {{source_file}}
 🔧 **PREDICTIVE MAINTENANCE PLAN**  
 {{predictive_plan_table}}
 
-REPORT TEXT:
+{format_measurements_block(measurements)}{format_text_sources_block(text_sources)}REPORT TEXT (tables are rendered one row per line with " | " between columns):
 {text}"""
+    
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
 
+def analyze_trax_report_json(text, document_date=None, filename=None, measurements=None, text_sources=None,
+                             test_types=None, on_section=None):
+    """
+    Advanced TRAX report analyzer with PREDICTIVE MAINTENANCE ENHANCEMENTS v3.0
+    Based on Master Improvement Prompt with Predictive Maintenance (July 28, 2025)
+    
+    Predictive Maintenance v3.0:
+    - Asset Health Score calculation (0-100%) with weighting breakdown
+    - Predictive maintenance planning with component-specific timelines
+    - Anomaly scoring (0-10) and replacement cycle recommendations
+    - Template-based variable substitution for comprehensive reporting
+    - Enhanced condition assessment with degradation trend analysis
+    - All v2.4 technical completeness features retained + critical fixes applied
+    
+    ``measurements`` (from trax_tables.extract_measurements) are passed to the
+    model as authoritative values so it does not have to find them in the text.
+    ``text_sources`` (from trax_parser.page_source_summary) flags OCR'd and
+    unreadable scanned pages.
+    ``test_types`` lists the test sections present (schema keys such as
+    "winding_resistance"); the prompt schema only asks for those. When not
+    given they are detected from the section headings in ``text`` and the
+    measurement keys, falling back to the full schema.
+    Responses are served from the process-wide LLM response cache when the
+    same request was answered before (see response_cache).
+    The JSON is requested schema-constrained (structured outputs) with the
+    narrative report in a schema field; the returned text keeps the usual
+    layout of JSON followed by the report. If the API rejects the schema the
+    request is repeated as free-form JSON.
+    A response cut off at MAX_TOKENS is resumed with short continuation
+    requests and stitched together instead of being rerun.
+    With ``on_section(name, value)`` the completion is streamed and each
+    top-level JSON section is passed on as soon as it is complete (cached
+    responses replay their sections at once).
+    """
+    return request_analysis(text, document_date, filename, measurements, text_sources, test_types,
+                            get_response_cache(), on_section)[0]
+
+async def analyze_trax_report_json_async(text, document_date=None, filename=None, measurements=None,
+                                         text_sources=None, test_types=None, on_section=None):
+    """asyncio version of analyze_trax_report_json, for keeping many requests in flight
+
+    Uses the shared AsyncOpenAI client of the running event loop; returns
+    the same response text (or "Error analyzing report: ..." string).
+    """
+    response, _ = await request_analysis_async(text, document_date, filename, measurements, text_sources,
+                                               test_types, get_response_cache(), on_section)
+    return response
+
+def analysis_cache_key(text, document_date=None, filename=None, measurements=None, text_sources=None,
+                       test_types=None):
+    """Response cache key of an analysis request
+
+    The analysis date in the prompt is not part of the key, so a cached
+    response keeps the date of its original analysis.
+    """
+    mode = "structured" if STRUCTURED_OUTPUTS else "free"
+    return response_key(get_model(), TEMPERATURE, f"json-{PROMPT_VERSION}-{MAX_TOKENS}-{mode}", text,
+                        document_date, filename, measurements, text_sources, test_types)
+
+def is_error_response(response):
+    """True for the error text returned instead of an analysis"""
+    return not response or response.startswith("Error analyzing report")
+
+def has_complete_json(response):
+    """True if the JSON object at the start of ``response`` parses"""
+    start = (response or '').find('{')
+    if start == -1:
+        return False
+    try:
+        json.JSONDecoder().raw_decode(response, start)
+        return True
+    except ValueError:
+        return False
+
+def is_cacheable_response(response):
+    """Only complete analyses are stored; errors and unparseable responses are requested again"""
+    return not is_error_response(response) and has_complete_json(response)
+
+def continuation_messages(messages, partial):
+    """``messages`` followed by the cut-off response and the request to continue it"""
+    return messages + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUATION_PROMPT},
+    ]
+
+def stitch_continuation(partial, continuation, structured=False):
+    """Text of ``continuation`` that follows ``partial``, without the part the model repeated"""
+    if structured:
+        # JSON resumed mid-object never legitimately starts a code fence
+        continuation = re.sub(r'^\s*```[a-z]*\n', '', continuation)
+    for size in range(min(MAX_OVERLAP_CHARS, len(partial), len(continuation)), MIN_OVERLAP_CHARS - 1, -1):
+        if partial.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
+def _continuation_needed(completion, continuations):
+    if completion.choices[0].finish_reason != 'length':
+        return False
+    if continuations == MAX_CONTINUATIONS:
+        return False
+    limit = CONTINUATION_MAX_TOKENS if continuations else MAX_TOKENS
+    print(f"   ✂️ Response cut off at {limit} tokens, requesting continuation {continuations + 1}/{MAX_CONTINUATIONS}")
+    return True
+
+def _continued(text, completion, on_delta, structured):
+    added = stitch_continuation(text, completion.choices[0].message.content or '', structured)
+    if on_delta and added:
+        on_delta(added)
+    return text + added
+
+def _check_continued(text, continuations):
+    if continuations and not has_complete_json(text):
+        print(f"   ⚠️ Response still incomplete after {continuations} continuation(s)")
+
+def _complete_text(messages, completion, on_delta=None, structured=False):
+    """Full response text of ``completion``, continuing it while it was cut off at the token limit"""
+    text = completion.choices[0].message.content or ''
+    continuations = 0
+    while _continuation_needed(completion, continuations):
+        try:
+            # Free-form continuation: a response_format would start a new JSON document
+            completion = create_chat_completion(continuation_messages(messages, text), CONTINUATION_MAX_TOKENS,
+                                                TEMPERATURE)
+        except Exception as e:
+            print(f"   ⚠️ Continuation failed: {e}")
+            break
+        continuations += 1
+        text = _continued(text, completion, on_delta, structured)
+    _check_continued(text, continuations)
+    return text
+
+async def _complete_text_async(messages, completion, on_delta=None, structured=False):
+    """asyncio version of _complete_text"""
+    text = completion.choices[0].message.content or ''
+    continuations = 0
+    while _continuation_needed(completion, continuations):
+        try:
+            completion = await create_chat_completion_async(continuation_messages(messages, text),
+                                                            CONTINUATION_MAX_TOKENS, TEMPERATURE)
+        except Exception as e:
+            print(f"   ⚠️ Continuation failed: {e}")
+            break
+        continuations += 1
+        text = _continued(text, completion, on_delta, structured)
+    _check_continued(text, continuations)
+    return text
+
+def _emit_sections(sections, on_section):
+    for name, value in sections:
+        if name == REPORT_FIELD:
+            continue
+        try:
+            on_section(name, value)
+        except Exception as e:
+            # A failing consumer must not cost the analysis
+            print(f"   ⚠️ Section handler failed on {name}: {e}")
+
+def _section_stream(on_section):
+    """on_delta callback feeding streamed text to ``on_section``, or None without one"""
+    if on_section is None:
+        return None
+    parser = JsonSectionParser()
+    return lambda text: _emit_sections(parser.feed(text), on_section)
+
+def _structured_rejected(error):
+    print(f"   ⚠️ Structured output request rejected, retrying as free-form JSON: {error}")
+
+def _complete(messages, response_format=None, on_section=None):
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert transformer diagnostics engineer. Generate valid JSON with asset health scores, predictive maintenance plans, and detailed technical analysis. Apply strict thresholds: PF (OK <0.3%, WARNING 0.3-0.5%, CRITICAL >0.5%), TTR (OK ≤0.5%, WARNING 0.5-1%, CRITICAL >1%), Demagnetization (INEFFECTIVE if Initial <20%)."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=4000,
-            temperature=0.1
-        )
+        # A missing API key becomes an error response like any other failure
+        get_client()
+        # Throttling and transient errors are retried inside
+        if response_format:
+            request = structured_messages(messages)
+            on_delta = _section_stream(on_section)
+            try:
+                completion = create_chat_completion(request, MAX_TOKENS, TEMPERATURE, on_delta,
+                                                    response_format=response_format)
+            except openai.BadRequestError as e:
+                _structured_rejected(e)
+            else:
+                return structured_response_text(_complete_text(request, completion, on_delta, structured=True),
+                                                completion.choices[0].message.refusal)
+        on_delta = _section_stream(on_section)
+        completion = create_chat_completion(messages, MAX_TOKENS, TEMPERATURE, on_delta)
+        return _complete_text(messages, completion, on_delta)
         
-        return response.choices[0].message.content 
+    except Exception as e:
+        return f"Error analyzing report: {str(e)}"
+
+async def _complete_async(messages, response_format=None, on_section=None):
+    try:
+        get_client()
+        if response_format:
+            request = structured_messages(messages)
+            on_delta = _section_stream(on_section)
+            try:
+                completion = await create_chat_completion_async(request, MAX_TOKENS, TEMPERATURE, on_delta,
+                                                                response_format=response_format)
+            except openai.BadRequestError as e:
+                _structured_rejected(e)
+            else:
+                text = await _complete_text_async(request, completion, on_delta, structured=True)
+                return structured_response_text(text, completion.choices[0].message.refusal)
+        on_delta = _section_stream(on_section)
+        completion = await create_chat_completion_async(messages, MAX_TOKENS, TEMPERATURE, on_delta)
+        return await _complete_text_async(messages, completion, on_delta)
         
     except Exception as e:
-        return f"Error analyzing report: {str(e)}" 
\ No newline at end of file
+        return f"Error analyzing report: {str(e)}"
+
+def _response_format(text, measurements, test_types):
+    if not STRUCTURED_OUTPUTS:
+        return None
+    bushings = list((measurements or {}).get('bushing_pf_c1') or {})
+    return build_response_format(analysis_test_types(text, measurements, test_types), bushings)
+
+def _cache_model():
+    """Model name for the response cache key, or the error response when the settings (API key) cannot be loaded"""
+    try:
+        return get_model()
+    except ValueError as e:
+        return f"Error analyzing report: {str(e)}"
+
+def _replay_sections(result, on_section):
+    """Pass the sections of a response that was not streamed to this caller (cached or shared)"""
+    response, source = result
+    if on_section is not None and source != SOURCE_API and not is_error_response(response):
+        _emit_sections(iter_json_sections(response), on_section)
+    return result
+
+def request_analysis(text, document_date=None, filename=None, measurements=None, text_sources=None,
+                     test_types=None, cache=None, on_section=None):
+    """(response, source) of an analysis request
+
+    With a ResponseCache, a stored or in-flight identical request is reused
+    and source is "cache" or "shared"; otherwise source is "api". Error
+    responses and responses without complete JSON are not stored.
+    ``on_section`` is as for analyze_trax_report_json.
+    """
+    messages = build_analysis_messages(text, document_date, filename, measurements, text_sources, test_types)
+    response_format = _response_format(text, measurements, test_types)
+    if cache is None:
+        return _complete(messages, response_format, on_section), SOURCE_API
+    model = _cache_model()
+    if is_error_response(model):
+        return model, SOURCE_API
+    key = analysis_cache_key(text, document_date, filename, measurements, text_sources, test_types)
+    return _replay_sections(cache.call(key, model, lambda: _complete(messages, response_format, on_section),
+                                       cacheable=is_cacheable_response), on_section)
+
+async def request_analysis_async(text, document_date=None, filename=None, measurements=None, text_sources=None,
+                                 test_types=None, cache=None, on_section=None):
+    """asyncio version of request_analysis"""
+    messages = build_analysis_messages(text, document_date, filename, measurements, text_sources, test_types)
+    response_format = _response_format(text, measurements, test_types)
+    if cache is None:
+        return await _complete_async(messages, response_format, on_section), SOURCE_API
+    model = _cache_model()
+    if is_error_response(model):
+        return model, SOURCE_API
+    key = analysis_cache_key(text, document_date, filename, measurements, text_sources, test_types)
+    result = await cache.call_async(key, model,
+                                    lambda: _complete_async(messages, response_format, on_section),
+                                    cacheable=is_cacheable_response)
+    return _replay_sections(result, on_section)
@@ -0,0 +1,243 @@
+"""
+Native ingestion of TRAX instrument data exports (XML / CSV)
+The TRAX test set can export raw results instead of a rendered PDF report.
+This reads those exports straight into the v3.0 measurement sections with the
+same section extractors trax_tables uses on PDF tables, so exported tests need
+neither PDF parsing nor LLM extraction of numbers.
+
+Both readers are tolerant of layout: CSV exports are read as table rows (a
+section title row, a column header row, then value rows), XML exports as
+elements named after a test section whose record elements hold one value per
+child element or attribute.
+"""
+
+import csv
+import io
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from trax_parser import (HEADER_LINE_COUNT, extract_substation_name, pdf_mtime, read_pdf_bytes,
+                         scan_header_date, section_heading)
+from trax_segments import page_serials
+from trax_tables import SectionRows, collect_section_rows, measure_sections, parse_number
+
+EXPORT_EXTENSIONS = ('.xml', '.csv')
+
+# Spacing of export columns; any constant works since headers and values
+# share the same column positions
+COLUMN_WIDTH = 10.0
+
+def is_trax_export(path):
+    """True for a path (or ZIP member) with an instrument export extension"""
+    return path.lower().endswith(EXPORT_EXTENSIONS)
+
+def decode_export(data):
+    """Text of an export file; TRAX writes UTF-8 (often with BOM) or Windows-1252"""
+    for encoding in ('utf-8-sig', 'cp1252'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+def _label_first(header, values):
+    """Move the first text cell of a value row (phase, tap, test mode) to the front
+
+    The section extractors read a row's label from its first cell.
+    """
+    for index, value in enumerate(values):
+        if value and parse_number(value) is None:
+            if index:
+                order = [index] + [i for i in range(len(values)) if i != index]
+                values = [values[i] for i in order]
+                header = [header[i] if i < len(header) else '' for i in order]
+            break
+    return header, values
+
+def _cells(values):
+    return [(index * COLUMN_WIDTH, value) for index, value in enumerate(values) if value]
+
+def csv_delimiter(text):
+    """Column delimiter of a CSV export
+
+    Exports from a decimal-comma locale separate columns with ';' (or tabs),
+    so a comma only delimits when neither of those appears.
+    """
+    sample = text[:4096]
+    for delimiter in (';', '\t'):
+        if delimiter in sample:
+            return delimiter
+    return ','
+
+def csv_rows(text):
+    """Table rows of a CSV export as lists of (x, text) cells, plus metadata
+
+    Key/value rows ahead of the first test section ("Serial No,L247439A")
+    become (key, value) metadata pairs. Exports with a leading test column
+    ("Winding Resistance,X1-X0,1,10.52,mOhm") have that column turned into
+    section title rows.
+    """
+    rows = []
+    metadata = []
+    header = []
+    emitted_header = None
+    current_section = None
+    for values in csv.reader(io.StringIO(text), delimiter=csv_delimiter(text)):
+        values = [value.strip() for value in values]
+        while values and not values[-1]:
+            values.pop()
+        if not any(values):
+            continue
+        has_numbers = any(parse_number(value) is not None for value in values)
+
+        heading = section_heading(values[0])
+        if heading and not has_numbers and len(values) == 1:
+            # Section title row
+            rows.append([(0.0, values[0])])
+            current_section = heading
+            header = []
+            emitted_header = None
+            continue
+        if heading and has_numbers:
+            # Leading test column: one section title row per change of test
+            if heading != current_section:
+                rows.append([(0.0, values[0])])
+                current_section = heading
+                emitted_header = None
+            values = values[1:]
+            row_header = header[1:]
+        else:
+            row_header = header
+
+        if current_section is None:
+            if not has_numbers and len(values) >= 3:
+                # Column header of a table with a leading test column
+                header = values
+            else:
+                metadata.append((values[0], ' '.join(values[1:])))
+            continue
+
+        if not has_numbers:
+            header = values
+            continue
+        # Header rows are emitted in the column order of the value rows
+        row_header, values = _label_first(row_header, values)
+        if row_header and row_header != emitted_header:
+            rows.append(_cells(row_header))
+            emitted_header = row_header
+        rows.append(_cells(values))
+    return rows, metadata
+
+def _words(tag):
+    """'WindingResistance' / 'winding_resistance' -> 'Winding Resistance'"""
+    tag = tag.rsplit('}', 1)[-1]
+    return re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', tag).replace('_', ' ').strip()
+
+def _element_title(element):
+    for attribute in ('name', 'type', 'title', 'test'):
+        if element.get(attribute):
+            return element.get(attribute)
+    return _words(element.tag)
+
+def _record_fields(element):
+    """(header, values) of a record element, or None if it is not a record
+
+    A record is an element whose children are all leaves (one field each,
+    units taken from a "unit" attribute) or a childless element whose
+    attributes carry the values; it must hold at least one number.
+    """
+    children = list(element)
+    if children:
+        if any(len(child) for child in children):
+            return None
+        header = [f"{_words(child.tag)} {child.get('unit', '')}".strip() for child in children]
+        values = [(child.text or '').strip() for child in children]
+    else:
+        header = [_words(name) for name in element.attrib]
+        values = [value.strip() for value in element.attrib.values()]
+    if not any(parse_number(value) is not None for value in values):
+        return None
+    return header, values
+
+def xml_sections(root):
+    """Section rows and (key, value) metadata of an XML export"""
+    sections = {}
+    metadata = []
+
+    def walk(element, section):
+        heading = section_heading(_element_title(element))
+        if heading:
+            section = heading
+
+        fields = _record_fields(element) if section else None
+        if fields:
+            header, values = _label_first(*fields)
+            sections.setdefault(section, SectionRows()).rows.append((_cells(header), _cells(values)))
+            return
+
+        if not section and len(element) == 0 and (element.text or '').strip():
+            metadata.append((_words(element.tag), element.text.strip()))
+        if not section:
+            for name, value in element.attrib.items():
+                metadata.append((_words(name), value))
+        for child in element:
+            walk(child, section)
+
+    walk(root, None)
+    return sections, metadata
+
+def render_sections(sections):
+    """Compact text of the exported tables, one ' | '-separated row per line"""
+    lines = []
+    for section, rows in sections.items():
+        lines.append(section.replace('_', ' ').title())
+        header = None
+        for row_header, cells in rows.rows:
+            if row_header and row_header != header:
+                lines.append(' | '.join(text for _, text in row_header))
+                header = row_header
+            lines.append(' | '.join(text for _, text in cells))
+    return '\n'.join(lines)
+
+def load_trax_export(path, data=None):
+    """Read an XML or CSV TRAX export
+
+    Returns a dict with "measurements" (v3.0 sections, as from
+    trax_tables.extract_measurements), "sections", "document_date",
+    "substation_name", "serial" and "text" (the exported tables rendered for
+    the analysis prompt). ``data`` is the already-read file content.
+    """
+    if data is None:
+        data = read_pdf_bytes(path)
+
+    if path.lower().endswith('.xml'):
+        # The XML declaration names the encoding; let the parser decode
+        sections, metadata = xml_sections(ET.fromstring(data))
+    else:
+        rows, metadata = csv_rows(decode_export(data))
+        sections = collect_section_rows((cells, len(cells)) for cells in rows)
+
+    measurements = measure_sections(sections)
+    metadata_lines = [f"{key}: {value}" if value else key for key, value in metadata]
+    # Header strategies expect PDF-style lines with labels and values apart
+    # ("Substation" / "22"), so names match those read from PDF reports
+    header_text = '\n'.join(part for pair in metadata for part in pair if part)
+
+    document_date = scan_header_date(metadata_lines[:HEADER_LINE_COUNT])
+    if document_date:
+        document_date = document_date.strftime('%Y-%m-%d')
+    else:
+        try:
+            document_date = datetime.fromtimestamp(pdf_mtime(path)).strftime('%Y-%m-%d')
+        except (OSError, KeyError):
+            document_date = datetime.now().strftime('%Y-%m-%d')
+
+    serials = page_serials(header_text)
+    return {
+        'measurements': measurements,
+        'sections': list(measurements),
+        'document_date': document_date,
+        'substation_name': extract_substation_name(header_text),
+        'serial': serials[0] if len(serials) == 1 else None,
+        'text': '\n'.join(metadata_lines + [render_sections(sections)]).strip(),
+    }
@@ -0,0 +1,168 @@
+"""
+Layout-aware column reconstruction for TRAX PDF pages
+page.get_text() flattens TRAX's multi-column tables into one value per line.
+This engine loads page.get_text("words") into NumPy arrays and clusters the
+word coordinates in a vectorized way to rebuild rows, cells and columns, so
+both the deterministic table extractors and the LLM prompt see a row/column
+grid instead of a scrambled text stream.
+"""
+
+import numpy as np
+
+# Words whose vertical centres are within this many points share a row
+ROW_TOLERANCE = 3.0
+
+# Horizontal gap (points) above which two words of a row are separate cells;
+# a space in TRAX's fonts is about 3 points wide
+CELL_GAP = 6.0
+
+# Vertical gap (points) between rows that ends a table region
+REGION_GAP = 24.0
+
+def words_to_arrays(words):
+    """Split fitz words into a float (n, 4) box array and an object text array"""
+    if not words:
+        return np.empty((0, 4)), np.empty(0, dtype=object)
+    boxes = np.array([word[:4] for word in words], dtype=float)
+    texts = np.array([word[4] for word in words], dtype=object)
+    return boxes, texts
+
+def cluster_rows(boxes):
+    """Row id of every word, numbered top to bottom
+
+    Words are sorted by vertical centre and a new row starts wherever the
+    gap to the previous centre exceeds ROW_TOLERANCE.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=int)
+    y_centres = (boxes[:, 1] + boxes[:, 3]) / 2
+    order = np.argsort(y_centres, kind='stable')
+    breaks = np.diff(y_centres[order]) > ROW_TOLERANCE
+    sorted_ids = np.concatenate(([0], np.cumsum(breaks)))
+    row_ids = np.empty_like(sorted_ids)
+    row_ids[order] = sorted_ids
+    return row_ids
+
+def layout_rows(words):
+    """Rows of word cells, top to bottom: [[(x_centre, text), ...], ...] sorted by x"""
+    boxes, texts = words_to_arrays(words)
+    if len(boxes) == 0:
+        return []
+    row_ids = cluster_rows(boxes)
+    x_centres = (boxes[:, 0] + boxes[:, 2]) / 2
+    order = np.lexsort((boxes[:, 0], row_ids))
+    splits = np.flatnonzero(np.diff(row_ids[order])) + 1
+    return [[(float(x_centres[i]), texts[i]) for i in group] for group in np.split(order, splits)]
+
+def layout_row_cells(words):
+    """(row, cell count) for every row of layout_rows, words closer than CELL_GAP counting as one cell"""
+    boxes, texts = words_to_arrays(words)
+    if len(boxes) == 0:
+        return []
+    row_ids = cluster_rows(boxes)
+    counts = np.bincount(_merge_cells(boxes, texts, row_ids)[2])
+    return list(zip(layout_rows(words), (int(count) for count in counts)))
+
+def _merge_cells(boxes, texts, row_ids):
+    """Merge adjacent words of a row into cells
+
+    Returns cell boxes (m, 4), cell texts and the row id of every cell.
+    """
+    order = np.lexsort((boxes[:, 0], row_ids))
+    boxes, texts, row_ids = boxes[order], texts[order], row_ids[order]
+    same_row = row_ids[1:] == row_ids[:-1]
+    close = boxes[1:, 0] - boxes[:-1, 2] <= CELL_GAP
+    new_cell = np.concatenate(([True], ~(same_row & close)))
+    starts = np.flatnonzero(new_cell)
+
+    cell_boxes = np.column_stack((
+        np.minimum.reduceat(boxes[:, 0], starts),
+        np.minimum.reduceat(boxes[:, 1], starts),
+        np.maximum.reduceat(boxes[:, 2], starts),
+        np.maximum.reduceat(boxes[:, 3], starts),
+    ))
+    cell_texts = [' '.join(texts[start:stop]) for start, stop in zip(starts, np.append(starts[1:], len(texts)))]
+    return cell_boxes, cell_texts, row_ids[starts]
+
+def cluster_columns(cell_boxes):
+    """Column id of every cell from the overlap of their horizontal spans
+
+    Spans are sorted by left edge; a new column starts wherever a cell
+    begins to the right of every span seen so far.
+    """
+    if len(cell_boxes) == 0:
+        return np.empty(0, dtype=int)
+    order = np.argsort(cell_boxes[:, 0], kind='stable')
+    running_right = np.maximum.accumulate(cell_boxes[order, 2])
+    breaks = cell_boxes[order[1:], 0] > running_right[:-1]
+    sorted_ids = np.concatenate(([0], np.cumsum(breaks)))
+    column_ids = np.empty_like(sorted_ids)
+    column_ids[order] = sorted_ids
+    return column_ids
+
+def _table_grid(cell_boxes, cell_texts, cell_rows):
+    """Row/column grid for the cells of one table region"""
+    # Single-cell rows (titles, notes) would bridge columns; they keep column 0
+    row_numbers, row_index, counts = np.unique(cell_rows, return_inverse=True, return_counts=True)
+    multi = counts[row_index] > 1
+    column_ids = np.zeros(len(cell_texts), dtype=int)
+    if multi.any():
+        column_ids[multi] = cluster_columns(cell_boxes[multi])
+
+    grid = [[''] * (column_ids.max() + 1) for _ in row_numbers]
+    for cell, (row, column) in enumerate(zip(row_index, column_ids)):
+        grid[row][column] = f"{grid[row][column]} {cell_texts[cell]}".strip()
+    return grid
+
+def page_layout(words):
+    """Reconstruct the layout of one page
+
+    Returns a list of blocks in reading order, each either
+    {"type": "text", "text": str, "bbox": [...]} for a single-cell row or
+    {"type": "table", "rows": [[cell, ...], ...], "bbox": [...]} for a run
+    of multi-cell rows without a large vertical gap.
+    """
+    boxes, texts = words_to_arrays(words)
+    if len(boxes) == 0:
+        return []
+    cell_boxes, cell_texts, cell_rows = _merge_cells(boxes, texts, cluster_rows(boxes))
+
+    row_numbers, first_cell, cells_per_row = np.unique(cell_rows, return_index=True, return_counts=True)
+    row_tops = np.minimum.reduceat(cell_boxes[:, 1], first_cell)
+    row_bottoms = np.maximum.reduceat(cell_boxes[:, 3], first_cell)
+    gaps = np.concatenate(([np.inf], row_tops[1:] - row_bottoms[:-1]))
+
+    blocks = []
+    region = []
+
+    def flush():
+        if not region:
+            return
+        mask = np.isin(cell_rows, region)
+        bbox = [float(cell_boxes[mask, 0].min()), float(cell_boxes[mask, 1].min()),
+                float(cell_boxes[mask, 2].max()), float(cell_boxes[mask, 3].max())]
+        blocks.append({"type": "table", "rows": _table_grid(cell_boxes[mask], [cell_texts[i] for i in np.flatnonzero(mask)], cell_rows[mask]), "bbox": bbox})
+        region.clear()
+
+    for index, row in enumerate(row_numbers):
+        if cells_per_row[index] > 1:
+            if gaps[index] > REGION_GAP:
+                flush()
+            region.append(row)
+            continue
+        flush()
+        cell = first_cell[index]
+        blocks.append({"type": "text", "text": cell_texts[cell], "bbox": [float(value) for value in cell_boxes[cell]]})
+    flush()
+    return blocks
+
+def render_layout(blocks):
+    """Compact text rendering of page blocks: tables as ' | '-separated rows"""
+    lines = []
+    for block in blocks:
+        if block["type"] == "text":
+            lines.append(block["text"])
+        else:
+            for row in block["rows"]:
+                lines.append(' | '.join(row).rstrip(' |'))
+    return '\n'.join(lines)
@@ -1,157 +1,1046 @@
 import fitz  # PyMuPDF
+import hashlib
+import os
 import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
+from trax_layout import page_layout, render_layout
+from trax_segments import label_assets, split_assets
 
-def extract_text_from_pdf(path):
-    doc = fitz.open(path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
-    return text
+# Bump whenever extraction output changes so cached extractions are not reused
+PARSER_VERSION = "3.0.10"
 
-def extract_document_date(pdf_path, text):
-    """Extract document date from PDF metadata and content"""
+# Number of leading text lines searched for a report date
+HEADER_LINE_COUNT = 20
+
+# Number of leading non-empty lines searched for the substation name; the
+# line strategies look at most 25 lines deep plus a short look-ahead
+NAME_HEADER_LINE_COUNT = 26
+
+# Reports shorter than this are always extracted serially. Starting a worker
+# pool costs about 90 ms while text extraction takes about 0.75 ms per page,
+# so 4 workers only pay off from roughly 160 pages (an 80-page report took
+# 106 ms in the pool against 60 ms serially). benchmark_extraction.py
+# estimates the break-even point of a machine; TRAX_PARALLEL_MIN_PAGES
+# overrides it.
+PARALLEL_MIN_PAGES = int(os.getenv('TRAX_PARALLEL_MIN_PAGES', 200))
+
+# Scanned pages (almost no text layer but an image) are OCR'd with Tesseract
+# through PyMuPDF when it is installed
+OCR_LANGUAGE = os.getenv('TRAX_OCR_LANGUAGE', 'eng')
+OCR_DPI = 300
+
+# PDFs inside ZIP archives are addressed as "<archive>.zip!/<member>"
+ZIP_MEMBER_SEPARATOR = '!/'
+
+# Number of upcoming PDFs read ahead in the background by prefetch_pdf_bytes
+PREFETCH_DEPTH = 2
+
+# Indirect object reference inside a PDF object's source ("12 0 R")
+OBJECT_REFERENCE = re.compile(r'\b(\d+) \d+ R\b')
+
+# Test section headings, checked in order ("Bushing C1 Power Factor" is a
+# bushing table, not main insulation)
+SECTION_HEADINGS = [
+    ('bushing_pf_c1', re.compile(r'bushing', re.IGNORECASE)),
+    ('winding_resistance', re.compile(r'winding\s+resistance|\bWRM\b|\bDC\s+resistance', re.IGNORECASE)),
+    ('turns_ratio', re.compile(r'turns?\s+ratio|\bTTR\b', re.IGNORECASE)),
+    ('demagnetization', re.compile(r'demagneti[sz]', re.IGNORECASE)),
+    ('tan_delta_main_insulation', re.compile(r'tan\s*delta|power\s+factor|dissipation\s+factor|overall\s+insulation', re.IGNORECASE)),
+]
+NUMERIC_TOKEN = re.compile(r'(?<![\w.])[-+]?\d+(?:[.,]\d+)?%?(?![\w.])')
+
+# Page classification for the section index. Pages with fewer non-space
+# characters than BLANK_PAGE_CHARS and no nameplate field (a short page may
+# hold just the serial, MVA and kV) are blank; boilerplate pages are skipped
+# when building the analysis prompt.
+BLANK_PAGE_CHARS = 40
+BOILERPLATE_PAGES = [
+    ('calibration', re.compile(r'calibration\s+certificate|certificate\s+of\s+calibration|calibration\s+(?:due|date)|traceable\s+to', re.IGNORECASE)),
+    ('contents', re.compile(r'table\s+of\s+contents', re.IGNORECASE)),
+]
+CONDITIONS_PAGE = re.compile(r'test\s+conditions?|weather|humidity|ambient', re.IGNORECASE)
+NAMEPLATE_FIELDS = re.compile(r'serial|s/n|nameplate|\bMVA\b|\bkVA\b|\bkV\b|manufacturer|impedance|rating|vector\s+group', re.IGNORECASE)
+SKIPPED_PAGE_KINDS = {'blank', 'calibration', 'contents', 'conditions', 'cover'}
+
+class PdfDocument:
+    """Single open PDF shared by text, date and name extraction.
+
+    The file is opened once on first use and every derived value (page text,
+    metadata, creation date, header lines) is computed lazily and cached, so
+    callers that need several of them never parse the PDF twice. Use it as a
+    context manager to close the handle deterministically.
+
+    Pass ``data`` (the PDF bytes from read_pdf_bytes) to parse from memory
+    instead of reopening ``path``; the same buffer can then serve as the
+    source of the cache key.
+    """
+    
+    def __init__(self, path, workers=None, data=None):
+        self.path = path
+        self.workers = workers
+        self.data = data
+        self._doc = None
+        self._page_cache = []
+        self._page_texts = None
+        self._text = None
+        self._metadata = None
+        self._header_lines = None
+        self._page_words = {}
+        self._page_layouts = {}
+        self._page_layout_texts = None
+        self._layout_text = None
+        self._section_index = None
+        self._measurements = None
+        self._page_fingerprints = None
+        self._seeded_pages = {}
+        self._page_sources = None
+        self._asset_segments = None
+        self.from_cache = False
+        self.cache_key = None
+        self.changed_pages = None
+    
+    @classmethod
+    def from_cache_record(cls, path, record):
+        """Rebuild a document from ExtractionCache data without opening the PDF"""
+        doc = cls(path)
+        doc._page_texts = record['page_texts']
+        doc._metadata = record['metadata']
+        doc._page_layout_texts = record['page_layout_texts']
+        doc._section_index = record['section_index']
+        doc._measurements = record['measurements']
+        doc._page_fingerprints = record['page_fingerprints']
+        doc._page_sources = record['page_sources']
+        doc._asset_segments = record['asset_segments']
+        doc.from_cache = True
+        doc.changed_pages = []
+        return doc
+    
+    def to_cache_record(self):
+        """Everything worth caching about this document, extracting what is still missing"""
+        return {
+            'parser_version': PARSER_VERSION,
+            'page_texts': self.page_texts,
+            'metadata': self.metadata,
+            'page_layout_texts': self.page_layout_texts,
+            'section_index': self.section_index,
+            'measurements': self.measurements,
+            'page_fingerprints': self.page_fingerprints,
+            'page_sources': self.page_sources,
+            'asset_segments': self.asset_segments,
+        }
+    
+    def seed_page(self, page_no, record):
+        """Reuse the extraction of an identical page (see to_page_record)"""
+        self._seeded_pages[page_no] = record
+        self._page_words[page_no] = [tuple(word) for word in record['words']]
+    
+    def to_page_record(self, page_no):
+        """Cacheable extraction results of one page, keyed by its fingerprint"""
+        return {
+            'text': self.page_texts[page_no],
+            'words': self.page_words(page_no),
+            'source': self.page_sources[page_no],
+        }
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def _open(self):
+        """Open the underlying fitz document on first use"""
+        if self._doc is None:
+            if self.data is None and split_zip_member(self.path):
+                self.data = read_pdf_bytes(self.path)
+            if self.data is not None:
+                self._doc = fitz.open(stream=self.data, filetype="pdf")
+            else:
+                self._doc = fitz.open(self.path)
+        return self._doc
+    
+    def close(self):
+        """Release the fitz handle; cached values stay available"""
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+    
+    @property
+    def page_count(self):
+        if self._page_texts is not None:
+            return len(self._page_texts)
+        return self._open().page_count
+    
+    @property
+    def page_texts(self):
+        """Extracted text of every page, in page order
+
+        With ``workers`` > 1 and a long enough document the pages are
+        extracted in a process pool (see extract_page_texts_parallel).
+        Scanned pages are then OCR'd (see page_sources).
+        """
+        if self._page_texts is None:
+            page_count = self.page_count
+            # Partially seeded documents extract only their missing pages serially
+            if self.workers and self.workers > 1 and page_count >= PARALLEL_MIN_PAGES and not self._seeded_pages:
+                page_texts = extract_page_texts_parallel(self.path, self.workers, page_count, self.data)
+            else:
+                page_texts = list(self._iter_native_pages())
+            self._page_texts = self._apply_ocr(page_texts)
+        return self._page_texts
+    
+    def iter_pages(self):
+        """Yield page texts lazily, extracting each page at most once
+
+        Stopping early (e.g. after the first page) leaves the remaining
+        pages untouched; pages already extracted are reused by later calls
+        and by ``page_texts``. Reaching a scanned page switches to
+        ``page_texts`` so all scanned pages are OCR'd in one batch.
+        """
+        if self._page_texts is not None:
+            yield from self._page_texts
+            return
+        
+        for page_no, text in enumerate(self._iter_native_pages()):
+            if self._needs_ocr(page_no, text):
+                yield from self.page_texts[page_no:]
+                return
+            yield text
+        if self._page_texts is None:
+            self._page_texts = self._apply_ocr(self._page_cache)
+    
+    def _iter_native_pages(self):
+        """Yield the text layer of every page (or its cached extraction), once each"""
+        page_no = 0
+        while page_no < self.page_count:
+            if page_no == len(self._page_cache):
+                if page_no in self._seeded_pages:
+                    text = self._seeded_pages[page_no]['text']
+                else:
+                    text = self._open()[page_no].get_text()
+                self._page_cache.append(text)
+            yield self._page_cache[page_no]
+            page_no += 1
+    
+    def _needs_ocr(self, page_no, text):
+        """True for a freshly extracted page with no real text layer but an image"""
+        if page_no in self._seeded_pages or len(''.join(text.split())) >= BLANK_PAGE_CHARS:
+            return False
+        return bool(self._open()[page_no].get_images())
+    
+    def _apply_ocr(self, page_texts):
+        """Replace the text of scanned pages with OCR output and record page sources"""
+        page_texts = list(page_texts)
+        sources = ['text'] * len(page_texts)
+        for page_no, record in self._seeded_pages.items():
+            sources[page_no] = record.get('source', 'text')
+        
+        scanned = [page_no for page_no, text in enumerate(page_texts) if self._needs_ocr(page_no, text)]
+        results = ocr_pages(self.path, scanned, self.data, self.workers) if scanned and ocr_available() else [None] * len(scanned)
+        for page_no, result in zip(scanned, results):
+            if result is None:
+                sources[page_no] = 'image'
+                continue
+            page_texts[page_no], self._page_words[page_no] = result
+            sources[page_no] = 'ocr'
+        self._page_sources = sources
+        return page_texts
+    
+    @property
+    def page_sources(self):
+        """Origin of every page's text: 'text' (native text layer), 'ocr'
+        (Tesseract) or 'image' (scanned page left unread, OCR unavailable)
+        """
+        if self._page_sources is None:
+            self.page_texts
+        return self._page_sources
+    
+    @property
+    def page_fingerprints(self):
+        """Content fingerprint of every page (see page_fingerprint)"""
+        if self._page_fingerprints is None:
+            doc = self._open()
+            # Fonts are usually shared by every page, so each is hashed once
+            object_digests = {}
+            self._page_fingerprints = [page_fingerprint(doc, page, object_digests) for page in doc]
+        return self._page_fingerprints
+    
+    def page_words(self, page_no):
+        """Words of a page with coordinates: (x0, y0, x1, y1, word, block, line, word_no)"""
+        if page_no not in self._page_words:
+            self._page_words[page_no] = self._open()[page_no].get_text("words")
+        return self._page_words[page_no]
+    
+    def page_layout(self, page_no):
+        """Row/column layout blocks of a page (see trax_layout.page_layout)"""
+        if page_no not in self._page_layouts:
+            self._page_layouts[page_no] = page_layout(self.page_words(page_no))
+        return self._page_layouts[page_no]
+    
+    @property
+    def page_layout_texts(self):
+        """Rendered layout of every page (tables as ' | '-separated rows)"""
+        if self._page_layout_texts is None:
+            self._page_layout_texts = [render_layout(self.page_layout(page_no)) for page_no in range(self.page_count)]
+        return self._page_layout_texts
+    
+    @property
+    def layout_text(self):
+        """Compact page-by-page rendering with tables as ' | '-separated rows"""
+        if self._layout_text is None:
+            self._layout_text = join_layout_pages(self.page_layout_texts)[0]
+        return self._layout_text
+    
+    @property
+    def section_index(self):
+        """Test sections and page kinds of the document (see build_section_index)"""
+        if self._section_index is None:
+            self._section_index = build_section_index(self.page_layout_texts)
+        return self._section_index
+    
+    @property
+    def measurements(self):
+        """Core test table values (see trax_tables.extract_measurements)"""
+        if self._measurements is None:
+            # Imported here: trax_tables builds on this module
+            from trax_tables import extract_measurements
+            self._measurements = extract_measurements(self)
+        return self._measurements
+    
+    @property
+    def asset_segments(self):
+        """Per-transformer page groups read from the content (see trax_segments.split_assets),
+        each with the measurements read from its own pages
+        """
+        if self._asset_segments is None:
+            units = split_assets(self.section_index, self.page_layout_texts)
+            if len(units) == 1:
+                units[0]['measurements'] = self.measurements
+            else:
+                from trax_tables import extract_measurements
+                for unit in units:
+                    unit['measurements'] = extract_measurements(self, unit['pages'])
+            self._asset_segments = units
+        return self._asset_segments
+    
+    @property
+    def asset_units(self):
+        """Labeled per-transformer work units (see trax_segments.label_assets)
+
+        Only asset_segments is cached: serials taken from the file name are
+        applied on every use, since the same bytes may arrive under another name.
+        """
+        return label_assets(self.asset_segments, os.path.basename(self.path))
+    
+    def unit_text(self, unit):
+        """Layout text of one asset unit (the whole relevant text for single-asset documents)"""
+        if unit['label'] is None:
+            return self.relevant_text
+        return join_layout_pages(self.page_layout_texts, unit['pages'])[0]
+
+    def unit_nameplate_text(self, unit):
+        """Header pages ahead of the tests (often skipped as a cover) plus the unit's pages,
+        for reading nameplate data (see asset_registry.extract_nameplate)
+        """
+        relevant = self.section_index['relevant_pages'] or [self.page_count]
+        pages = sorted(set(range(min(relevant))) | set(unit['pages']))
+        return join_layout_pages(self.page_layout_texts, pages)[0]
+
+    @property
+    def relevant_text(self):
+        """Layout text of the pages that matter for analysis
+
+        Boilerplate pages (cover, calibration certificates, blank or empty
+        test-condition pages) are left out. If no test section was found the
+        whole document is returned rather than risk dropping data.
+        """
+        index = self.section_index
+        if not index['sections']:
+            return self.layout_text
+        return join_layout_pages(self.page_layout_texts, index['relevant_pages'])[0]
+    
+    def iter_lines(self):
+        """Yield text lines lazily across pages (same lines as text.split('\\n'))"""
+        return iter_page_lines(self.iter_pages())
+    
+    @property
+    def text(self):
+        """Full document text"""
+        if self._text is None:
+            self._text = ''.join(self.page_texts)
+        return self._text
+    
+    @property
+    def metadata(self):
+        """PDF metadata dictionary as reported by PyMuPDF"""
+        if self._metadata is None:
+            self._metadata = dict(self._open().metadata or {})
+        return self._metadata
+    
+    @property
+    def creation_date(self):
+        """Creation date from the PDF metadata as YYYY-MM-DD, or None"""
+        return parse_pdf_date(self.metadata.get('creationDate'))
+    
+    @property
+    def header_lines(self):
+        """First HEADER_LINE_COUNT lines of the document text"""
+        if self._header_lines is None:
+            self._header_lines = list(islice(self.iter_lines(), HEADER_LINE_COUNT))
+        return self._header_lines
+    
+    @property
+    def document_date(self):
+        return extract_document_date(self)
+    
+    @property
+    def substation_name(self):
+        return extract_substation_name(self.iter_lines())
+
+def page_fingerprint(doc, page, object_digests=None):
+    """SHA-256 of what a page draws: its content stream, geometry, the raw
+    streams of the images and form XObjects it references and its fonts
+
+    Hashing the raw PDF objects is far cheaper than extracting text, so a
+    reissued report can be compared page by page before any extraction.
+    Fonts are part of the text: the same glyph codes read differently under
+    another ToUnicode CMap or font program. ``object_digests`` memoizes
+    font digests across the pages of a document.
+    """
+    if object_digests is None:
+        object_digests = {}
+    digest = hashlib.sha256(f"{tuple(page.rect)}|{page.rotation}|".encode())
+    digest.update(page.read_contents())
+    xrefs = {image[0] for image in page.get_images(full=True)}
+    xrefs.update(xobject[0] for xobject in page.get_xobjects())
+    for xref in sorted(xrefs):
+        digest.update(doc.xref_stream_raw(xref) or b'')
+    # (xref, ext, type, basefont, resource name, encoding, referencer)
+    for font in sorted(page.get_fonts(full=True), key=lambda font: (font[4], font[0])):
+        digest.update(f"|{font[4]}|".encode())
+        digest.update(_object_digest(doc, font[0], object_digests, set()))
+    return digest.hexdigest()
+
+def _object_digest(doc, xref, object_digests, visiting):
+    """SHA-256 of a PDF object and everything it references (dictionaries and
+    raw streams), independent of the object numbers of the file
+    """
+    if xref in object_digests:
+        return object_digests[xref]
+    if xref in visiting or xref <= 0:
+        return b''
+    visiting.add(xref)
+    source = doc.xref_object(xref, compressed=True)
+    digest = hashlib.sha256(OBJECT_REFERENCE.sub('R', source).encode())
+    for reference in OBJECT_REFERENCE.findall(source):
+        digest.update(_object_digest(doc, int(reference), object_digests, visiting))
+    if doc.xref_is_stream(xref):
+        digest.update(doc.xref_stream_raw(xref) or b'')
+    object_digests[xref] = digest.digest()
+    return object_digests[xref]
+
+_OCR_AVAILABLE = None
+
+def ocr_available():
+    """True when PyMuPDF can find a Tesseract installation for OCR"""
+    global _OCR_AVAILABLE
+    if _OCR_AVAILABLE is None:
+        try:
+            fitz.get_tessdata()
+            _OCR_AVAILABLE = True
+        except (AttributeError, RuntimeError):
+            _OCR_AVAILABLE = False
+    return _OCR_AVAILABLE
+
+def ocr_page(page):
+    """(text, words) of a scanned page read by Tesseract, or None if OCR fails"""
     try:
-        # Try to get date from PDF metadata first
-        doc = fitz.open(pdf_path)
-        metadata = doc.metadata
+        textpage = page.get_textpage_ocr(language=OCR_LANGUAGE, dpi=OCR_DPI, full=True)
+    except RuntimeError:
+        return None
+    return page.get_text(textpage=textpage), page.get_text("words", textpage=textpage)
+
+def _ocr_page_list(path, page_numbers, data=None):
+    """Worker entry point: OCR the given pages with a private fitz handle"""
+    doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(path)
+    try:
+        return [ocr_page(doc[page_no]) for page_no in page_numbers]
+    finally:
         doc.close()
+
+def ocr_pages(path, page_numbers, data=None, workers=None):
+    """OCR results for ``page_numbers`` (see ocr_page), spread over a process pool
+
+    OCR costs around a second per page, so unlike text extraction it is
+    worth a pool even for a handful of pages.
+    """
+    workers = min(len(page_numbers), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return _ocr_page_list(path, page_numbers, data)
+    
+    size = -(-len(page_numbers) // workers)
+    chunks = [page_numbers[start:start + size] for start in range(0, len(page_numbers), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_ocr_page_list, path, chunk, data) for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+def page_source_summary(page_sources):
+    """1-based page numbers whose text came from OCR or could not be read at all"""
+    summary = {}
+    for source, key in (('ocr', 'ocr_pages'), ('image', 'unread_scanned_pages')):
+        pages = [page_no + 1 for page_no, page_source in enumerate(page_sources) if page_source == source]
+        if pages:
+            summary[key] = pages
+    return summary
+
+def changed_sections(section_index, page_numbers):
+    """Sections of a section index that span any of the given pages"""
+    pages = set(page_numbers)
+    sections = []
+    for entry in section_index['sections']:
+        if pages.intersection(range(entry['page'], entry['end_page'] + 1)) and entry['section'] not in sections:
+            sections.append(entry['section'])
+    return sections
+
+def page_marker(page_no):
+    return f"--- Page {page_no + 1} ---\n"
+
+def join_layout_pages(page_texts, page_numbers=None):
+    """Join rendered pages behind page markers
+
+    Returns (text, offsets) where offsets maps each included page number to
+    the character offset of its content (just after the marker).
+    """
+    if page_numbers is None:
+        page_numbers = range(len(page_texts))
+    parts = []
+    offsets = {}
+    position = 0
+    for page_no in page_numbers:
+        marker = page_marker(page_no)
+        offsets[page_no] = position + len(marker)
+        parts.append(f"{marker}{page_texts[page_no]}\n")
+        position += len(parts[-1])
+    return ''.join(parts), offsets
+
+def section_heading(line):
+    """Section key if a line is a test section heading
+
+    A heading is a single-cell title without numbers. Table rows (" | "
+    between cells, e.g. a column header "Bushing | %PF Meas") are not, and
+    neither are "label: value" lines such as "Winding Resistance: acceptable"
+    on a summary page; only the value after a colon can name the test.
+    """
+    if NUMERIC_TOKEN.search(line) or ' | ' in line:
+        return None
+    label, _, value = line.partition(':')
+    title = value if value.strip() else label
+    for section, pattern in SECTION_HEADINGS:
+        if pattern.search(title):
+            return section
+    return None
+
+def classify_page(page_no, page_text, has_heading, before_sections):
+    """Classify a page as 'test', 'nameplate', 'other' or one of SKIPPED_PAGE_KINDS"""
+    if len(''.join(page_text.split())) < BLANK_PAGE_CHARS and not NAMEPLATE_FIELDS.search(page_text):
+        return 'blank'
+    if has_heading:
+        return 'test'
+    for kind, pattern in BOILERPLATE_PAGES:
+        if pattern.search(page_text):
+            return kind
+    if CONDITIONS_PAGE.search(page_text) and len(NUMERIC_TOKEN.findall(page_text)) < 3:
+        return 'conditions'
+    if before_sections:
+        # Pages ahead of the first test section either carry nameplate data
+        # the analysis needs or are a cover page
+        return 'nameplate' if NAMEPLATE_FIELDS.search(page_text) else 'cover'
+    # Continuation of the previous section's table
+    return 'test'
+
+def build_section_index(page_texts):
+    """Index test sections and classify pages of a rendered document
+
+    ``page_texts`` are the per-page layout renderings. Returns a dict with
+    "sections": [{"section", "page", "end_page", "start", "end"}] where
+    start/end are character offsets into join_layout_pages(page_texts),
+    "page_kinds": the classification of every page and "relevant_pages":
+    the page numbers worth sending to the analyzer.
+    """
+    _, offsets = join_layout_pages(page_texts)
+    sections = []
+    page_kinds = []
+    current = None
+    for page_no, page_text in enumerate(page_texts):
+        headings = []
+        line_start = 0
+        for line in page_text.split('\n'):
+            section = section_heading(line)
+            if section:
+                headings.append((section, offsets[page_no] + line_start))
+            line_start += len(line) + 1
         
-        # Check creation date in metadata
-        if metadata.get('creationDate'):
-            # PyMuPDF returns dates in format like "D:20240728123456+00'00'"
-            date_str = metadata['creationDate']
-            if date_str.startswith('D:'):
-                date_str = date_str[2:10]  # Extract YYYYMMDD
-                try:
-                    parsed_date = datetime.strptime(date_str, '%Y%m%d')
-                    return parsed_date.strftime('%Y-%m-%d')
-                except:
-                    pass
+        kind = classify_page(page_no, page_text, bool(headings), not sections)
+        page_kinds.append(kind)
+        if kind in SKIPPED_PAGE_KINDS:
+            continue
         
-        # If metadata fails, search in document content
-        date_patterns = [
-            # Date patterns commonly found in TRAX reports
-            r'(?:Date|Test Date|Report Date)[:\s]*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(?:Date|Test Date|Report Date)[:\s]*(\d{2,4}[/-]\d{1,2}[/-]\d{1,2})',
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',  # Any date format
-            r'(\d{2,4}[/-]\d{1,2}[/-]\d{1,2})',  # YYYY/MM/DD format
-            # Long date formats
-            r'(?:Date|Test Date|Report Date)[:\s]*([A-Za-z]+ \d{1,2}, \d{4})',
-            r'([A-Za-z]+ \d{1,2}, \d{4})',  # "January 15, 2024"
-            # ISO format
-            r'(\d{4}-\d{2}-\d{2})',
-        ]
+        for section, start in headings:
+            if current and section == current['section']:
+                # A repeated title (e.g. on each page of a long table) continues the section
+                continue
+            if current and start > offsets[page_no]:
+                # Rows above the heading still belong to the previous section
+                current['end_page'] = page_no
+                current['end'] = start
+            current = {'section': section, 'page': page_no, 'end_page': page_no, 'start': start, 'end': None}
+            sections.append(current)
+        if current:
+            current['end_page'] = page_no
+            current['end'] = offsets[page_no] + len(page_text)
+    
+    relevant_pages = [page_no for page_no, kind in enumerate(page_kinds) if kind not in SKIPPED_PAGE_KINDS]
+    return {'sections': sections, 'page_kinds': page_kinds, 'relevant_pages': relevant_pages}
+
+def iter_text_lines(text):
+    """Yield the lines of ``text`` lazily (same lines as text.split('\\n'))"""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def iter_page_lines(page_texts):
+    """Yield lines across an iterable of page texts, joining lines split at page breaks"""
+    pending = ''
+    for page_text in page_texts:
+        lines = (pending + page_text).split('\n')
+        pending = lines.pop()
+        yield from lines
+    yield pending
+
+def split_zip_member(path):
+    """(archive, member) for a path such as "campaign.zip!/reports/r1.pdf", else None"""
+    archive, separator, member = path.partition(ZIP_MEMBER_SEPARATOR)
+    if separator and archive.lower().endswith('.zip'):
+        return archive, member
+    return None
+
+def zip_pdf_paths(zip_path, extensions=('.pdf',)):
+    """Paths of the PDF members (or members with other ``extensions``) of a ZIP archive, in archive order"""
+    with zipfile.ZipFile(zip_path) as archive:
+        return [f"{zip_path}{ZIP_MEMBER_SEPARATOR}{info.filename}" for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(extensions)
+                and not info.filename.startswith('__MACOSX/')]
+
+def read_pdf_bytes(path):
+    """Whole PDF file (or ZIP member) as bytes, fetched with a single sequential read
+
+    Synced network folders (OneDrive, SMB shares) are slow at the many small
+    seeks fitz makes on a file path; one read into memory avoids them and
+    the buffer is reused for hashing and parsing. ZIP members are
+    decompressed straight into memory without unpacking the archive.
+    """
+    zip_member = split_zip_member(path)
+    if zip_member:
+        with zipfile.ZipFile(zip_member[0]) as archive:
+            return archive.read(zip_member[1])
+    with open(path, 'rb') as f:
+        return f.read()
+
+def pdf_mtime(path):
+    """Modification time of a PDF file or ZIP member, as a timestamp"""
+    zip_member = split_zip_member(path)
+    if zip_member:
+        with zipfile.ZipFile(zip_member[0]) as archive:
+            return datetime(*archive.getinfo(zip_member[1]).date_time).timestamp()
+    return os.path.getmtime(path)
+
+def prefetch_pdf_bytes(paths, depth=PREFETCH_DEPTH):
+    """Yield (path, data) for each path, reading the next ``depth`` files in the background
+
+    ``data`` is None when a file cannot be read; callers then fall back to
+    opening the path so the error is reported where it always was.
+    """
+    def read(path):
+        try:
+            return read_pdf_bytes(path)
+        except OSError:
+            return None
+
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max(1, depth)) as pool:
+        pending = [pool.submit(read, path) for path in paths[:depth + 1]]
+        for index, path in enumerate(paths):
+            data = pending[index].result()
+            pending[index] = None
+            next_index = index + depth + 1
+            if next_index < len(paths):
+                pending.append(pool.submit(read, paths[next_index]))
+            yield path, data
+
+def iter_pdf_pages(path):
+    """Yield the page texts of a PDF lazily; the file is closed when the generator ends"""
+    with PdfDocument(path) as doc:
+        yield from doc.iter_pages()
+
+def identify_pdf(path):
+    """Quick identify-and-route pass: (substation name, document date) from the header only
+
+    Only the first page (or the first few, if it is short) is extracted.
+    """
+    with PdfDocument(path) as doc:
+        return doc.substation_name, doc.document_date
+
+def _extract_page_range(path, start, stop, data=None):
+    """Worker entry point: extract pages [start, stop) with a private fitz handle"""
+    doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(path)
+    try:
+        return [doc[page_no].get_text() for page_no in range(start, stop)]
+    finally:
+        doc.close()
+
+def page_ranges(page_count, shards):
+    """Split page_count pages into at most ``shards`` contiguous (start, stop) ranges"""
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for shard in range(shards):
+        stop = start + size + (1 if shard < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def extract_page_texts_parallel(path, workers, page_count=None, data=None):
+    """Extract page texts across a process pool, returned in page order
+
+    Each worker opens its own fitz handle (fitz documents cannot be shared
+    between processes) and extracts only its page range. The document is
+    cut into twice as many ranges as workers so one slow range does not
+    leave the other cores idle. Workers open the file by path; ``data`` is
+    only sent to them for documents without one (e.g. ZIP members), as
+    copying the whole PDF into every task costs more than rereading it.
+    """
+    if page_count is None:
+        doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(path)
+        page_count = doc.page_count
+        doc.close()
+    
+    worker_data = None if os.path.isfile(path) else data
+    ranges = page_ranges(page_count, workers * 2)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_extract_page_range, path, start, stop, worker_data) for start, stop in ranges]
+        page_texts = []
+        for future in futures:
+            page_texts.extend(future.result())
+    return page_texts
+
+def extract_relevant_text(path):
+    """Layout text of the analysis-relevant pages of a PDF (see PdfDocument.relevant_text)"""
+    with PdfDocument(path) as doc:
+        return doc.relevant_text
+
+def extract_text_from_pdf(path, workers=None):
+    """Extract the full text of a PDF, optionally page-parallel with ``workers`` processes"""
+    with PdfDocument(path, workers=workers) as doc:
+        return doc.text
+
+def parse_pdf_date(date_str):
+    """Convert a PDF date such as "D:20240728123456+00'00'" to YYYY-MM-DD"""
+    if not date_str or not date_str.startswith('D:'):
+        return None
+    try:
+        parsed_date = datetime.strptime(date_str[2:10], '%Y%m%d')
+        return parsed_date.strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+def extract_document_date(pdf_path, text=None):
+    """Extract document date from PDF metadata and content
+
+    ``pdf_path`` may be a path or an already open PdfDocument; passing the
+    document reuses its handle instead of opening the file again.
+    """
+    try:
+        if isinstance(pdf_path, PdfDocument):
+            doc = pdf_path
+            owns_doc = False
+        else:
+            doc = PdfDocument(pdf_path)
+            owns_doc = True
         
-        lines = text.split('\n')[:20]  # Check first 20 lines
+        try:
+            # Try to get date from PDF metadata first
+            creation_date = doc.creation_date
+            if creation_date:
+                return creation_date
+            
+            if text is not None:
+                lines = list(islice(iter_text_lines(text), HEADER_LINE_COUNT))
+            else:
+                lines = doc.header_lines
+        finally:
+            if owns_doc:
+                doc.close()
         
-        for pattern in date_patterns:
-            for line in lines:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    date_str = match.group(1).strip()
-                    # Try to parse and format the date
-                    parsed_date = parse_date_string(date_str)
-                    if parsed_date:
-                        return parsed_date.strftime('%Y-%m-%d')
+        # If metadata fails, search in document content
+        parsed_date = scan_header_date(lines)
+        if parsed_date:
+            return parsed_date.strftime('%Y-%m-%d')
         
         # Fallback: use file modification date
-        import os
-        mtime = os.path.getmtime(pdf_path)
+        mtime = pdf_mtime(doc.path)
         return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d')
         
     except Exception as e:
         # Final fallback: current date
         return datetime.now().strftime('%Y-%m-%d')
 
+# Month names and abbreviations accepted by %B / %b
+MONTHS = {}
+for _number, _name in enumerate(['january', 'february', 'march', 'april', 'may', 'june', 'july',
+                                 'august', 'september', 'october', 'november', 'december'], 1):
+    MONTHS[_name] = _number
+    MONTHS[_name[:3]] = _number
+
+# Date tokens in the header: an optional "Date" label (also covers "Test
+# Date" / "Report Date") followed by a numeric or long-form date. Nothing in
+# a token crosses a line break, so the whole header is scanned in one call.
+DATE_SCANNER = re.compile(
+    r'(?P<label>date(?::|[^\S\n])*)?'
+    r'(?:(?<!\d)(?P<numeric>\d{1,4}[/-]\d{1,2}[/-]\d{1,4})(?!\d)'
+    r'|(?<![A-Za-z])(?P<long>[A-Za-z]+ \d{1,2}, \d{4}))',
+    re.IGNORECASE
+)
+NUMERIC_DATE = re.compile(r'(\d{1,4})([/-])(\d{1,2})\2(\d{1,4})')
+LONG_DATE = re.compile(r'([A-Za-z]+)\s+(\d{1,2}),\s+(\d{4})')
+
+# Strategy priority of a date token, lowest first: labelled month/day/year,
+# labelled year/month/day, bare month/day/year, bare year/month/day,
+# labelled long date, bare long date
+DATE_PRIORITY = {
+    ('mdy', True): 1, ('ymd', True): 2,
+    ('mdy', False): 3, ('ymd', False): 4,
+    ('long', True): 5, ('long', False): 6,
+}
+
+def _numeric_date_shapes(token):
+    """Shapes ('mdy' and/or 'ymd') a numeric date token can be read as"""
+    first, _, last = token.replace('-', '/').split('/')
+    shapes = []
+    if len(first) <= 2 and 2 <= len(last) <= 4:
+        shapes.append('mdy')
+    if 2 <= len(first) <= 4 and len(last) <= 2:
+        shapes.append('ymd')
+    return shapes
+
+def _make_date(year, month, day):
+    try:
+        return datetime(year, month, day)
+    except ValueError:
+        return None
+
 def parse_date_string(date_str):
-    """Parse various date string formats"""
-    date_formats = [
-        '%m/%d/%Y', '%m-%d-%Y', '%m/%d/%y', '%m-%d-%y',
-        '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y',
-        '%Y/%m/%d', '%Y-%m-%d',
-        '%B %d, %Y', '%b %d, %Y',  # "January 15, 2024", "Jan 15, 2024"
-    ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
+    """Parse various date string formats
+
+    Recognizes month/day/year, day/month/year (tried in that order),
+    year/month/day and "January 15, 2024" / "Jan 15, 2024" by their shape
+    instead of trying every strptime format in turn. Both separators must be
+    the same ('/' or '-').
+    """
+    match = NUMERIC_DATE.fullmatch(date_str)
+    if match:
+        first, _, middle, last = match.groups()
+        if len(first) == 4:
+            if len(last) <= 2:
+                return _make_date(int(first), int(middle), int(last))
+            return None
+        if len(first) > 2 or len(last) not in (2, 4):
+            return None
+        year = int(last)
+        if len(last) == 2:
+            # Same pivot as strptime's %y
+            year += 1900 if year >= 69 else 2000
+        return _make_date(year, int(first), int(middle)) or _make_date(year, int(middle), int(first))
+    
+    match = LONG_DATE.fullmatch(date_str)
+    if match:
+        month = MONTHS.get(match.group(1).lower())
+        if month:
+            return _make_date(int(match.group(3)), month, int(match.group(2)))
+    return None
+
+def scan_header_date(lines):
+    """Find the report date in header lines with one pass of DATE_SCANNER
+
+    Every date token is ranked by DATE_PRIORITY (a labelled token also
+    counts as a bare one). As with the per-line pattern searches this
+    replaces, only the first token of each rank on a line is a candidate:
+    an unparseable first token hides later ones of the same kind on that
+    line. The best ranked candidate that parses wins, earlier lines
+    breaking ties.
+    """
+    candidates = {}
+    for line_no, line in enumerate(lines):
+        for match in DATE_SCANNER.finditer(line):
+            token = match.group('numeric')
+            if token:
+                shapes = _numeric_date_shapes(token)
+            else:
+                token = match.group('long')
+                shapes = ['long']
+            labels = (False, True) if match.group('label') is not None else (False,)
+            for shape in shapes:
+                for labelled in labels:
+                    candidates.setdefault((DATE_PRIORITY[(shape, labelled)], line_no), token)
+    
+    for key in sorted(candidates):
+        parsed_date = parse_date_string(candidates[key])
+        if parsed_date:
+            return parsed_date
+    return None
+
+# Lines following a bare "Substation" line that are labels, not names
+NAME_STOP_WORDS = ['position', 'location', 'test', 'conditions', 'weather', 'temperature']
+
+# Standalone alphanumeric equipment codes
+CODE_LINE = re.compile(r'^[A-Z0-9\-_]{2,15}$')
+
+# Labelled name patterns in priority order. Each starts with a distinct
+# keyword, so at most one can match at any position and a single scan with
+# the alternation below finds the leftmost match of every pattern. The
+# leading character class skips positions no keyword can start at.
+NAME_PATTERNS = [
+    r'Substation[:\s]+(?P<v0>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test|Position|Job)',
+    r'Station[:\s]+(?P<v1>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+    r'Equipment[:\s]+(?P<v2>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+    r'Transformer[:\s]+(?P<v3>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+    r'Unit[:\s]+(?P<v4>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+    r'Site[:\s]+(?P<v5>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+    r'Location[:\s]+(?P<v6>[A-Za-z0-9\s\-_]+?)(?:\n|Substation|Date|Test)',
+    r'Asset[:\s]+(?P<v7>[A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
+    # More specific patterns
+    r'at\s+(?P<v8>[A-Za-z0-9\s\-_]+?)\s+(?:Substation|Station)',
+    r'Test\s+Report\s+for\s+(?P<v9>[A-Za-z0-9\s\-_]+?)(?:\n|at|Substation)',
+    # Serial number patterns as fallback
+    r'Serial\s*[#No.]*\s*[:\s]*(?P<v10>[A-Za-z0-9\-_]+)',
+    r'S/N[:\s]*(?P<v11>[A-Za-z0-9\-_]+)',
+]
+NAME_SCANNER = re.compile(
+    '(?=[SETULA])(?=' + '|'.join(f'(?P<p{rank}>{pattern})' for rank, pattern in enumerate(NAME_PATTERNS)) + ')',
+    re.IGNORECASE | re.MULTILINE
+)
+WHITESPACE = re.compile(r'\s+')
+
+def scan_header_name(text):
+    """Apply the labelled name patterns to ``text`` in one pass
+
+    Returns the value of the highest priority pattern whose first match has
+    a reasonable length, or None.
+    """
+    first_matches = {}
+    for match in NAME_SCANNER.finditer(text):
+        rank = int(match.lastgroup[1:])
+        if rank not in first_matches:
+            first_matches[rank] = match.group(f'v{rank}')
+    
+    for rank in sorted(first_matches):
+        name = WHITESPACE.sub(' ', first_matches[rank]).strip()
+        if 1 < len(name) < 50:  # Reasonable length check
+            return name
     return None
 
+def _name_header(source):
+    """Collect the header region used for name extraction
+
+    Returns the first NAME_HEADER_LINE_COUNT non-empty stripped lines and the
+    raw header text they came from. ``source`` is either the document text or
+    a lazy line iterator; in both cases nothing past the header is read.
+    """
+    raw_lines = iter_text_lines(source) if isinstance(source, str) else source
+    lines = []
+    header = []
+    for raw_line in raw_lines:
+        header.append(raw_line)
+        line = raw_line.strip()
+        if line:
+            lines.append(line)
+            if len(lines) >= NAME_HEADER_LINE_COUNT:
+                break
+    header.append('')
+    return lines, '\n'.join(header)
+
 def extract_substation_name(text):
-    """Extract substation or equipment name from TRAX report text"""
-    
-    # Split text into lines for better analysis
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-    
-    # Strategy 1: Look for "Substation" followed by a number or name in next few lines
-    for i, line in enumerate(lines[:20]):
-        if line.lower() == 'substation' and i + 1 < len(lines):
-            # Check next few lines for a name/number
-            for j in range(1, min(4, len(lines) - i)):
-                next_line = lines[i + j].strip()
-                # Check if it's a reasonable substation identifier
-                if next_line and len(next_line) < 30 and not next_line.lower() in ['position', 'location', 'test', 'conditions', 'weather', 'temperature']:
-                    return clean_filename(f"Substation_{next_line}")
-    
-    # Strategy 2: Look for "Test Asset" section pattern
-    for i, line in enumerate(lines[:15]):
-        if 'test asset' in line.lower() and i + 1 < len(lines):
-            # Look for substation info in next few lines
-            for j in range(1, min(5, len(lines) - i)):
-                next_line = lines[i + j].strip()
-                if 'substation' in next_line.lower():
-                    if j + 1 < len(lines) - i:
-                        substation_id = lines[i + j + 1].strip()
-                        if substation_id and len(substation_id) < 20:
-                            return clean_filename(f"Substation_{substation_id}")
-    
-    # Strategy 3: Common regex patterns for substation/equipment identification
-    patterns = [
-        r'Substation[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test|Position|Job)',
-        r'Station[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
-        r'Equipment[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
-        r'Transformer[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
-        r'Unit[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
-        r'Site[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
-        r'Location[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Substation|Date|Test)',
-        r'Asset[:\s]+([A-Za-z0-9\s\-_]+?)(?:\n|Location|Date|Test)',
-        # More specific patterns
-        r'at\s+([A-Za-z0-9\s\-_]+?)\s+(?:Substation|Station)',
-        r'Test\s+Report\s+for\s+([A-Za-z0-9\s\-_]+?)(?:\n|at|Substation)',
-        # Serial number patterns as fallback
-        r'Serial\s*[#No.]*\s*[:\s]*([A-Za-z0-9\-_]+)',
-        r'S/N[:\s]*([A-Za-z0-9\-_]+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-        if match:
-            name = match.group(1).strip()
-            # Clean up the extracted name
-            name = re.sub(r'\s+', ' ', name)  # Replace multiple spaces with single space
-            name = name.strip()
-            if len(name) > 1 and len(name) < 50:  # Reasonable length check
-                return clean_filename(name)
-    
-    # Strategy 4: Look for Asset ID or similar identifiers
-    for i, line in enumerate(lines[:25]):
-        if 'asset id' in line.lower() and i + 1 < len(lines):
-            asset_id = lines[i + 1].strip()
-            if asset_id and len(asset_id) < 30 and asset_id.lower() not in ['test', 'conditions', 'weather']:
-                return clean_filename(f"Asset_{asset_id}")
-    
-    # Strategy 5: Look for any numbered identifier in early lines
-    for line in lines[:10]:
-        # Look for standalone numbers that could be substation numbers
-        if line.isdigit() and 1 <= int(line) <= 9999:
-            return clean_filename(f"Substation_{line}")
-        # Look for alphanumeric codes
-        if re.match(r'^[A-Z0-9\-_]{2,15}$', line):
-            return clean_filename(f"Equipment_{line}")
+    """Extract substation or equipment name from the header of a TRAX report
+
+    ``text`` may be the full report text or an iterable of lines (for example
+    PdfDocument.iter_lines()); only the header region is examined.
+    """
+    
+    # Split the header into lines for better analysis
+    lines, text = _name_header(text)
+    
+    # Strategies 1, 2, 4 and 5 scan the header lines once, remembering the
+    # first hit of each; they are applied in their original priority order
+    line_hits = {}
+    for i, line in enumerate(lines):
+        lower = line.lower()
+        
+        # Strategy 1: "Substation" followed by a number or name in the next few lines
+        if 1 not in line_hits and i < 20 and lower == 'substation':
+            for next_line in lines[i + 1:i + 4]:
+                if len(next_line) < 30 and next_line.lower() not in NAME_STOP_WORDS:
+                    line_hits[1] = f"Substation_{next_line}"
+                    break
+        
+        # Strategy 2: "Test Asset" section followed by a "Substation" line and its id
+        if 2 not in line_hits and i < 15 and 'test asset' in lower:
+            for j in range(i + 1, min(i + 5, len(lines))):
+                if 'substation' in lines[j].lower():
+                    if j + 1 < len(lines) and len(lines[j + 1]) < 20:
+                        line_hits[2] = f"Substation_{lines[j + 1]}"
+                        break
+        
+        # Strategy 4: Asset ID or similar identifiers
+        if 4 not in line_hits and i < 25 and 'asset id' in lower and i + 1 < len(lines):
+            asset_id = lines[i + 1]
+            if len(asset_id) < 30 and asset_id.lower() not in ['test', 'conditions', 'weather']:
+                line_hits[4] = f"Asset_{asset_id}"
+        
+        # Strategy 5: any numbered identifier in early lines
+        if 5 not in line_hits and i < 10:
+            if line.isdigit() and 1 <= int(line) <= 9999:
+                line_hits[5] = f"Substation_{line}"
+            elif CODE_LINE.match(line):
+                line_hits[5] = f"Equipment_{line}"
+        
+        if 1 in line_hits:
+            break
+    
+    for strategy in (1, 2):
+        if strategy in line_hits:
+            return clean_filename(line_hits[strategy])
+    
+    # Strategy 3: labelled substation/equipment patterns, one pass over the header
+    name = scan_header_name(text)
+    if name:
+        return clean_filename(name)
+    
+    for strategy in (4, 5):
+        if strategy in line_hits:
+            return clean_filename(line_hits[strategy])
     
     # Final fallback - use generic name with timestamp
     return f"Transformer_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
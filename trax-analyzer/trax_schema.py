@@ -0,0 +1,428 @@
+"""
+Adaptive v3.0 JSON schema for the TRAX analysis prompt
+The full v3.0 schema asks for every test section (winding resistance, TTR,
+tan delta, bushings H1-X3, demagnetization), so a partial report such as
+"WRM and TTR Results" pays for the whole schema and gets fabricated blocks
+for tests that were never run. The schema, thresholds and report template
+are assembled here from per-test fragments, keeping only the tests that are
+actually present. With all five tests present the result is the full v3.0
+schema. build_response_schema derives the matching JSON Schema for
+schema-constrained (structured output) requests.
+"""
+
+import json
+from trax_parser import iter_text_lines, section_heading
+
+# Test sections in schema order, with their report headings
+TEST_SECTIONS = [
+    'winding_resistance',
+    'turns_ratio',
+    'tan_delta_main_insulation',
+    'bushing_pf_c1',
+    'demagnetization',
+]
+TEST_TITLES = {
+    'winding_resistance': 'Winding Resistance',
+    'turns_ratio': 'Turns Ratio',
+    'tan_delta_main_insulation': 'Tan Delta / Main Insulation',
+    'bushing_pf_c1': 'Bushing Power Factor',
+    'demagnetization': 'Demagnetization',
+}
+PF_SECTIONS = ('tan_delta_main_insulation', 'bushing_pf_c1')
+
+# Field of a structured response that carries the narrative report
+REPORT_FIELD = 'diagnostic_report'
+
+SECTION_SCHEMAS = {
+    'winding_resistance': '''  "winding_resistance": {
+    "lv_windings": [
+      {
+        "phase": "[PHASE]",
+        "tap_position": "[TAP]",
+        "resistance_mohm": "[VALUE]",
+        "range_mohm": "[MIN-MAX]",
+        "status": "[OK ✅/WARNING ⚠️/CRITICAL 🚨]",
+        "confidence_score": "[85-100]"
+      }
+    ],
+    "hv_windings": [
+      {
+        "phase": "[PHASE]",
+        "tap_position": "[TAP]",
+        "resistance_ohm": "[VALUE]",
+        "range_ohm": "[MIN-MAX]",
+        "status": "[OK ✅/WARNING ⚠️/CRITICAL 🚨]",
+        "confidence_score": "[85-100]"
+      }
+    ]
+  }''',
+    'turns_ratio': '''  "turns_ratio": [
+    {
+      "tap_position": "[TAP]",
+      "nominal_ttr": "[VALUE]",
+      "measured_ttr": "[VALUE]",
+      "error_percent": "[VALUE]",
+      "status": "[OK ✅ if ≤0.5%, WARNING ⚠️ if 0.5-1%, CRITICAL 🚨 if >1%]",
+      "excitation_current_ma": "[CONVERTED_4_DECIMALS]",
+      "phase_displacement_deg": "[VALUE]",
+      "confidence_score": "[85-100]"
+    }
+  ]''',
+    'tan_delta_main_insulation': '''  "tan_delta_main_insulation": {
+    "extraction_method": "Corrected %PF to 20°C - STRICT THRESHOLDS v2.3 (RETAINED)",
+    "CHL": {
+      "pf_corrected_20c_percent": "[EXACT_VALUE]",
+      "status": "[OK ✅ if <0.3%, WARNING ⚠️ if 0.3-0.5%, CRITICAL 🚨 if >0.5%]",
+      "temperature_correction": "[Available/Missing]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨]",
+      "monitoring_recommendation": "[Quarterly/Next cycle/Immediate based on value]"
+    },
+    "CLG": {
+      "pf_corrected_20c_percent": "[EXACT_VALUE]",
+      "status": "[STRICTLY: CRITICAL 🚨 if >0.5%, WARNING ⚠️ if 0.3-0.5%, OK ✅ if <0.3%]",
+      "temperature_correction": "[Available/Missing]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨]",
+      "moisture_risk_flag": "[TRUE if >0.5% + other insulation >0.4%]",
+      "monitoring_recommendation": "[Based on STRICT thresholds]"
+    },
+    "CLH": {
+      "pf_corrected_20c_percent": "[EXACT_VALUE]",
+      "status": "[STRICTLY: CRITICAL 🚨 if >0.5%, WARNING ⚠️ if 0.3-0.5%, OK ✅ if <0.3%]",
+      "temperature_correction": "[Available/Missing]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨]",
+      "monitoring_recommendation": "[Based on STRICT thresholds]"
+    },
+    "CHG": {
+      "pf_corrected_20c_percent": "[EXACT_VALUE]",
+      "status": "[STRICTLY: CRITICAL 🚨 if >0.5%, WARNING ⚠️ if 0.3-0.5%, OK ✅ if <0.3%]",
+      "temperature_correction": "[Available/Missing]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨]",
+      "moisture_combination_flag": "[TRUE if CLG >0.5% AND CHG >0.25%]",
+      "monitoring_recommendation": "[Based on STRICT thresholds]"
+    },
+    "pattern_detection": {
+      "moisture_risk_detected": "[TRUE if any 2 of CLG/CLH/CHG >0.4% AND one >0.5%]",
+      "confidence_inheritance": "[HIGH if all components HIGH confidence]"
+    }
+  }''',
+    'bushing_pf_c1': '''  "bushing_pf_c1": {
+    "extraction_method": "Corrected %PF - ZERO TOLERANCE v2.3 (RETAINED)",
+    "H1": {
+      "designation": "H1",
+      "pf_test_temp_percent": "[RAW_VALUE]",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[STRICTLY: OK ✅ <0.3%, WARNING ⚠️ 0.3-0.5%, CRITICAL 🚨 >0.5%]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]",
+      "phase_stress_pattern": "[TRUE if WARNING insulation + CRITICAL bushing same phase]"
+    },
+    "H2": {
+      "designation": "H2",
+      "pf_test_temp_percent": "[RAW_VALUE]",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[EXAMPLE: 0.52% = CRITICAL 🚨 NOT OK]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]",
+      "monitoring_recommendation": "[IMMEDIATE if >0.5%]"
+    },
+    "H3": {
+      "designation": "H3",
+      "pf_test_temp_percent": "[RAW_VALUE]",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[STRICTLY ENFORCED THRESHOLDS]",
+      "confidence_score": "[NUMERIC_85-100]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]"
+    },
+    "X0": {
+      "designation": "X0",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[STRICTLY ENFORCED THRESHOLDS]",
+      "confidence_score": "[NUMERIC]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]"
+    },
+    "X1": {
+      "designation": "X1",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[STRICTLY ENFORCED THRESHOLDS]",
+      "confidence_score": "[NUMERIC]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]"
+    },
+    "X2": {
+      "designation": "X2",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[STRICTLY ENFORCED THRESHOLDS]",
+      "confidence_score": "[NUMERIC]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]"
+    },
+    "X3": {
+      "designation": "X3",
+      "pf_corrected_20c_percent": "[CORRECTED_VALUE]",
+      "status": "[STRICTLY ENFORCED THRESHOLDS]",
+      "confidence_score": "[NUMERIC]",
+      "visual_indicator": "[✅/⚠️/🚨/❓]"
+    },
+    "cluster_analysis": {
+      "hv_cluster_degradation": "[TRUE if 2+ H bushings >0.5%]",
+      "lv_cluster_degradation": "[TRUE if 2+ X bushings >0.5%]",
+      "critical_bushings_count": "[COUNT_OF_BUSHINGS_>0.5%]",
+      "immediate_action_required": "[AUTO-FLAG: TRUE if 2+ bushings >0.5%]",
+      "cluster_pattern": "[HV Cluster Critical/LV Cluster Critical/Mixed Pattern]",
+      "overall_bushing_health": "[POOR if 2+ bushings >0.5%, else GOOD/FAIR]"
+    }
+  }''',
+    'demagnetization': '''  "demagnetization": {
+    "initial_remanence_percent": "[EXACT_VALUE]",
+    "final_remanence_percent": "[EXACT_VALUE]",
+    "effectiveness": "[CRITICAL FIX: INEFFECTIVE if Initial <20%, EFFECTIVE only if Initial >20% AND Final <1%]",
+    "validation_logic": "[If Initial <20% then INEFFECTIVE regardless of final, else check both criteria]",
+    "effectiveness_criteria": "EFFECTIVE only if Initial >20% AND Final <1%, otherwise INEFFECTIVE",
+    "confidence_score": "[95-100 if both values clear]"
+  }''',
+}
+
+# Lines of the shared blocks that only apply to some tests: (tests, line).
+# A line is kept when any of its tests is present.
+PATTERN_ALERTS = [
+    (('tan_delta_main_insulation',), '"[Moisture Risk if CLG >0.5% + others >0.4%]"'),
+    (('bushing_pf_c1',), '"[HV Cluster Critical if all H bushings >0.5% - Immediate Replacement Recommended]"'),
+    (('bushing_pf_c1',), '"[LV Cluster Critical if all X bushings >0.5% - Immediate Replacement Recommended]"'),
+    (PF_SECTIONS, '"[Phase Stress if WARNING insulation + CRITICAL bushing same phase]"'),
+    (('turns_ratio',), '"[TTR Critical if any tap error >1%]"'),
+]
+COMPLETENESS_CHECKS = [
+    (('winding_resistance',), '"winding_resistance_complete": "[TRUE if HV and LV phases with taps included]"'),
+    (('turns_ratio',), '"turns_ratio_complete": "[TRUE if all taps with TTR, excitation current included]"'),
+    (('turns_ratio',), '"excitation_current_validated": "[TRUE if properly converted to mA with 4 decimals]"'),
+    (('tan_delta_main_insulation',), '"tan_delta_complete": "[TRUE if CHL, CLG, CLH, CHG all included]"'),
+    (('bushing_pf_c1',), '"bushing_analysis_complete": "[TRUE if H1-H3, X0-X3 analyzed]"'),
+    (('demagnetization',), '"demagnetization_complete": "[TRUE if effectiveness determined]"'),
+    (('winding_resistance', 'turns_ratio'), '"tap_coverage_validated": "[Coverage range and any warnings]"'),
+    (PF_SECTIONS, '"zero_tolerance_reinforced": "[TRUE if all PF >0.5% = CRITICAL enforced]"'),
+]
+UNIT_CHECKS = [
+    (('winding_resistance',), '"resistance_units_correct": "[mΩ for LV, Ω for HV verified]"'),
+    (('turns_ratio',), '"excitation_current_units": "[µA to mA conversion with 4 decimals verified]"'),
+    (PF_SECTIONS, '"pf_units_consistent": "[% values with proper thresholds verified]"'),
+]
+COMPONENT_SCORES = [
+    (('winding_resistance',), '"winding_resistance": "[0-20 points based on balance and acceptability]"'),
+    (('turns_ratio',), '"turns_ratio": "[0-20 points based on TTR errors and excitation current]"'),
+    (('tan_delta_main_insulation',), '"main_insulation": "[0-25 points based on PF values and trends]"'),
+    (('bushing_pf_c1',), '"bushing_pf": "[0-25 points based on bushing conditions and clusters]"'),
+    (('demagnetization',), '"demagnetization": "[0-10 points based on effectiveness and remanence levels]"'),
+]
+TEMPLATE_SUMMARIES = [
+    (('winding_resistance',), '"winding_resistance_summary": "[Formatted WR analysis for template]"'),
+    (('turns_ratio',), '"turns_ratio_summary": "[Formatted TTR analysis for template]"'),
+    (('tan_delta_main_insulation',), '"tan_delta_summary": "[Formatted tan delta analysis for template]"'),
+    (('bushing_pf_c1',), '"bushing_summary": "[Formatted bushing analysis for template]"'),
+    (('demagnetization',), '"demagnetization_summary": "[Formatted demagnetization analysis for template]"'),
+]
+THRESHOLD_RULES = [
+    (('turns_ratio',), '- Enhanced TTR logic: OK ≤0.5%, WARNING 0.5-1%, CRITICAL >1%'),
+    (PF_SECTIONS, '- PF thresholds: OK <0.3%, WARNING 0.3-0.5%, CRITICAL >0.5%'),
+    (('demagnetization',), '- Demagnetization: INEFFECTIVE if Initial <20%'),
+]
+REPORT_SECTIONS = [
+    ('winding_resistance', '## WINDING RESISTANCE ANALYSIS\n{winding_resistance_summary}'),
+    ('turns_ratio', '## TURNS RATIO ANALYSIS\n{turns_ratio_summary}'),
+    ('tan_delta_main_insulation', '## TAN DELTA / MAIN INSULATION\n{tan_delta_summary}'),
+    ('bushing_pf_c1', '## BUSHING POWER FACTOR ANALYSIS\n{bushing_summary}'),
+    ('demagnetization', '## DEMAGNETIZATION ANALYSIS\n{demagnetization_summary}'),
+]
+
+def detect_test_types(text):
+    """Test sections whose headings appear in a report text, in schema order"""
+    found = set()
+    for line in iter_text_lines(text):
+        section = section_heading(line)
+        if section:
+            found.add(section)
+    return [section for section in TEST_SECTIONS if section in found]
+
+def resolve_test_types(test_types):
+    """Known test sections of ``test_types`` in schema order; all of them if none are known
+
+    Falling back to the full schema keeps reports whose headings were not
+    recognized from losing sections.
+    """
+    present = [section for section in TEST_SECTIONS if section in set(test_types or ())]
+    return present or list(TEST_SECTIONS)
+
+def _select(entries, test_types):
+    return [line for tests, line in entries if any(test in test_types for test in tests)]
+
+def _block(lines, indent):
+    return ',\n'.join(f"{' ' * indent}{line}" for line in lines)
+
+def threshold_rules(test_types):
+    """Threshold lines of the prompt introduction for the tests present"""
+    return '\n'.join(_select(THRESHOLD_RULES, test_types))
+
+def build_json_schema(test_types, filename, document_date, analysis_date):
+    """v3.0 JSON schema with only the sections of ``test_types``"""
+    metadata = f'''  "report_metadata": {{
+    "file_name": "{filename}",
+    "document_date": "{document_date}",
+    "analysis_date": "{analysis_date}",
+    "analysis_type": "Predictive Maintenance Enhanced v3.0 - Asset Health & Lifecycle Analysis",
+    "generated_by": "TRAX AI Analyzer v3.0",
+    "predictive_features": "Asset health scoring, maintenance planning, anomaly detection, replacement forecasting",
+    "template_variables_included": "Comprehensive variable set for advanced reporting"
+  }}'''
+
+    health_lines = [
+        '"overall_status": "[AUTO-CRITICAL if 2+ bushings OR any insulation >0.5%]"',
+        '"critical_findings_count": "[COUNT: All PF >0.5% + TTR >1% components]"',
+        '"warning_findings_count": "[COUNT: All PF 0.3-0.5% + TTR 0.5-1% components]"',
+        '"immediate_action_auto_flag": "[TRUE if 2+ bushings CRITICAL OR any insulation CRITICAL OR TTR >1%]"',
+    ]
+    alerts = _select(PATTERN_ALERTS, test_types)
+    if alerts:
+        health_lines.append(f'"pattern_alerts": [\n{_block(alerts, 6)}\n    ]')
+    if 'bushing_pf_c1' in test_types:
+        health_lines.append('''"cluster_auto_flagging": {
+      "hv_cluster_critical": "[TRUE if ALL H bushings >0.5%]",
+      "lv_cluster_critical": "[TRUE if ALL X bushings >0.5%]",
+      "immediate_replacement_recommended": "[TRUE if cluster degradation detected]"
+    }''')
+    health_lines.extend([
+        '"confidence_score_overall": "[WEIGHTED average of all subsystem confidences]"',
+        '"visual_status": "[🚨 CRITICAL / ⚠️ WARNING / ✅ OK]"',
+        '"risk_level": "[CRITICAL/HIGH/MODERATE/LOW with visual indicators]"',
+    ])
+    completeness = (['"completeness_score_percent": "[0-100% based on sections included]"']
+                    + _select(COMPLETENESS_CHECKS, test_types)
+                    + ['"technical_completeness_verified": "[✅ if all components found, ⚠️ if partial, ❌ if incomplete]"'])
+    health_lines.append(f'"technical_completeness_validation": {{\n{_block(completeness, 6)}\n    }}')
+    units = _select(UNIT_CHECKS, test_types)
+    if units:
+        health_lines.append(f'"unit_consistency_validation": {{\n{_block(units, 6)}\n    }}')
+    health = f'  "health_assessment_technical_complete": {{\n{_block(health_lines, 4)}\n  }}'
+
+    asset_health = f'''  "asset_health_score": {{
+    "calculated_score": "[0-100 overall health score]",
+    "condition_category": "[Excellent 90-100, Good 75-89, Moderate 60-74, Degraded 40-59, Critical <40]",
+    "component_scores": {{
+{_block(_select(COMPONENT_SCORES, test_types), 6)}
+    }},
+    "weighting_rationale": "Critical components (insulation, bushings) weighted higher due to failure impact",
+    "degradation_trend": "[Stable/Improving/Slow decline/Accelerating decline based on component analysis]",
+    "estimated_remaining_life": "[Years based on current condition and degradation rate]"
+  }}'''
+
+    maintenance_plan = '''  "predictive_maintenance_plan": {
+    "immediate_actions": [
+      "[List components requiring immediate attention with specific actions]"
+    ],
+    "next_maintenance_interval": {
+      "recommended_timeframe": "[3 months/6 months/12 months based on findings]",
+      "components_to_monitor": "[Specific components requiring attention]",
+      "tests_required": "[Specific tests needed at next interval]"
+    },
+    "quarterly_monitoring": [
+      "[Components requiring quarterly monitoring with specific parameters]"
+    ],
+    "replacement_forecast": {
+      "high_priority": "[Components needing replacement within 12 months]",
+      "medium_priority": "[Components needing replacement within 24 months]",
+      "long_term": "[Components for long-term replacement planning 3-5 years]",
+      "estimated_costs": "[Relative cost categories: Low/Medium/High for planning]"
+    },
+    "anomaly_score": "[0-10 risk score: 0-2 Normal, 3-5 Elevated, 6-8 High, 9-10 Critical]",
+    "risk_factors": [
+      "[Specific risk factors identified: moisture, cluster degradation, aging, etc.]"
+    ]
+  }'''
+
+    template_lines = [
+        '"transformer_name": "[Equipment name for template]"',
+        '"transformer_age": "[Estimated age in years if determinable]"',
+        '"overall_status": "[Overall technical status summary]"',
+        '"critical_findings": "[Count and description of critical findings]"',
+        '"warning_findings": "[Count and description of warning findings]"',
+        '"moisture_flags": "[Moisture risk indicators]"',
+        '"pattern_flags": "[Cluster or pattern risk flags]"',
+        '"health_score": "[Asset health score 0-100]"',
+        '"anomaly_score": "[Anomaly risk score 0-10]"',
+        '"replacement_window": "[Months until recommended replacement for critical components]"',
+        '"ahs_condition": "[Excellent/Good/Moderate/Degraded/Critical based on score]"',
+        '"predictive_plan_table": "[Formatted table of component statuses and timelines]"',
+        '"overall_summary_text": "[Comprehensive summary for executive reporting]"',
+    ] + _select(TEMPLATE_SUMMARIES, test_types)
+    template_variables = f'  "template_variables": {{\n{_block(template_lines, 4)}\n  }}'
+
+    fragments = ([metadata] + [SECTION_SCHEMAS[section] for section in test_types]
+                 + [health, asset_health, maintenance_plan, template_variables])
+    return '{\n' + ',\n'.join(fragments) + '\n}'
+
+def _schema_of(example):
+    if isinstance(example, dict):
+        return {
+            'type': 'object',
+            'properties': {key: _schema_of(value) for key, value in example.items()},
+            'required': list(example),
+            'additionalProperties': False,
+        }
+    if isinstance(example, list):
+        return {'type': 'array', 'items': _schema_of(example[0]) if example else {'type': 'string'}}
+    # Placeholders such as "[VALUE]" or "[TRUE if ...]" stand for numbers and flags as well as text
+    return {'type': ['string', 'number', 'boolean', 'null']}
+
+def _bushing_entries(section, designations):
+    """bushing_pf_c1 schema with one entry per measured bushing instead of the H1-X3 example set
+
+    Strict mode requires every key, so a fixed set would make the model
+    invent values for bushings the report does not have. Each designation
+    takes the fields of the example bushing on its side (H or X).
+    """
+    properties = section['properties']
+    examples = [key for key in properties if properties[key].get('properties', {}).get('designation')]
+    sides = {key[0]: properties[key] for key in reversed(examples)}
+    entries = {}
+    for key, value in properties.items():
+        if key == examples[0]:
+            entries.update((label, sides.get(label[0], value)) for label in designations)
+        elif key not in examples:
+            entries[key] = value
+    section['properties'] = entries
+    section['required'] = list(section['properties'])
+
+def build_response_schema(test_types, bushings=None):
+    """Strict JSON Schema of the v3.0 structure for ``test_types`` plus the narrative report field
+
+    Objects and keys follow build_json_schema exactly (all keys required, no
+    others allowed); the placeholder values become scalar fields that also
+    accept null for values missing from the report. ``bushings`` (the
+    designations measured from the bushing table) replaces the H1-X3
+    example entries of bushing_pf_c1.
+    """
+    schema = _schema_of(json.loads(build_json_schema(test_types, '', '', '')))
+    if bushings and 'bushing_pf_c1' in schema['properties']:
+        _bushing_entries(schema['properties']['bushing_pf_c1'], bushings)
+    schema['properties'][REPORT_FIELD] = {
+        'type': 'string',
+        'description': 'The complete predictive maintenance report in markdown, following the report template',
+    }
+    schema['required'].append(REPORT_FIELD)
+    return schema
+
+def build_report_sections(test_types):
+    """Per-test sections of the narrative report template"""
+    return '\n\n'.join(template for section, template in REPORT_SECTIONS if section in test_types)
+
+def partial_report_note(test_types):
+    """Instruction naming the tests present when the schema is not the full one"""
+    if len(test_types) == len(TEST_SECTIONS):
+        return ""
+    titles = ', '.join(TEST_TITLES[section] for section in test_types)
+    return f"""TESTS PRESENT IN THIS REPORT: {titles}
+Only these tests were performed. Do not add JSON sections or report sections for
+any other test, and base completeness and the asset health score on the tests
+present (scale the component scores to a total of 100).
+
+"""
@@ -0,0 +1,143 @@
+"""
+Asset segmentation for multi-transformer TRAX reports
+Files such as "LTC Series Winding Tests L247439A and L247439B.pdf" carry the
+tests of several transformers back to back. This splits the relevant pages of
+a document into one work unit per asset, using the serial numbers on
+nameplate blocks and test sequences that start over, so each transformer is
+analyzed on its own pages only.
+"""
+
+import re
+
+# "Serial No: L247439A", "S/N | L247439B" (layout rows use " | " between cells)
+SERIAL_NUMBER = re.compile(
+    r'(?:\bserial\s*(?:no\.?|number|#)?|\bs/n)[\s:#|.]*(?P<serial>[A-Z0-9][A-Z0-9\-_/]{3,})',
+    re.IGNORECASE,
+)
+
+# Serial-like tokens in a file name, e.g. "L247439A" or "l247439a". The
+# spaced form "L 247439A" needs an upper case prefix and at least 5 digits so
+# words and years such as "and 2022" or "TTR 2021" are not read as serials.
+FILENAME_SERIAL = re.compile(
+    r'(?<![A-Za-z0-9])([A-Za-z]{1,3}\d{4,}[A-Za-z]?|[A-Z]{1,3} \d{5,}[A-Z]?)(?![A-Za-z0-9])'
+)
+
+def normalize_serial(serial):
+    """Comparable form of a serial number: upper case without spaces or dashes"""
+    return re.sub(r'[\s\-_]', '', serial).upper()
+
+def filename_serials(filename):
+    """Serial numbers named in a file name, in order"""
+    return [normalize_serial(serial) for serial in FILENAME_SERIAL.findall(filename or '')]
+
+def page_serials(page_text):
+    """Distinct serial numbers on a page, in order of appearance"""
+    serials = []
+    for match in SERIAL_NUMBER.finditer(page_text):
+        serial = match.group('serial').upper()
+        if any(char.isdigit() for char in serial) and serial not in serials:
+            serials.append(serial)
+    return serials
+
+# A measurement row of a rendered table: cells joined by " | " and a number
+MEASUREMENT_ROW = re.compile(r'^(?=.* \| ).*\d', re.MULTILINE)
+
+def has_measurement_rows(page_text):
+    """True if a rendered page holds table rows with values (a test page, not a summary or narrative)"""
+    return bool(MEASUREMENT_ROW.search(page_text))
+
+def _new_unit(serial=None):
+    return {'serial': serial, 'pages': [], 'sections': []}
+
+def segment_assets(section_index, page_texts, filename=None):
+    """Split a document into per-asset work units (split_assets, then label_assets)"""
+    return label_assets(split_assets(section_index, page_texts), filename)
+
+def split_assets(section_index, page_texts):
+    """Split a document into per-asset page groups, from its content alone
+
+    ``section_index`` and ``page_texts`` are PdfDocument.section_index and
+    page_layout_texts. A new unit starts on a relevant page that shows a
+    serial number different from the current unit's, or where a test
+    section heading reappears after other sections (the test sequence
+    starting over) on a page with measurement rows. A summary page that
+    repeats the test names ("Winding Resistance", "Turns Ratio", ...)
+    without a table of values stays with its transformer. Pages ahead of
+    the first test section without a serial of their own (shared
+    nameplate/header pages) go into every unit.
+
+    Returns a list of {"serial", "pages", "sections"} with the serials read
+    from the pages; a single-asset document yields one unit.
+    """
+    headings = {}
+    for entry in section_index['sections']:
+        headings.setdefault(entry['page'], []).append(entry['section'])
+
+    shared = []
+    units = []
+    current = None
+    for page_no in section_index['relevant_pages']:
+        serials = page_serials(page_texts[page_no])
+        # A page listing several serials is a common header, not a boundary
+        serial = serials[0] if len(serials) == 1 else None
+        page_headings = headings.get(page_no, [])
+
+        if current is None:
+            if not serial and not page_headings:
+                shared.append(page_no)
+                continue
+            current = _new_unit(serial)
+            units.append(current)
+        elif serial and current['serial'] and serial != current['serial']:
+            current = _new_unit(serial)
+            units.append(current)
+        elif (page_headings and page_headings[0] in current['sections']
+              and page_headings[0] != current['sections'][-1]
+              and has_measurement_rows(page_texts[page_no])):
+            current = _new_unit(serial)
+            units.append(current)
+        elif serial and not current['serial']:
+            current['serial'] = serial
+
+        current['pages'].append(page_no)
+        for section in page_headings:
+            if section not in current['sections']:
+                current['sections'].append(section)
+
+    # Units without any test section (e.g. a stray serial on a notes page)
+    # are folded into the preceding unit
+    merged = []
+    for unit in units:
+        if merged and not unit['sections']:
+            merged[-1]['pages'].extend(unit['pages'])
+        elif merged and not merged[-1]['sections']:
+            unit['pages'][:0] = merged[-1]['pages']
+            unit['serial'] = unit['serial'] or merged[-1]['serial']
+            merged[-1] = unit
+        else:
+            merged.append(unit)
+
+    if len(merged) <= 1:
+        pages = list(section_index['relevant_pages'])
+        serial = merged[0]['serial'] if merged else None
+        sections = merged[0]['sections'] if merged else []
+        return [{'serial': serial, 'pages': pages, 'sections': sections}]
+    return [{'serial': unit['serial'], 'pages': sorted(set(shared + unit['pages'])), 'sections': unit['sections']}
+            for unit in merged]
+
+def label_assets(units, filename=None):
+    """Work units of split_assets with a "label": the serial, or "Unit_<n>"
+
+    Serials named in the file name fill in units whose pages carry none.
+    Other keys of the units (e.g. measurements) are kept; a single-asset
+    document gets label None.
+    """
+    if len(units) <= 1:
+        return [{'label': None, **unit} for unit in units]
+    named = filename_serials(filename)
+    use_filename = len(named) == len(units)
+    labeled = []
+    for index, unit in enumerate(units):
+        serial = unit['serial'] or (named[index] if use_filename else None)
+        labeled.append({**unit, 'label': serial or f"Unit_{index + 1}", 'serial': serial})
+    return labeled
@@ -0,0 +1,346 @@
+"""
+Deterministic TRAX table extraction
+Reads the core test tables (winding resistance, turns ratio, tan delta,
+bushing C1 and demagnetization) from PyMuPDF word coordinates and returns the
+measured values under the v3.0 JSON schema field names, so the numbers are
+reproducible and no longer depend on the LLM reading them back out of text.
+"""
+
+import re
+from trax_layout import layout_row_cells
+from trax_parser import section_heading
+
+NUMBER = re.compile(r'^[-+]?\d+(?:[.,]\d+)?%?$')
+TAN_DELTA_LABELS = {'CHL', 'CLG', 'CLH', 'CHG'}
+BUSHING_LABEL = re.compile(r'^[HXY][0-3]$')
+WINDING_PHASE = re.compile(r'^(?:[HXY]\d\s*-\s*[HXY]\d|[HXY]\d[HXY]\d|[ABC](?:\s*-\s*[ABCN])?)$', re.IGNORECASE)
+TAP_LABEL = re.compile(r'^(?:\d{1,2}[LR]?|N|NEUTRAL)$', re.IGNORECASE)
+
+# PF and TTR limits used by the v3.0 analysis (see trax_analyzer_json)
+PF_WARNING_PERCENT = 0.3
+PF_CRITICAL_PERCENT = 0.5
+TTR_WARNING_PERCENT = 0.5
+TTR_CRITICAL_PERCENT = 1.0
+
+def parse_number(word):
+    """Parse a table cell such as '0.28', '0,28' or '0.28%' to float, or None"""
+    word = word.strip()
+    if not NUMBER.match(word):
+        return None
+    return float(word.rstrip('%').replace(',', '.'))
+
+def pf_status(value):
+    if value > PF_CRITICAL_PERCENT:
+        return "CRITICAL 🚨"
+    if value >= PF_WARNING_PERCENT:
+        return "WARNING ⚠️"
+    return "OK ✅"
+
+def ttr_status(error_percent):
+    error_percent = abs(error_percent)
+    if error_percent > TTR_CRITICAL_PERCENT:
+        return "CRITICAL 🚨"
+    if error_percent > TTR_WARNING_PERCENT:
+        return "WARNING ⚠️"
+    return "OK ✅"
+
+def iter_document_rows(doc, page_numbers=None):
+    """Yield (page_no, cells, cell count) for every row of every page (or of ``page_numbers``) of a PdfDocument
+
+    ``cells`` are the words of the row; the cell count merges adjacent
+    words, so a title such as "Bushing C1 Power Factor" is one cell.
+    """
+    if page_numbers is None:
+        page_numbers = range(doc.page_count)
+    for page_no in page_numbers:
+        for cells, cell_count in layout_row_cells(doc.page_words(page_no)):
+            yield page_no, cells, cell_count
+
+def _row_text(cells):
+    return ' '.join(text for _, text in cells)
+
+def _numbers(cells):
+    """(x_centre, value) of the numeric cells of a row"""
+    values = []
+    for x, text in cells:
+        value = parse_number(text)
+        if value is not None:
+            values.append((x, value))
+    return values
+
+def _heading(cells):
+    """Section key if the row is a section heading (text without numbers)"""
+    if _numbers(cells):
+        return None
+    return section_heading(_row_text(cells))
+
+def _column(header, keywords, exclude=()):
+    """x centre of the first header cell containing any keyword, or None"""
+    for x, text in header:
+        lower = text.lower()
+        if any(keyword in lower for keyword in keywords) and not any(word in lower for word in exclude):
+            return x
+    return None
+
+def _value_at(numbers, x):
+    """Value of the numeric cell nearest to column x"""
+    if x is None or not numbers:
+        return None
+    return min(numbers, key=lambda number: abs(number[0] - x))[1]
+
+def _pf_columns(header):
+    """(measured, corrected) %PF column positions from a table header row"""
+    corrected = _column(header, ('corr', '20°', '@20', '20c'))
+    measured = _column(header, ('meas', '%pf', 'pf%', 'tan'), exclude=('corr',))
+    return measured, corrected
+
+class SectionRows:
+    """Rows collected for one table section plus its most recent header row
+
+    ``rows`` holds (header cells, row cells) pairs; cells are (x, text)
+    with x the horizontal position used to line values up with headers.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.header = []
+
+def collect_sections(doc, page_numbers=None):
+    """Split the document rows into the core test sections"""
+    return collect_section_rows((cells, cell_count) for _, cells, cell_count in iter_document_rows(doc, page_numbers))
+
+def collect_section_rows(rows):
+    """Split a stream of table rows into the core test sections
+
+    ``rows`` yields (cells, cell count) with cells a list of (x, text).
+    Inside a section a multi-cell row naming a test ("Bushing | %PF Meas |
+    %PF Corr 20C") is that section's column header, not a new heading.
+    """
+    sections = {}
+    current = None
+    for cells, cell_count in rows:
+        heading = _heading(cells) if current is None or cell_count == 1 else None
+        if heading:
+            current = sections.setdefault(heading, SectionRows())
+            continue
+        if current is None:
+            continue
+        if not _numbers(cells):
+            # Text-only rows inside a section are column headers
+            current.header = cells
+            continue
+        current.rows.append((current.header, cells))
+    return sections
+
+def extract_tan_delta(section):
+    results = {}
+    for header, cells in section.rows:
+        label = cells[0][1].upper()
+        if label not in TAN_DELTA_LABELS or label in results:
+            continue
+        numbers = _numbers(cells)
+        _, corrected_x = _pf_columns(header)
+        value = _value_at(numbers, corrected_x)
+        if value is None:
+            value = numbers[-1][1]
+        results[label] = {
+            "pf_corrected_20c_percent": value,
+            "status": pf_status(value),
+        }
+    return results
+
+def extract_bushings(section):
+    results = {}
+    for header, cells in section.rows:
+        label = cells[0][1].upper()
+        if not BUSHING_LABEL.match(label) or label in results:
+            continue
+        numbers = _numbers(cells)
+        measured_x, corrected_x = _pf_columns(header)
+        corrected = _value_at(numbers, corrected_x)
+        measured = _value_at(numbers, measured_x)
+        if corrected is None:
+            corrected = numbers[-1][1]
+            if measured is None and len(numbers) >= 2:
+                measured = numbers[-2][1]
+        record = {"designation": label}
+        if measured is not None:
+            record["pf_test_temp_percent"] = measured
+        record["pf_corrected_20c_percent"] = corrected
+        record["status"] = pf_status(corrected)
+        results[label] = record
+    return results
+
+def _resistance_unit(cells, header):
+    text = (_row_text(cells) + ' ' + _row_text(header)).lower()
+    if 'mω' in text or 'mohm' in text:
+        return 'mohm'
+    if 'ω' in text or 'ohm' in text:
+        return 'ohm'
+    return None
+
+def extract_winding_resistance(section):
+    lv_windings = []
+    hv_windings = []
+    for header, cells in section.rows:
+        phase = cells[0][1]
+        if not WINDING_PHASE.match(phase):
+            continue
+        numbers = _numbers(cells)
+        tap_x = _column(header, ('tap', 'pos'))
+        resistance_x = _column(header, ('resist', 'r (', 'ohm', 'ω'))
+        tap = None
+        if tap_x is not None:
+            tap = _value_at(numbers, tap_x)
+        elif len(numbers) >= 2 and numbers[0][1].is_integer():
+            # Without a header a leading whole number is the tap position
+            tap = numbers.pop(0)[1]
+        resistance = _value_at(numbers, resistance_x)
+        if resistance is None:
+            if not numbers:
+                continue
+            resistance = numbers[0][1]
+
+        unit = _resistance_unit(cells, header)
+        tap_position = str(int(tap)) if tap is not None else ""
+        if phase.upper().startswith('H'):
+            if unit == 'mohm':
+                resistance = resistance / 1000
+            hv_windings.append({"phase": phase, "tap_position": tap_position, "resistance_ohm": resistance})
+        else:
+            if unit == 'ohm':
+                resistance = resistance * 1000
+            lv_windings.append({"phase": phase, "tap_position": tap_position, "resistance_mohm": resistance})
+
+    results = {}
+    if lv_windings:
+        results["lv_windings"] = lv_windings
+    if hv_windings:
+        results["hv_windings"] = hv_windings
+    return results
+
+# Turns ratio columns: (record field, header keywords, header exclusions)
+TTR_COLUMNS = [
+    ("nominal_ttr", ('nom', 'calc', 'name'), ()),
+    ("measured_ttr", ('meas', 'ratio'), ('nom', 'err', 'dev')),
+    ("error_percent", ('err', 'dev', 'diff'), ('phase', 'angle')),
+    ("excitation_current_ma", ('iex', 'exc', 'current'), ()),
+    ("phase_displacement_deg", ('phase', 'angle', '°'), ()),
+]
+
+def extract_turns_ratio(section):
+    results = []
+    for header, cells in section.rows:
+        tap = cells[0][1]
+        if not TAP_LABEL.match(tap):
+            continue
+        numbers = [number for number in _numbers(cells) if number[0] > cells[0][0]]
+        if len(numbers) < 2:
+            continue
+        record = {"tap_position": tap}
+        if header:
+            for field, keywords, exclude in TTR_COLUMNS:
+                value = _value_at(numbers, _column(header, keywords, exclude))
+                if value is not None:
+                    record[field] = value
+        else:
+            for (field, _, _), (_, value) in zip(TTR_COLUMNS, numbers):
+                record[field] = value
+
+        # Excitation current is reported in mA (4 decimals) by the v3.0 schema
+        if "excitation_current_ma" in record:
+            header_text = _row_text(header).lower()
+            if 'µa' in header_text or 'ua' in header_text:
+                record["excitation_current_ma"] = record["excitation_current_ma"] / 1000
+            record["excitation_current_ma"] = round(record["excitation_current_ma"], 4)
+        if "error_percent" in record:
+            record["status"] = ttr_status(record["error_percent"])
+        results.append(record)
+    return results
+
+def extract_demagnetization(section):
+    results = {}
+    for _, cells in section.rows:
+        text = _row_text(cells).lower()
+        numbers = _numbers(cells)
+        if 'initial' in text and "initial_remanence_percent" not in results:
+            results["initial_remanence_percent"] = numbers[-1][1]
+        elif 'final' in text and "final_remanence_percent" not in results:
+            results["final_remanence_percent"] = numbers[-1][1]
+    return results
+
+SECTION_EXTRACTORS = {
+    'winding_resistance': extract_winding_resistance,
+    'turns_ratio': extract_turns_ratio,
+    'tan_delta_main_insulation': extract_tan_delta,
+    'bushing_pf_c1': extract_bushings,
+    'demagnetization': extract_demagnetization,
+}
+
+def extract_measurements(doc, page_numbers=None):
+    """Read the core TRAX test tables of a PdfDocument
+
+    Returns a dict keyed by v3.0 section name (winding_resistance,
+    turns_ratio, tan_delta_main_insulation, bushing_pf_c1, demagnetization)
+    holding only the sections and values actually found. ``page_numbers``
+    restricts the search to some pages, e.g. one asset of a multi-asset file.
+    """
+    return measure_sections(collect_sections(doc, page_numbers))
+
+def measure_sections(sections):
+    """Run the section extractors over {section: SectionRows}"""
+    measurements = {}
+    for section, rows in sections.items():
+        values = SECTION_EXTRACTORS[section](rows)
+        if values:
+            measurements[section] = values
+    return measurements
+
+def _merge_records(records, measured, key_fields):
+    """Overlay measured list records onto LLM records matched by key fields"""
+    if not isinstance(records, list):
+        records = []
+    for measured_record in measured:
+        key = tuple(str(measured_record.get(field, "")) for field in key_fields)
+        for record in records:
+            if isinstance(record, dict) and tuple(str(record.get(field, "")) for field in key_fields) == key:
+                record.update(measured_record)
+                break
+        else:
+            records.append(dict(measured_record))
+    return records
+
+def apply_measurements(json_data, measurements):
+    """Overwrite LLM-extracted values in a v3.0 analysis with the measured ones"""
+    if not measurements:
+        return json_data
+
+    for section in ('tan_delta_main_insulation', 'bushing_pf_c1'):
+        if section in measurements:
+            if not isinstance(json_data.get(section), dict):
+                json_data[section] = {}
+            target = json_data[section]
+            for label, values in measurements[section].items():
+                if not isinstance(target.get(label), dict):
+                    target[label] = {}
+                target[label].update(values)
+
+    if 'demagnetization' in measurements:
+        if not isinstance(json_data.get('demagnetization'), dict):
+            json_data['demagnetization'] = {}
+        json_data['demagnetization'].update(measurements['demagnetization'])
+
+    if 'winding_resistance' in measurements:
+        if not isinstance(json_data.get('winding_resistance'), dict):
+            json_data['winding_resistance'] = {}
+        target = json_data['winding_resistance']
+        for side, values in measurements['winding_resistance'].items():
+            target[side] = _merge_records(target.get(side), values, ('phase', 'tap_position'))
+
+    if 'turns_ratio' in measurements:
+        json_data['turns_ratio'] = _merge_records(json_data.get('turns_ratio'), measurements['turns_ratio'], ('tap_position',))
+
+    metadata = json_data.setdefault('report_metadata', {})
+    if isinstance(metadata, dict):
+        metadata['deterministic_sections'] = sorted(measurements)
+    return json_data